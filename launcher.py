@@ -18,7 +18,11 @@ check_and_setup_env()
 from services.system.main import app as system_app
 from services.email.main import app as email_app
 from services.browser.main import app as browser_app
-from orchestrator.main import app as orchestrator_app
+from orchestrator.main import app as orchestrator_app, register_local_services
+
+# "inprocess": the orchestrator calls the service apps directly (one server, no loopback HTTP).
+# "http": every service gets its own server on 8001-8003, as with run_all.py.
+SERVICE_TRANSPORT = os.getenv("SERVICE_TRANSPORT", "inprocess")
 
 def run_service(app, port):
     uvicorn.run(app, host="127.0.0.1", port=port, log_level="error")
@@ -27,12 +31,19 @@ def start_backend():
     print("Initializing Backend Services in Threads...")
     
     threads = []
-    services = [
-        (system_app, 8001),
-        (browser_app, 8002),
-        (email_app, 8003),
-        (orchestrator_app, 8000)
-    ]
+    services = [(orchestrator_app, 8000)]
+    if SERVICE_TRANSPORT == "inprocess":
+        register_local_services({
+            "system": system_app,
+            "browser": browser_app,
+            "email": email_app,
+        })
+    else:
+        services = [
+            (system_app, 8001),
+            (browser_app, 8002),
+            (email_app, 8003),
+        ] + services
     
     for app, port in services:
         t = threading.Thread(target=run_service, args=(app, port), daemon=True)
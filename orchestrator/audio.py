@@ -1,54 +1,182 @@
+import logging
 import sounddevice as sd
 import numpy as np
-import speech_recognition as sr
-import pyttsx3
 import threading
 import queue
 import time
-import io
-import scipy.io.wavfile as wav
+from .stt import get_stt_engine
+from .vad import create_vad
+from .tts import tts_worker
+from . import metrics
 
-# Initialize Speaker
-engine = pyttsx3.init()
-voices = engine.getProperty('voices')
-if len(voices) > 1:
-    engine.setProperty('voice', voices[1].id)
-engine.setProperty('rate', 170)
+logger = logging.getLogger(__name__)
 
 def speak(text):
-    """Speaks the given text."""
-    print(f"Assistant: {text}")
-    # engine.say(text) # Commented out to prevent blocking in some environments, uncomment if needed
-    # engine.runAndWait()
+    """Speaks the given text without blocking. Returns an Utterance to wait on."""
+    logger.info("Assistant: %s", text)
+    return tts_worker.say(text)
 
 # Audio Capture Configuration
 SAMPLE_RATE = 16000
 BLOCK_SIZE = 1024  # Size of audio chunks
 CHANNELS = 1
-SILENCE_THRESHOLD = 0.05  # Increased slightly to avoid background noise triggering too easily, but we will lower it if needed.
-# Actually, sticking to a lower value is better for sensitivity. Let's keep it low but require consistent silence.
-# Background noise in logs seems to be around 0.8 - 1.2
-# Speech peaks are 40+.
-# Setting threshold higher to prevent "Max Phrase Time" waits.
-SILENCE_THRESHOLD = 3.0 
-SILENCE_DURATION = 1.2    # Low latency response
+MAX_PHRASE_SECONDS = 20   # Default phrase limit when none is given
+RING_SECONDS = 30         # History kept by the always-open input stream
+PRE_ROLL_SECONDS = 1.0    # Audio from before listen() that is still handed to STT
+WAVEFORM_SECONDS = 0.5    # History shown by the UI waveform preview
+WAVEFORM_POINTS = 128
 
 # Global Queue for passing audio data
 audio_queue = queue.Queue()
 
+class AudioRingBuffer:
+    """
+    Fixed-capacity int16 ring buffer. The audio callback scales float32 blocks
+    straight into it, so capture does not allocate per block.
+    Positions are absolute sample counts; the slot is position % capacity.
+    """
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self.buffer = np.zeros(self.capacity, dtype=np.int16)
+        self.write_pos = 0
+
+    def reset(self):
+        self.write_pos = 0
+
+    def write(self, block):
+        """Writes a float32 block of shape (frames, 1) or (frames,) in place."""
+        samples = block.reshape(-1)
+        n = len(samples)
+        if n >= self.capacity:
+            # Block bigger than the whole buffer: keep only the newest samples.
+            samples = samples[-self.capacity:]
+            self.write_pos += n - self.capacity
+            n = self.capacity
+
+        start = self.write_pos % self.capacity
+        end = start + n
+        if end <= self.capacity:
+            np.multiply(samples, 32767, out=self.buffer[start:end], casting='unsafe')
+        else:
+            split = self.capacity - start
+            np.multiply(samples[:split], 32767, out=self.buffer[start:], casting='unsafe')
+            np.multiply(samples[split:], 32767, out=self.buffer[:end - self.capacity], casting='unsafe')
+        self.write_pos += n
+
+    def span(self, start_pos, end_pos=None):
+        """
+        Returns the int16 samples between two absolute positions.
+        Zero-copy view unless the span wraps around the end of the buffer.
+        """
+        if end_pos is None:
+            end_pos = self.write_pos
+        # Anything older than one capacity has been overwritten.
+        start_pos = max(start_pos, end_pos - self.capacity, 0)
+        if end_pos <= start_pos:
+            return self.buffer[:0]
+
+        start = start_pos % self.capacity
+        end = start + (end_pos - start_pos)
+        if end <= self.capacity:
+            return self.buffer[start:end]
+        return np.concatenate((self.buffer[start:], self.buffer[:end - self.capacity]))
+
+
 class AudioRecorder:
-    def __init__(self, volume_callback=None):
+    """
+    Owns one long-lived input stream. The callback writes every block into a
+    ring buffer; listen()/capture() cut utterances out of that continuous
+    stream. Each capture starts where the previous one ended, or at most
+    PRE_ROLL_SECONDS before the call, so speech that began just before
+    listen() is kept. Older audio nobody listened for is skipped and
+    counted in skipped_samples.
+    """
+    def __init__(self, volume_callback=None, stt_engine=None, vad=None):
         self.recording = False
-        self.frames = []
-        self.start_time = 0
+        self.ring = AudioRingBuffer(RING_SECONDS * SAMPLE_RATE)
+        self.stream = None
+        self.stream_lock = threading.Lock()
+        self.read_pos = 0           # Absolute position where the last utterance ended
+        self.capture_start = 0
         self.last_sound_time = 0
         self.stop_event = threading.Event()
+        self.data_ready = threading.Event()  # Set by the callback after every block
         self.volume_callback = volume_callback
+        self.stt = stt_engine
+        self.vad = vad or create_vad(sample_rate=SAMPLE_RATE, block_size=BLOCK_SIZE)
+        self.vad_event_callback = None  # Called with ("start" | "end", absolute sample position)
+        self.heard_speech = False       # Speech started during the current capture
+        self.speech_end_time = None     # When the VAD ended the current capture
+
+        # Counters for every sample that never reached STT
+        self.overflow_count = 0     # Blocks PortAudio flagged as input overflow
+        self.dropped_samples = 0    # Samples overwritten before an utterance was cut
+        self.skipped_samples = 0    # Samples between captures older than the pre-roll
+
+    def open(self):
+        """Opens the input device once. Safe to call repeatedly."""
+        self.get_stt()  # Load the STT engine up front so the first utterance doesn't pay for it
+        with self.stream_lock:
+            if self.stream is not None:
+                return
+            self.ring.reset()
+            self.read_pos = 0
+            self.stream = sd.InputStream(callback=self.callback,
+                                         channels=CHANNELS,
+                                         samplerate=SAMPLE_RATE,
+                                         blocksize=BLOCK_SIZE)
+            self.stream.start()
+            logger.info("Audio input stream opened.")
+
+    def close(self):
+        """Closes the input device."""
+        with self.stream_lock:
+            if self.stream is None:
+                return
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+            logger.info("Audio input stream closed.")
+        self.stop_event.set()
+        self.data_ready.set()
+
+    def get_stt(self):
+        if self.stt is None:
+            self.stt = get_stt_engine()
+        return self.stt
+
+    def skip_pending(self):
+        """Discards audio captured so far (e.g. our own "Yes?") from the next utterance."""
+        self.read_pos = self.ring.write_pos
+
+    def waveform(self, seconds=WAVEFORM_SECONDS, points=WAVEFORM_POINTS):
+        """
+        Peak envelope (0..1) of the most recent audio, for the UI.
+        Read from the ring buffer by the caller's thread; the audio callback does no extra work.
+        """
+        end = self.ring.write_pos
+        samples = self.ring.span(end - int(seconds * SAMPLE_RATE), end)
+        usable = len(samples) // points * points
+        if usable == 0:
+            return np.zeros(points, dtype=np.float32)
+        peaks = np.abs(samples[-usable:].reshape(points, -1).astype(np.int32)).max(axis=1)
+        return (peaks / 32768.0).astype(np.float32)
+
+    def stats(self):
+        return {
+            "overflow_blocks": self.overflow_count,
+            "dropped_samples": self.dropped_samples,
+            "skipped_samples": self.skipped_samples,
+            "captured_samples": self.ring.write_pos,
+            "stt": self.stt.stats() if self.stt else None,
+        }
 
     def callback(self, indata, frames, time_info, status):
         """Callback for sounddevice. Captures audio and checks for silence."""
         if status:
-            print(status)
+            if status.input_overflow:
+                self.overflow_count += 1
+            logger.warning("Audio input status: %s", status)
         
         # Calculate Volume (RMS)
         amplitude = np.linalg.norm(indata) * 10
@@ -57,84 +185,173 @@ class AudioRecorder:
         if self.volume_callback:
             self.volume_callback(amplitude)
         
-        # Determine if talking
-        if amplitude > SILENCE_THRESHOLD:
-            self.last_sound_time = time.time()
-        
-        # Store data
-        self.frames.append(indata.copy())
+        # Store data (scaled to int16 in place, no per-block allocation)
+        self.ring.write(indata)
 
-        # Check for Silence Timeout
-        if time.time() - self.last_sound_time > SILENCE_DURATION and len(self.frames) > (SAMPLE_RATE / BLOCK_SIZE):
-            self.stop_event.set() # Signal to stop
+        # Voice activity
+        event = self.vad.process(indata)
+        if self.vad.speaking or event == "end":
+            self.last_sound_time = time.time()
+        if event:
+            if self.vad_event_callback:
+                self.vad_event_callback(event, self.ring.write_pos)
+            if event == "start":
+                self.heard_speech = True
+            elif event == "end" and self.recording and self.heard_speech:
+                self.speech_end_time = time.time()
+                self.stop_event.set() # End of speech, signal to stop
+        self.data_ready.set()
 
     def stop(self):
         """Manually stop recording."""
-        print("Manual Stop Triggered.")
+        logger.debug("Manual stop triggered.")
         self.stop_event.set()
+        self.data_ready.set()
 
-    def listen(self, timeout=None, phrase_time_limit=None):
+    def capture(self, timeout=None, phrase_time_limit=None, on_audio=None):
         """
         Records audio until silence is detected.
-        Returns the recognized text.
+        Returns a zero-copy int16 view of the captured span (empty on timeout).
+        on_audio(samples) is called with each newly captured chunk while recording;
+        if it returns True the utterance is cut right there.
         """
-        print(f"Listening (SoundDevice)... Timeout={timeout}")
-        self.frames = []
+        logger.debug("Listening (SoundDevice)... timeout=%s", timeout)
+        self.open()
+
+        max_phrase = RING_SECONDS - PRE_ROLL_SECONDS
+        if phrase_time_limit is None or phrase_time_limit > max_phrase:
+            phrase_time_limit = min(phrase_time_limit or MAX_PHRASE_SECONDS, max_phrase)
+
+        # Start where the previous utterance ended, but don't hand over more
+        # than the pre-roll of audio that nobody was listening for.
+        now_pos = self.ring.write_pos
+        self.capture_start = max(self.read_pos, now_pos - int(PRE_ROLL_SECONDS * SAMPLE_RATE))
+        skipped = self.capture_start - self.read_pos
+        if skipped > 0:
+            self.skipped_samples += skipped
+            logger.debug("Skipping %.2f s of audio from before the pre-roll.", skipped / float(SAMPLE_RATE))
         self.stop_event.clear()
-        self.last_sound_time = time.time()
-        
+        self.speech_end_time = None
         start_recording_time = time.time()
-        
-        # Start Input Stream
-        with sd.InputStream(callback=self.callback, 
-                          channels=CHANNELS, 
-                          samplerate=SAMPLE_RATE, 
-                          blocksize=BLOCK_SIZE):
-            
-            # Wait until silence is detected or timeout
+        metrics.mark("capture_start", at=start_recording_time)
+        # Speech already in progress (e.g. the tail of the wake word) counts for this capture
+        self.heard_speech = self.vad.speaking
+        self.recording = True
+        fed_pos = self.capture_start
+
+        timeout_at = start_recording_time + timeout if timeout else None
+        limit_at = start_recording_time + phrase_time_limit
+
+        try:
+            # Block until end of speech, a timeout, or (when streaming) new audio.
+            # Nothing here sleeps on a fixed tick; the callback signals us.
             while not self.stop_event.is_set():
-                elapsed = time.time() - start_recording_time
+                now = time.time()
                 
                 # Check for Timeout (waiting for speech to start)
-                if timeout and elapsed > timeout and len(self.frames) < (SAMPLE_RATE / BLOCK_SIZE):
+                if timeout_at and now >= timeout_at and not self.heard_speech:
                     # Timeout reached without significant audio
-                    print("Debug: Listen Timeout.")
-                    return ""
+                    logger.debug("Listen timeout.")
+                    self.read_pos = self.ring.write_pos
+                    return self.ring.span(0, 0)
 
                 # Check for Phrase Time Limit (max duration of recording)
-                if phrase_time_limit and elapsed > phrase_time_limit:
-                    print("Debug: Max Phrase Time Reached.")
+                if now >= limit_at:
+                    logger.debug("Max phrase time reached.")
                     break
-                
-                time.sleep(0.1)
-                
-        print("Processing Audio...")
+
+                deadline = limit_at
+                if timeout_at and not self.heard_speech:
+                    deadline = min(deadline, timeout_at)
+
+                if on_audio:
+                    self.data_ready.wait(max(deadline - now, 0))
+                    self.data_ready.clear()
+                    write_pos = self.ring.write_pos
+                    if write_pos > fed_pos:
+                        done = on_audio(self.ring.span(fed_pos, write_pos))
+                        fed_pos = write_pos
+                        if done:
+                            logger.debug("Utterance ended early by stream consumer.")
+                            break
+                else:
+                    self.stop_event.wait(max(deadline - now, 0))
+        finally:
+            self.recording = False
+
+        # End of speech as the VAD saw it, otherwise when we stopped recording
+        metrics.mark("speech_end", at=self.speech_end_time or time.time())
+        end_pos = self.ring.write_pos
+        lost = (end_pos - self.capture_start) - self.ring.capacity
+        if lost > 0:
+            self.dropped_samples += lost
+        self.read_pos = end_pos
+        return self.ring.span(self.capture_start, end_pos)
+
+    def wait_for_wake_word(self, detector, timeout=None):
+        """
+        Runs the keyword spotter on the live stream without any STT.
+        Returns True once it fires; the next capture starts right after the wake word.
+        """
+        self.open()
+        self.stop_event.clear()
+        start = time.time()
+        window_seconds = detector.window_samples / float(SAMPLE_RATE)
+
+        while not self.stop_event.is_set():
+            if timeout and time.time() - start > timeout:
+                break
+
+            # Only score windows that contain sound; silence costs nothing
+            if time.time() - self.last_sound_time < window_seconds:
+                now_pos = self.ring.write_pos
+                if detector.process(self.ring.span(now_pos - detector.window_samples, now_pos)):
+                    logger.debug("Wake word detector fired (score %.2f).", detector.last_score)
+                    self.read_pos = now_pos
+                    return True
+
+            # Paced by the detector's hop (its CPU budget); returns at once on stop()
+            self.stop_event.wait(detector.hop_seconds)
+
+        self.read_pos = self.ring.write_pos
+        return False
+
+    def listen(self, timeout=None, phrase_time_limit=None, on_partial=None):
+        """
+        Records audio until silence is detected.
+        Returns the recognized text.
+        With on_partial, partial hypotheses are decoded while audio is still
+        arriving (if the STT engine can stream) and the latest one ("" until
+        there is one) is passed to on_partial(text) after every chunk, changed
+        or not, so the callback can time how long it has been stable, silence
+        included. Returning True ends the utterance without waiting for the
+        silence timeout.
+        """
+        stt = self.get_stt()
+        stream = None
+        on_audio = None
+        if on_partial and stt.supports_streaming:
+            stream = stt.create_stream(SAMPLE_RATE)
+            latest = [""]
+
+            def on_audio(chunk):
+                partial = stream.feed(chunk)
+                if partial is not None:
+                    latest[0] = partial
+                return on_partial(latest[0])
+
+        samples = self.capture(timeout=timeout, phrase_time_limit=phrase_time_limit, on_audio=on_audio)
+        logger.debug("Processing audio...")
         
-        if not self.frames:
+        if not len(samples):
             return ""
 
-        # Convert frames to AudioData for SpeechRecognition
-        audio_data = np.concatenate(self.frames, axis=0)
-        
-        # Scale to 16-bit integers
-        audio_data_int = (audio_data * 32767).astype(np.int16)
-        
-        # Create Bytes Buffer
-        byte_io = io.BytesIO()
-        wav.write(byte_io, SAMPLE_RATE, audio_data_int)
-        byte_data = byte_io.getvalue()
-        
-        # Use SpeechRecognition to process the WAV data
-        r = sr.Recognizer()
-        with sr.AudioFile(io.BytesIO(byte_data)) as source:
-            audio = r.record(source)
-            try:
-                command = r.recognize_google(audio)
-                print(f"User: {command}")
-                return command
-            except sr.UnknownValueError:
-                print("Debug: Audio not understood.")
-                return ""
-            except sr.RequestError as e:
-                print(f"Debug: Request Error; {e}")
-                return ""
+        metrics.mark("stt_start", overwrite=True)
+        if stream:
+            command = stream.finish(samples)
+        else:
+            command = stt.recognize(samples, SAMPLE_RATE)
+        metrics.mark("stt_end", overwrite=True)
+        if command:
+            logger.info("User: %s", command)
+        return command
@@ -0,0 +1,200 @@
+import logging
+import os
+import queue
+import threading
+import itertools
+import time
+from collections import deque
+
+from .pipeline import Job
+from .intent_router import AUTOMATION_PATTERN
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Worker pool for typed (websocket) commands.
+# A fixed number of workers drain one priority queue, so a client sending
+# quickly can't spawn unbounded threads or LLM calls. Each client may only
+# have a few commands pending; repeats of a pending command are coalesced.
+
+COMMAND_WORKERS = int(os.getenv("COMMAND_WORKERS", "2"))
+MAX_PENDING_PER_CLIENT = int(os.getenv("MAX_PENDING_PER_CLIENT", "3"))
+MAX_QUEUED_COMMANDS = 32
+
+# Lower runs first
+PRIORITY_CONVERSATION = 0
+PRIORITY_AUTOMATION = 1
+
+
+def command_priority(text):
+    """Cheap guess made before parsing: chat replies are quick, automation can take seconds."""
+    return PRIORITY_AUTOMATION if AUTOMATION_PATTERN.search(text) else PRIORITY_CONVERSATION
+
+
+class CommandJob(Job):
+    def __init__(self, text, client):
+        super().__init__(text, source="text", trace=metrics.Trace("text"))
+        self.trace.retain()
+        self.client = client
+        self.priority = command_priority(text)
+        self.started = None
+        self.status = "queued"
+
+
+class CommandWorkerPool:
+    def __init__(self, handler, on_event=None, workers=COMMAND_WORKERS,
+                 max_per_client=MAX_PENDING_PER_CLIENT, maxsize=MAX_QUEUED_COMMANDS):
+        self.handler = handler      # handler(job), blocking
+        self.on_event = on_event    # on_event(job, status) for "queued", "started", "done", ...
+        self.workers = workers
+        self.max_per_client = max_per_client
+        self.queue = queue.PriorityQueue(maxsize=maxsize)
+        self.order = itertools.count()   # FIFO within a priority
+        self.lock = threading.Lock()
+        self.jobs = {}              # id -> job, queued or running
+        self.threads = []
+
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self.waits = deque(maxlen=100)   # Seconds spent queued, recent jobs
+
+    def start(self):
+        with self.lock:
+            if self.threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"command-worker-{i}", daemon=True)
+                t.start()
+                self.threads.append(t)
+
+    def stop(self):
+        self.cancel_all()
+        with self.lock:
+            threads, self.threads = self.threads, []
+        # Everything queued was just cancelled; drop it so the stop markers fit in a full queue
+        while True:
+            try:
+                _, _, job = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                self._forget(job)
+        for _ in threads:
+            try:
+                self.queue.put_nowait((-1, next(self.order), None))
+            except queue.Full:
+                logger.warning("Command queue refilled while stopping; %d worker(s) left running", len(threads))
+                break
+
+    def submit(self, text, client=None):
+        """
+        Queues a command. Returns (job, status), status being "queued",
+        "coalesced" (an identical command is already pending, that job is
+        returned) or "rejected" (job is None).
+        """
+        self.start()
+        text = text.strip()
+        with self.lock:
+            pending = [j for j in self.jobs.values() if j.client == client and not j.cancelled.is_set()]
+            for job in pending:
+                if job.text.lower() == text.lower():
+                    self.coalesced += 1
+                    return job, "coalesced"
+            if len(pending) >= self.max_per_client:
+                self.rejected += 1
+                return None, "rejected"
+
+            job = CommandJob(text, client)
+            try:
+                self.queue.put_nowait((job.priority, next(self.order), job))
+            except queue.Full:
+                self.rejected += 1
+                return None, "rejected"
+            self.jobs[job.id] = job
+        self._emit(job, "queued")
+        return job, "queued"
+
+    def cancel(self, job_id):
+        """Cancels a queued or running command (a running one stops before its next intent)."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return False
+        if not job.cancelled.is_set():
+            job.cancel()
+            self.cancelled += 1
+            self._emit(job, "cancelled")
+        return True
+
+    def cancel_all(self, client=None):
+        with self.lock:
+            jobs = [j for j in self.jobs.values() if client is None or j.client == client]
+        return sum(self.cancel(job.id) for job in jobs)
+
+    def _emit(self, job, status):
+        job.status = status
+        if self.on_event:
+            try:
+                self.on_event(job, status)
+            except Exception as e:
+                logger.warning("Command event callback failed: %s", e)
+
+    def _run(self):
+        while True:
+            _, _, job = self.queue.get()
+            if job is None:
+                break
+            if job.cancelled.is_set():
+                self._forget(job)
+                continue
+
+            job.started = time.time()
+            job.trace.mark("queued", at=job.created)
+            job.trace.mark("started", at=job.started)
+            with self.lock:
+                self.waits.append(job.started - job.created)
+                self.running += 1
+            self._emit(job, "started")
+            try:
+                with metrics.activate(job.trace):
+                    self.handler(job)
+            except Exception as e:
+                logger.exception("Error processing command '%s': %s", job.text, e)
+            finally:
+                with self.lock:
+                    self.running -= 1
+                    self.completed += 1
+                if not job.cancelled.is_set():
+                    self._emit(job, "done")
+                self._forget(job)
+
+    def _forget(self, job):
+        job.done.set()
+        with self.lock:
+            self.jobs.pop(job.id, None)
+        job.trace.release()
+
+    def stats(self):
+        with self.lock:
+            queued = [j for j in self.jobs.values() if j.started is None and not j.cancelled.is_set()]
+            waits = sorted(self.waits)
+            now = time.time()
+            return {
+                "workers": self.workers,
+                "depth": len(queued),
+                "depth_by_priority": {
+                    "conversation": sum(1 for j in queued if j.priority == PRIORITY_CONVERSATION),
+                    "automation": sum(1 for j in queued if j.priority == PRIORITY_AUTOMATION),
+                },
+                "oldest_wait": round(max((now - j.created for j in queued), default=0.0), 3),
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "coalesced": self.coalesced,
+                "cancelled": self.cancelled,
+                "wait_avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "wait_p95": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+            }
@@ -0,0 +1,137 @@
+import logging
+import os
+import json
+import asyncio
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# Websocket fan-out.
+# A message is serialized once and handed to every client's own bounded
+# outbound queue; a sender task per client does the actual (slow) writing.
+# broadcast() therefore never waits on a socket, and one stale client can't
+# hold up state/log updates to the others.
+
+CLIENT_QUEUE_SIZE = int(os.getenv("WS_CLIENT_QUEUE_SIZE", "64"))
+SEND_TIMEOUT = 5.0
+
+# Message types that are fine to lose (the next one supersedes them).
+# When a client falls behind, its queued ones are discarded first.
+DROPPABLE_TYPES = {"volume"}
+
+
+class ClientConnection:
+    def __init__(self, websocket: WebSocket, maxsize=CLIENT_QUEUE_SIZE):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.task = None
+        self.sent = 0
+        self.dropped = 0
+
+    def offer(self, text, droppable):
+        """Queues a serialized message (str or bytes). Returns False if the client can't keep up."""
+        try:
+            self.queue.put_nowait((text, droppable))
+            return True
+        except asyncio.QueueFull:
+            pass
+        # Behind: queued telemetry is stale anyway, discard it to make room
+        kept = []
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if item[1]:
+                self.dropped += 1
+            else:
+                kept.append(item)
+        for item in kept:
+            self.queue.put_nowait(item)
+        try:
+            self.queue.put_nowait((text, droppable))
+            return True
+        except asyncio.QueueFull:
+            if droppable:
+                self.dropped += 1
+                return True
+            return False   # Full of state/log messages: the client is stale
+
+
+class ConnectionManager:
+    def __init__(self, queue_size=CLIENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.clients: dict[WebSocket, ClientConnection] = {}
+        self.evicted = 0
+
+    @property
+    def active_connections(self):
+        return list(self.clients)
+
+    async def connect(self, websocket: WebSocket):
+        await websocket.accept()
+        client = ClientConnection(websocket, self.queue_size)
+        client.task = asyncio.create_task(self._sender(client))
+        self.clients[websocket] = client
+
+    def disconnect(self, websocket: WebSocket):
+        """Safe to call more than once (the endpoint and the sender may both notice)."""
+        client = self.clients.pop(websocket, None)
+        if client and client.task and client.task is not asyncio.current_task():
+            client.task.cancel()
+        return client is not None
+
+    async def broadcast(self, message: dict):
+        if not self.clients:
+            return
+        text = json.dumps(message)
+        droppable = message.get("type") in DROPPABLE_TYPES
+        for client in list(self.clients.values()):
+            if not client.offer(text, droppable):
+                logger.warning("Websocket client fell behind by %d messages, disconnecting it.", client.queue.qsize())
+                self._evict(client)
+
+    async def broadcast_bytes(self, data: bytes, droppable=True):
+        """Binary fan-out (telemetry frames). Same queues and drop policy as broadcast()."""
+        for client in list(self.clients.values()):
+            if not client.offer(data, droppable):
+                self._evict(client)
+
+    async def send(self, websocket: WebSocket, message: dict):
+        """Sends to one client through its queue."""
+        client = self.clients.get(websocket)
+        if client and not client.offer(json.dumps(message), message.get("type") in DROPPABLE_TYPES):
+            self._evict(client)
+
+    async def _sender(self, client):
+        try:
+            while True:
+                payload, _ = await client.queue.get()
+                if isinstance(payload, bytes):
+                    await asyncio.wait_for(client.websocket.send_bytes(payload), SEND_TIMEOUT)
+                else:
+                    await asyncio.wait_for(client.websocket.send_text(payload), SEND_TIMEOUT)
+                client.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info("Send failed, dropping websocket client: %r", e)
+            self._evict(client)
+
+    def _evict(self, client):
+        if self.disconnect(client.websocket):
+            self.evicted += 1
+            asyncio.ensure_future(self._close(client.websocket))
+
+    async def _close(self, websocket):
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass  # Already gone
+
+    def stats(self):
+        return {
+            "clients": len(self.clients),
+            "evicted": self.evicted,
+            "queues": [
+                {"queued": c.queue.qsize(), "sent": c.sent, "dropped": c.dropped}
+                for c in self.clients.values()
+            ],
+        }
@@ -0,0 +1,139 @@
+import os
+import json
+import logging
+import threading
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Conversation context for the LLM prompt.
+# History keeps a compact form of each reply (the intents with long texts
+# cut short) instead of the raw JSON, and the prompt is kept under a token
+# budget: when the recent turns don't fit, the oldest ones are folded into a
+# short running summary. The system prompt always goes first, unchanged, so
+# providers that cache prompt prefixes can reuse it.
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "2500"))
+SUMMARY_TOKEN_BUDGET = 300      # The running summary drops its oldest lines past this
+MAX_HISTORY_MESSAGES = 10       # Recent messages sent verbatim (5 turns)
+MAX_TEXT_CHARS = 240            # Longer responses / email bodies are cut in history
+MESSAGE_OVERHEAD = 4            # Role and separators per chat message
+
+SUMMARY_HEADER = "Summary of the earlier conversation (oldest first):"
+
+
+def estimate_tokens(text):
+    """Rough local count (~4 characters per token for English and JSON)."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def message_tokens(messages):
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages)
+
+
+def _shorten(text, limit=MAX_TEXT_CHARS):
+    return text if len(text) <= limit else text[:limit].rstrip() + "..."
+
+
+def compact_reply(intents, content):
+    """What the history keeps of a reply: the intents as compact JSON, long texts shortened."""
+    if not isinstance(intents, list) or not all(isinstance(i, dict) for i in intents):
+        return _shorten(content or "")
+    compact = []
+    for intent in intents:
+        intent = {k: v for k, v in intent.items() if k != "streamed" and not (k == "expect_reply" and not v)}
+        if isinstance(intent.get("response"), str):
+            intent["response"] = _shorten(intent["response"])
+        if isinstance(intent.get("params"), dict):
+            intent["params"] = {k: _shorten(v) if isinstance(v, str) else v for k, v in intent["params"].items()}
+        compact.append(intent)
+    # Still valid JSON, so the model keeps answering in the same format
+    return json.dumps(compact, separators=(",", ":"), ensure_ascii=False)
+
+
+def summarize_turn(user, reply):
+    """One line for the running summary."""
+    try:
+        intents = json.loads(reply)
+    except ValueError:
+        intents = None
+    if not isinstance(intents, list):
+        return f"- User: {_shorten(user, 80)} -> {_shorten(reply, 80)}"
+    done = []
+    for intent in intents:
+        if not isinstance(intent, dict):
+            continue
+        if intent.get("service") == "conversational":
+            done.append(f'said "{_shorten(intent.get("response", ""), 80)}"')
+        else:
+            params = ", ".join(f"{v}" for v in (intent.get("params") or {}).values())
+            done.append(f"{intent.get('action', intent.get('service'))}({_shorten(params, 60)})")
+    return f"- User: {_shorten(user, 80)} -> {'; '.join(done) or 'nothing'}"
+
+
+class ConversationContext:
+    def __init__(self, history, budget=PROMPT_TOKEN_BUDGET):
+        self.history = history      # Chat messages, shared with llm.CHAT_HISTORY
+        self.budget = budget
+        self.summary = []           # Lines for turns that no longer fit
+        # Commands are parsed on several threads; every read or change of
+        # history and summary goes through this lock
+        self.lock = threading.Lock()
+
+    def remember(self, user, intents, content):
+        reply = {"role": "assistant", "content": compact_reply(intents, content)}
+        with self.lock:
+            self.history.append({"role": "user", "content": user})
+            self.history.append(reply)
+
+    def clear(self):
+        with self.lock:
+            self.history.clear()
+            self.summary = []
+
+    def snapshot(self):
+        """Copy of the history, safe to read while other commands are parsed."""
+        with self.lock:
+            return list(self.history)
+
+    def _fold_oldest(self):
+        # Caller holds self.lock
+        user = self.history.pop(0)
+        if user["role"] != "user":
+            return  # Stray message, nothing to summarise
+        reply = self.history.pop(0)["content"] if self.history and self.history[0]["role"] == "assistant" else ""
+        self.summary.append(summarize_turn(user["content"], reply))
+        while len(self.summary) > 1 and estimate_tokens("\n".join(self.summary)) > SUMMARY_TOKEN_BUDGET:
+            self.summary.pop(0)
+
+    def _summary_messages(self):
+        if not self.summary:
+            return []
+        return [{"role": "system", "content": SUMMARY_HEADER + "\n" + "\n".join(self.summary)}]
+
+    def build(self, system_prompt, command):
+        """Messages for the next request, kept under the budget. Returns (messages, estimated tokens)."""
+        head = [{"role": "system", "content": system_prompt}]
+        tail = [{"role": "user", "content": command}]
+        fixed = message_tokens(head) + message_tokens(tail)
+
+        with self.lock:
+            while len(self.history) > MAX_HISTORY_MESSAGES:
+                self._fold_oldest()
+            while self.history and fixed + message_tokens(self._summary_messages()) + message_tokens(self.history) > self.budget:
+                self._fold_oldest()
+            summary = self._summary_messages()
+            history = list(self.history)
+
+        messages = head + summary + history + tail
+        tokens = message_tokens(messages)
+        logger.info("Prompt ~%d tokens (system %d, summary %d, %d history messages, command %d)",
+                    tokens, message_tokens(head), message_tokens(summary), len(history), message_tokens(tail))
+        metrics.registry.observe("assistant_prompt_tokens", tokens)
+        if tokens > self.budget:
+            logger.warning("Prompt is over the %d token budget even without history", self.budget)
+        return messages, tokens
+
+
+metrics.registry.describe("assistant_prompt_tokens", "Estimated prompt tokens per LLM request.")
@@ -1,20 +1,23 @@
+import logging
 import time
 import threading
 import json
 import asyncio
 from typing import Optional, Callable
-import difflib
 
 from .audio import speak, AudioRecorder
+from .tts import tts_worker
 from .llm import parse_command
+from .pipeline import CommandPipeline
+from .wakeword import WakeWordDetector, WakeWordMatcher, WAKE_WORD_ENGINE
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
 # Removed circular import: from .main import execute_single_intent, send_ui_update, send_ui_log, manager
 
-# Wake word configuration
-WAKE_WORDS = [
-    "hyy gimi", "hey gimme", "hi gimme", "hey jimmy", "hi jimmy", "hey gimi", "high give me",
-    "hey google", "hi google", "rajini", "genie", "hey genie", "jimmy"
-]
-WAKE_WORD_THRESHOLD = 0.8 # Confidence for difflib
+STOP_COMMANDS = {"stop", "cancel", "never mind", "nevermind", "be quiet", "shut up", "stop it"}
+STABLE_PARTIAL_SECONDS = 0.4 # A partial transcript unchanged this long is treated as the end of the utterance
 
 class AssistantLoop:
     def __init__(self):
@@ -22,21 +25,31 @@ class AssistantLoop:
         self.state = "IDLE" # IDLE, LISTENING, PROCESSING, SPEAKING
         self.thread: Optional[threading.Thread] = None
         self.recorder = AudioRecorder(volume_callback=self._volume_callback)
-        self.loop_delay = 0.1
+        self.wake_detector: Optional[WakeWordDetector] = None
+        self.wake_matcher = WakeWordMatcher()
+        self.error_backoff = 1.0  # Only used after an unexpected error; the loop itself never sleeps
         self.main_loop: Optional[asyncio.AbstractEventLoop] = None
-        self.should_follow_up = False
+        self.pipeline = CommandPipeline(parse=self._parse_job, execute=self._execute_job,
+                                        on_error=self._job_failed)
+        self.partial_text = ""
+        self.partial_since = 0.0
+        self.last_trace = None  # Timeline of the utterance heard last
         
         # Dependencies injected at runtime
         self.ui_update_callback = None
         self.ui_log_callback = None
         self.intent_executor = None
+        self.turn_factory = None
         self.ws_manager = None
+        self.telemetry = None
     
-    def set_dependencies(self, ui_update_cb, ui_log_cb, intent_exec_cb, ws_manager):
+    def set_dependencies(self, ui_update_cb, ui_log_cb, intent_exec_cb, ws_manager, telemetry=None, turn_factory=None):
         self.ui_update_callback = ui_update_cb
         self.ui_log_callback = ui_log_cb
         self.intent_executor = intent_exec_cb
+        self.turn_factory = turn_factory  # turn_factory(cancelled=...) -> StreamedTurn, runs intents while they stream in
         self.ws_manager = ws_manager
+        self.telemetry = telemetry
 
     def start(self, main_loop):
         """Starts the main assistant loop in a background thread."""
@@ -45,27 +58,79 @@ class AssistantLoop:
         
         self.running = True
         self.main_loop = main_loop
+        if WAKE_WORD_ENGINE == "kws":
+            try:
+                self.wake_detector = WakeWordDetector().load_templates()
+            except Exception as e:
+                logger.error("Error loading wake word templates: %s", e)
+            if not (self.wake_detector and self.wake_detector.enabled):
+                logger.warning("Wake word detector has no templates, falling back to STT wake word.")
+                self.wake_detector = None
+        self.pipeline.start()
+        # Load the voice and pre-synthesize the fixed phrases before the first wake word
+        tts_worker.start()
+        # Open the microphone once; every listen() consumes the same stream.
+        try:
+            self.recorder.open()
+        except Exception as e:
+            logger.error("Error opening audio input: %s", e)
         self.thread = threading.Thread(target=self._run_loop, daemon=True)
         self.thread.start()
-        print("Assistant Core Loop Started.")
+        logger.info("Assistant core loop started.")
 
     def stop(self):
         """Stops the loop."""
         self.running = False
+        self.pipeline.stop()
+        self.recorder.close()  # Also wakes a blocked listen()
         if self.thread:
             self.thread.join(timeout=2)
-        print("Assistant Core Loop Stopped.")
+        logger.info("Assistant core loop stopped. Audio stats: %s", self.recorder.stats())
 
-    def _volume_callback(self, amplitude):
-        """Passes volume updates to the UI."""
-        if int(time.time() * 100) % 4 != 0:
+    def set_state(self, state):
+        """
+        Switches state from another thread (e.g. the UI forcing LISTENING).
+        Interrupts the current listen so the loop reacts right away instead of
+        after the idle capture times out.
+        """
+        if self.state == state:
             return
+        self.state = state
+        self.recorder.stop()
+
+    def _volume_callback(self, amplitude):
+        """Passes volume updates to the UI. Runs on the audio thread, so it only stores the value."""
+        if self.telemetry:
+            self.telemetry.update(amplitude)
 
-        if self.main_loop and self.main_loop.is_running() and self.ws_manager:
-             asyncio.run_coroutine_threadsafe(
-                self.ws_manager.broadcast({"type": "volume", "level": float(amplitude)}), 
-                self.main_loop
-            )
+    def _listen(self, timeout, phrase_time_limit):
+        """Listens with streaming partials; a stable partial ends the utterance early."""
+        self.partial_text = ""
+        self.partial_since = time.time()
+        # Each utterance starts a trace; it only gets reported if it becomes a command
+        self.last_trace = metrics.Trace("voice")
+        with metrics.activate(self.last_trace):
+            return self.recorder.listen(timeout=timeout, phrase_time_limit=phrase_time_limit,
+                                        on_partial=self._on_partial)
+
+    def _on_partial(self, text):
+        """Publishes partial transcripts to the UI. Returns True once the partial is stable."""
+        now = time.time()
+        if text != self.partial_text:
+            self.partial_text = text
+            self.partial_since = now
+            if self.ui_log_callback:
+                self.ui_log_callback(text, "partial")
+            return False
+
+        if now - self.partial_since < STABLE_PARTIAL_SECONDS:
+            return False
+
+        if self.state == "IDLE":
+            # Only cut early for a wake word; other chatter just runs to silence
+            is_wake, _ = self._check_wake_word_and_extract(text)
+            return is_wake
+        return len(text.strip()) > 3
 
     def _run_loop(self):
         """The main logic loop."""
@@ -73,67 +138,107 @@ class AssistantLoop:
             self.ui_update_callback("idle", "Waiting for 'Hey Genie'...")
 
         while self.running:
-            if self.state == "IDLE":
-                self._handle_idle_state()
-            
-            elif self.state == "LISTENING":
-                self._handle_active_listening()
+            try:
+                if self.state == "IDLE":
+                    self._handle_idle_state()
                 
-            elif self.state == "FOLLOW_UP":
-                # Same as listening but we might have a different UI state or log
-                self._handle_active_listening()
+                elif self.state == "LISTENING":
+                    self._handle_active_listening()
+                    
+                elif self.state == "FOLLOW_UP":
+                    # Same as listening but we might have a different UI state or log
+                    self._handle_active_listening()
 
-            elif self.state == "PROCESSING":
+                elif self.state == "PROCESSING":
+                    self.state = "IDLE"
+            except Exception as e:
+                logger.exception("Error in assistant loop: %s", e)
                 self.state = "IDLE"
-            
-            time.sleep(self.loop_delay)
+                # Avoid spinning if the device is gone
+                time.sleep(self.error_backoff)
 
     def _handle_idle_state(self):
         """
         Continuously listens for Wake Word.
         """
-        # print("DEBUG: Listening for wake word...") 
+        if self.wake_detector:
+            self._handle_idle_kws()
+            return
+
+        # logger.debug("Listening for wake word...")
         # Using a timeout to allow the loop to check self.running
         # But for wake word, we want to catch it even if said quickly.
         # phrase_time_limit=8 ensures we don't record forever if silence detection fails, but VAD should handle it.
-        text = self.recorder.listen(timeout=2, phrase_time_limit=10)
+        text = self._listen(timeout=2, phrase_time_limit=10)
         
-        if not text:
+        if not text or self.state != "IDLE":
+            # Nothing heard, or interrupted by set_state()
             return 
 
-        print(f"DEBUG: Heard in IDLE: {text}")
+        logger.debug("Heard in IDLE: %s", text)
         
         is_wake, remainder = self._check_wake_word_and_extract(text)
         
         if is_wake:
-            print(f"WAKE WORD DETECTED! Remainder: '{remainder}'")
+            logger.info("Wake word detected! Remainder: '%s'", remainder)
+            tts_worker.interrupt()  # Barge-in: the user talks over us
             if self.ui_update_callback:
                  self.ui_update_callback("listening", "Listening...")
 
             # Check if there is already a command
             if remainder and len(remainder.strip()) > 3:
-                print("DEBUG: Immediate command detected.")
+                logger.debug("Immediate command detected.")
                  # Process immediately
                 self._process_text(remainder)
-                # State transition handling is done in _process_text via should_follow_up
+                # The execute stage switches to FOLLOW_UP itself if a reply is expected
             else:
                 # Wake word only. Enter Active Listening.
-                speak("Yes?")
+                self._acknowledge()
                 self.state = "LISTENING"
         else:
             # Not a wake word, ignore.
             pass
 
+    def _handle_idle_kws(self):
+        """
+        Wake word via the frame-level detector. Full STT only runs after it fires.
+        """
+        if not self.recorder.wait_for_wake_word(self.wake_detector, timeout=2) or self.state != "IDLE":
+            return
+
+        logger.info("Wake word detected! %s", self.wake_detector.stats())
+        tts_worker.interrupt()  # Barge-in: the user talks over us
+        if self.ui_update_callback:
+            self.ui_update_callback("listening", "Listening...")
+
+        # The command usually follows straight on; give it a short window first
+        self.state = "LISTENING"
+        text = self._listen(timeout=1.5, phrase_time_limit=20)
+        if text:
+            # The recognizer may still have caught the tail of the wake word
+            is_wake, remainder = self._check_wake_word_and_extract(text)
+            if is_wake:
+                text = remainder
+        if text and len(text.strip()) > 3:
+            self._process_text(text)
+        else:
+            self._acknowledge()
+
+    def _acknowledge(self):
+        """Says "Yes?" (cached, starts instantly) and keeps it out of the next capture."""
+        speak("Yes?").wait(timeout=2)
+        self.recorder.skip_pending()
+
     def _handle_active_listening(self):
         """
         Active command capture. Records until silence (VAD).
         """
-        print("DEBUG: Active Listening...")
+        logger.debug("Active listening...")
         if self.ui_update_callback:
              self.ui_update_callback("listening", "Listening...")
         
         # High phrase_time_limit allow long commands
-        text = self.recorder.listen(timeout=5, phrase_time_limit=20)
+        text = self._listen(timeout=5, phrase_time_limit=20)
         
         if not text:
             # If we were in follow up and heard nothing, maybe give up or ask one more time?
@@ -149,87 +254,92 @@ class AssistantLoop:
         self._process_text(text)
 
     def _process_text(self, text):
-        """Helper to process a command text."""
+        """
+        Hands a command to the pipeline and returns right away, so the loop
+        keeps listening (for "stop" or the next wake word) while it runs.
+        """
+        if self._is_stop_command(text):
+            logger.debug("Stop command, cancelling in-flight work.")
+            self.pipeline.cancel_all()
+            tts_worker.interrupt()
+            self.state = "IDLE"
+            if self.ui_update_callback:
+                self.ui_update_callback("idle", "Waiting for 'Hey Genie'...")
+            return
+
         if self.ui_update_callback:
             self.ui_update_callback("thinking", "Thinking...")
         if self.ui_log_callback:
             self.ui_log_callback(f"User (Voice): {text}", "user")
-        
-        # Reset follow up flag
-        self.should_follow_up = False
-        
+
         self.state = "PROCESSING"
-        try:
-            intents = parse_command(text)
-            
-            # Check for follow up flag in intents
-            if isinstance(intents, list):
-                for intent in intents:
-                    if intent.get("expect_reply", False):
-                        self.should_follow_up = True
-                        print("DEBUG: Intent requires follow-up.")
-            elif isinstance(intents, dict):
-                 if intents.get("expect_reply", False):
-                        self.should_follow_up = True
-
-            # Execute
-            if self.intent_executor:
-                if isinstance(intents, list):
-                    for intent in intents:
-                        self.intent_executor(intent)
-                else:
-                    self.intent_executor(intents)
-            
-            # Determine next state
-            if self.should_follow_up:
-                print("DEBUG: Switching to FOLLOW_UP state.")
-                self.state = "FOLLOW_UP"
-                # UI might stay "Listening" or "Thinking" -> "Listening"
-                # The execution (speak) happens in intent_executor. 
-                # After that, we want to be listening again.
-            else:
-                self.state = "IDLE"
-                if self.ui_update_callback:
-                    self.ui_update_callback("idle", "Waiting for 'Hey Genie'...")
+        if self.pipeline.submit(text, trace=self.last_trace) is None:
+            speak("I'm still working on your last requests.")
+        self.state = "IDLE"
 
-        except Exception as e:
-            if self.ui_log_callback:
-                self.ui_log_callback(f"Error processing command: {e}", "error")
-            speak("Sorry, I had trouble understanding that.")
-            self.state = "IDLE"
-            if self.ui_update_callback:
-                self.ui_update_callback("idle", "Waiting for 'Hey Genie'...")
+    def _is_stop_command(self, text):
+        return text.lower().strip(" .!?") in STOP_COMMANDS
+
+    def _parse_job(self, job):
+        """
+        Pipeline stage: text -> intents. With a turn factory the intents
+        already start (and replies are spoken) while the LLM is still streaming.
+        """
+        job.turn = None
+        if self.turn_factory:
+            job.turn = self.turn_factory(cancelled=job.cancelled)
+            try:
+                intents = parse_command(job.text, on_intent=job.turn.add, on_sentence=job.turn.say)
+            except Exception:
+                job.turn.close([])
+                raise
+            job.turn.close(intents)
+        else:
+            intents = parse_command(job.text)
+        job.intents = intents if isinstance(intents, list) else [intents]
+
+    def _execute_job(self, job):
+        """Pipeline stage: runs the intents, then decides whether to wait for a reply."""
+        should_follow_up = any(intent.get("expect_reply", False) for intent in job.intents)
+        if should_follow_up:
+            logger.debug("Intent requires follow-up.")
+
+        if getattr(job, "turn", None):
+            job.turn.wait()
+        elif self.intent_executor:
+            # Runs independent intents concurrently; skips the rest if the job is cancelled
+            self.intent_executor(job.intents, cancelled=job.cancelled)
+        if job.cancelled.is_set():
+            logger.debug("%s cancelled.", job)
+            return
+
+        # Determine next state
+        if should_follow_up:
+            logger.debug("Switching to FOLLOW_UP state.")
+            # Let the question finish before listening for the answer
+            tts_worker.wait_idle(timeout=30)
+            if job.cancelled.is_set():
+                return
+            self.recorder.skip_pending()
+            self.set_state("FOLLOW_UP")
+        elif self.ui_update_callback and not self.pipeline.busy_except(job):
+            self.ui_update_callback("idle", "Waiting for 'Hey Genie'...")
+
+    def _job_failed(self, job, error):
+        if self.ui_log_callback:
+            self.ui_log_callback(f"Error processing command: {error}", "error")
+        speak("Sorry, I had trouble understanding that.")
+        if self.ui_update_callback:
+            self.ui_update_callback("idle", "Waiting for 'Hey Genie'...")
 
     def _check_wake_word_and_extract(self, text: str) -> tuple[bool, str]:
         """
         Checks for wake word. Returns (True, remainder_string) if found.
         """
-        text_lower = text.lower().strip()
-        
-        # 1. Direct substring check
-        for ww in WAKE_WORDS:
-            if ww in text_lower:
-                parts = text_lower.split(ww, 1)
-                remainder = parts[1].strip() if len(parts) > 1 else ""
-                return True, remainder
-                
-        # 2. Fuzzy check (difflib) for short phrases
-        words = text.split()
-        if not words: return False, ""
-        
-        # Check first 2-3 words
-        candidate_phrase = " ".join(words[:3]).lower()
-        
-        for ww in WAKE_WORDS:
-            ratio = difflib.SequenceMatcher(None, ww, candidate_phrase).ratio()
-            if ratio >= WAKE_WORD_THRESHOLD:
-                # Heuristic: assume whole text is relevant if it was short, 
-                # or we effectively triggered. 
-                # For fuzzy, hard to separate remainder cleanly without more logic.
-                # Let's return empty remainder to force "Active Listening" phase, which is safer.
-                return True, ""
-        
-        return False, ""
+        return self.wake_matcher.match(text)
+
+    def _is_wake_word(self, text: str) -> bool:
+        return self.wake_matcher.match(text)[0]
 
 # Global instance
 core_loop = AssistantLoop()
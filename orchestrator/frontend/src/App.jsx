@@ -5,6 +5,26 @@ import { Button } from "@/components/ui/button"
 import ParticleSphere from "@/components/visual/ParticleSphere"
 import './index.css'
 
+// Multi-step commands now finish close together; space their chat entries out so each one is readable
+const LOG_PACING_MS = 400
+
+// Binary telemetry frames from /ws/telemetry (see orchestrator/telemetry.py):
+// uint8 version | uint8 kind | uint16 count | uint32 seq | count x float32, little-endian
+const FRAME_HEADER_BYTES = 8
+const KIND_VOLUME = 1
+const KIND_WAVEFORM = 2
+
+const decodeFrame = (buffer) => {
+    const view = new DataView(buffer)
+    const count = view.getUint16(2, true)
+    return {
+        version: view.getUint8(0),
+        kind: view.getUint8(1),
+        seq: view.getUint32(4, true),
+        samples: new Float32Array(buffer, FRAME_HEADER_BYTES, count),
+    }
+}
+
 function App() {
     const [theme, setTheme] = useState('dark')
     const [status, setStatus] = useState('idle')
@@ -12,7 +32,14 @@ function App() {
     const [messages, setMessages] = useState([])
     const [inputText, setInputText] = useState('')
     const [voiceLevel, setVoiceLevel] = useState(0)
+    const [partialText, setPartialText] = useState('')
+    const [pendingCommands, setPendingCommands] = useState([])
+    const [lastTiming, setLastTiming] = useState(null)
     const ws = useRef(null)
+    const telemetryWs = useRef(null)
+    const waveform = useRef(null)   // Latest Float32Array envelope, read by the sphere every animation frame
+    const logQueue = useRef([])
+    const logTimer = useRef(null)
     const messagesEndRef = useRef(null)
 
     useEffect(() => {
@@ -20,6 +47,24 @@ function App() {
         document.documentElement.classList.add(theme)
     }, [theme])
 
+    // Every change to the chat log goes through one paced queue, so entries keep their arrival order
+    const drainLogQueue = () => {
+        const update = logQueue.current.shift()
+        if (!update) {
+            logTimer.current = null
+            return
+        }
+        setMessages(update)
+        logTimer.current = setTimeout(drainLogQueue, LOG_PACING_MS)
+    }
+
+    const queueUpdate = (update) => {
+        logQueue.current.push(update)
+        if (!logTimer.current) drainLogQueue()
+    }
+
+    const pushMessage = (message) => queueUpdate(prev => [...prev, message])
+
     useEffect(() => {
         messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' })
     }, [messages])
@@ -37,19 +82,64 @@ function App() {
             if (data.type === 'state') {
                 setStatus(data.state)
                 setStatusText(data.message)
+                if (data.state === 'idle') setPartialText('')
             } else if (data.type === 'log') {
+                if (data.source === 'partial') {
+                    setPartialText(data.message)
+                    return
+                }
                 if (data.source === 'user') {
-                    setMessages(prev => [...prev, { text: data.message.replace('User said: ', ''), sender: 'user', time: new Date().toLocaleTimeString() }])
+                    setPartialText('')
+                    pushMessage({ text: data.message.replace('User said: ', ''), sender: 'user', time: new Date().toLocaleTimeString() })
+                } else if (data.source === 'stream') {
+                    // A reply arriving sentence by sentence: grow one chat entry per stream
+                    queueUpdate(prev => {
+                        const last = prev[prev.length - 1]
+                        if (last && last.stream === data.stream) {
+                            return [...prev.slice(0, -1), { ...last, text: `${last.text} ${data.message}` }]
+                        }
+                        return [...prev, { text: data.message, sender: 'system', stream: data.stream, time: new Date().toLocaleTimeString() }]
+                    })
                 } else if (data.source === 'system') {
-                    setMessages(prev => [...prev, { text: data.message, sender: 'system', time: new Date().toLocaleTimeString() }])
+                    pushMessage({ text: data.message, sender: 'system', time: new Date().toLocaleTimeString() })
                 } else if (data.source === 'error') {
-                    setMessages(prev => [...prev, { text: data.message, sender: 'error', time: new Date().toLocaleTimeString() }])
+                    pushMessage({ text: data.message, sender: 'error', time: new Date().toLocaleTimeString() })
+                }
+            } else if (data.type === 'command') {
+                if (data.status === 'queued') {
+                    setPendingCommands(prev => [...prev, { id: data.id, text: data.text }])
+                } else if (data.status === 'rejected') {
+                    pushMessage({ text: `Too many pending commands, dropped: ${data.text}`, sender: 'error', time: new Date().toLocaleTimeString() })
+                } else {
+                    // started, done or cancelled: no longer waiting
+                    setPendingCommands(prev => prev.filter(c => c.id !== data.id))
                 }
+            } else if (data.type === 'timing') {
+                setLastTiming(data)
             } else if (data.type === 'volume') {
+                // JSON fallback when the binary channel is not used
                 setVoiceLevel(Math.min(data.level * 25, 150));
             }
         }
-        return () => { if (ws.current) ws.current.close() }
+
+        telemetryWs.current = new WebSocket(`${protocol}//${host}/ws/telemetry`)
+        telemetryWs.current.binaryType = 'arraybuffer'
+        telemetryWs.current.onmessage = (event) => {
+            const frame = decodeFrame(event.data)
+            if (frame.kind === KIND_VOLUME && frame.samples.length) {
+                // Several levels per frame; the loudest one drives the orb
+                let level = 0
+                for (let i = 0; i < frame.samples.length; i++) level = Math.max(level, frame.samples[i])
+                setVoiceLevel(Math.min(level * 25, 150))
+            } else if (frame.kind === KIND_WAVEFORM) {
+                waveform.current = frame.samples
+            }
+        }
+        return () => {
+            if (ws.current) ws.current.close()
+            if (telemetryWs.current) telemetryWs.current.close()
+            clearTimeout(logTimer.current)
+        }
     }, [])
 
     const handleMicClick = () => {
@@ -63,6 +153,8 @@ function App() {
         setInputText('')
     }
 
+    const cancelCommand = (id) => ws.current.send(`cancel_command:${id}`)
+
     const toggleTheme = () => setTheme(prev => prev === 'dark' ? 'light' : 'dark')
 
     return (
@@ -93,7 +185,7 @@ function App() {
                 {/* THE ORB */}
                 <div className="flex-1 flex items-center justify-center relative z-10">
                     <div className="w-full h-full max-w-5xl max-h-[85vh]">
-                        <ParticleSphere amplitude={voiceLevel} status={status} theme={theme} />
+                        <ParticleSphere amplitude={voiceLevel} status={status} theme={theme} waveform={waveform} />
                     </div>
 
                     {/* Status Text - Centered & Glowing */}
@@ -114,6 +206,11 @@ function App() {
                                 {status === 'listening' ? "Listening..." : status === 'processing' ? "Processing..." : "Awaiting Command"}
                             </motion.h2>
                         </AnimatePresence>
+                        {partialText && (
+                            <p className={`mt-3 text-sm font-mono tracking-wide ${theme === 'dark' ? 'text-gray-400' : 'text-slate-500'}`}>
+                                {partialText}
+                            </p>
+                        )}
                     </div>
                 </div>
             </section>
@@ -160,6 +257,14 @@ function App() {
                                 </div>
                             </div>
                         </div>
+                        {lastTiming && (
+                            <div className="mt-4 text-[10px] font-mono opacity-60" title={`trace ${lastTiming.trace_id}`}>
+                                <div className="uppercase opacity-70 mb-1">Last turn {lastTiming.total.toFixed(2)}s</div>
+                                {Object.entries(lastTiming.stages).map(([stage, seconds]) => (
+                                    <span key={stage} className="mr-3">{stage} {(seconds * 1000).toFixed(0)}ms</span>
+                                ))}
+                            </div>
+                        )}
                     </div>
                 </div>
 
@@ -198,6 +303,20 @@ function App() {
                     <div ref={messagesEndRef} />
                 </div>
 
+                {/* Queued typed commands */}
+                {pendingCommands.length > 0 && (
+                    <div className="px-6 pb-2 space-y-2">
+                        {pendingCommands.map(cmd => (
+                            <div key={cmd.id} className="flex items-center justify-between gap-3 text-xs font-mono opacity-70">
+                                <span className="truncate">Queued: {cmd.text}</span>
+                                <Button variant="ghost" size="icon" onClick={() => cancelCommand(cmd.id)} className="rounded-full hover:bg-white/5 shrink-0">
+                                    <StopCircle size={14} />
+                                </Button>
+                            </div>
+                        ))}
+                    </div>
+                )}
+
                 {/* Floating Command Bar - Removed for Visualizer-Only Mode */}
                 {/* <div className="p-6 relative">...</div> */}
                 <div className="p-6 text-center opacity-30 text-[10px] uppercase tracking-widest font-mono">
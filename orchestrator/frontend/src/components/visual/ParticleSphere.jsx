@@ -1,6 +1,6 @@
 import React, { useRef, useEffect } from 'react';
 
-const ParticleSphere = ({ amplitude = 0, status = 'idle', theme = 'dark' }) => {
+const ParticleSphere = ({ amplitude = 0, status = 'idle', theme = 'dark', waveform = null }) => {
     const canvasRef = useRef(null);
 
     // Use refs to persist animation state across re-renders
@@ -178,6 +178,24 @@ const ParticleSphere = ({ amplitude = 0, status = 'idle', theme = 'dark' }) => {
                 }
             });
 
+            // Waveform ring around the orb while listening (waveform is a ref, so no re-render per frame)
+            const wave = waveform && waveform.current;
+            if (wave && wave.length && s.currentMix > 0.05) {
+                const ringRadius = baseRadius * 0.75 * s.currentExpansion;
+                ctx.beginPath();
+                for (let i = 0; i <= wave.length; i++) {
+                    const v = wave[i % wave.length];
+                    const angle = (i / wave.length) * Math.PI * 2 - Math.PI / 2;
+                    const r = ringRadius + v * 60;
+                    const x = centerX + Math.cos(angle) * r;
+                    const y = centerY + Math.sin(angle) * r;
+                    i === 0 ? ctx.moveTo(x, y) : ctx.lineTo(x, y);
+                }
+                ctx.strokeStyle = `rgba(${baseR},${baseG},${baseB},${0.6 * s.currentMix})`;
+                ctx.lineWidth = 1.5;
+                ctx.stroke();
+            }
+
             animationFrameId = requestAnimationFrame(render);
         };
 
@@ -0,0 +1,238 @@
+import os
+import re
+import time
+import difflib
+import logging
+import threading
+
+from services.system.apps import KNOWN_APPS
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Local fast path in front of the LLM.
+# Plain commands ("open notepad", "search google for weather", "message mom
+# saying hi") are matched against a few compiled patterns built from the
+# action catalogue in the system prompt and the System service's app table.
+# A match only counts when its confidence clears the threshold; anything
+# vague, compound-but-unclear or context dependent ("search for it") goes
+# to the LLM as before.
+
+LOCAL_ROUTER = os.getenv("LOCAL_ROUTER", "1") == "1"
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.85"))
+FALLBACK_MIN_CONFIDENCE = 0.6   # When the LLM is unavailable a rougher guess beats an error
+
+POLITE_PREFIX = re.compile(r"^(?:(?:please|hey|ok|okay)\s+|(?:can|could|would|will)\s+you\s+(?:please\s+)?)+", re.IGNORECASE)
+POLITE_SUFFIX = re.compile(r"\s*,?\s+please$", re.IGNORECASE)
+# How each rule below starts; "and"/"then" only separates commands right before one of these
+COMMAND_START = (r"(?:open|launch|start|run|go\s+to|visit|browse\s+to|navigate\s+to|search|google|look\s+up"
+                 r"|send|whatsapp|message|e-?mail)\b")
+# "open notepad and then search for cats", but not "search for rock and roll"
+SPLITTER = re.compile(r"\s*(?:,\s*)?\b(?:and then|and|then)\b\s*,?\s*(?=" + COMMAND_START + ")", re.IGNORECASE)
+# Where free text (a message, subject or body) starts; an "and open ..." after it may belong to it
+FREE_TEXT = re.compile(r"\b(?:saying|that\s+says|subject|body|message)\b|:", re.IGNORECASE)
+AMBIGUOUS_CONFIDENCE = 0.5      # Below both thresholds: sending the wrong message is worse than asking the LLM
+
+OPEN_PATTERN = re.compile(r"^(?:open|launch|start|run)\s+(?:up\s+)?(?:the\s+|my\s+)?(?P<name>.+?)(?:\s+app(?:lication)?)?$", re.IGNORECASE)
+VISIT_PATTERN = re.compile(r"^(?:go\s+to|visit|browse\s+to|navigate\s+to)\s+(?P<url>\S+)$", re.IGNORECASE)
+URL_PATTERN = re.compile(r"^(?:https?://)?[\w-]+(?:\.[\w-]+)*\.[a-z]{2,}(?:[/?#]\S*)?$", re.IGNORECASE)
+SEARCH_PATTERN = re.compile(
+    r"^(?:search|google|look\s+up)(?:\s+(?:on\s+)?google)?(?:\s+for)?\s+(?P<query>.+?)(?:\s+on\s+google)?$",
+    re.IGNORECASE)
+WHATSAPP_PATTERN = re.compile(
+    r"^(?:send\s+(?:a\s+)?)?(?:whatsapp(?:\s+message)?|message)\s+(?:to\s+)?(?P<contact>[\w .'-]+?)"
+    r"\s+(?:on\s+whatsapp\s+)?(?:saying|that\s+says|:)\s*(?P<message>.+)$",
+    re.IGNORECASE)
+# Only fully spelled-out emails; a topic alone needs the LLM to write the body
+EMAIL_PATTERN = re.compile(
+    r"^(?:send\s+(?:an\s+)?)?e-?mail\s+(?:to\s+)?(?P<recipient>[^\s@]+@[^\s@]+\.\w+)"
+    r"\s+with\s+(?:the\s+)?subject\s+(?P<subject>.+?)\s+and\s+(?:the\s+)?(?:body|message)\s+(?P<body>.+)$",
+    re.IGNORECASE)
+
+# Words that usually mean a (slow) service call rather than a chat reply
+AUTOMATION_PATTERN = re.compile(
+    r"\b(open|launch|start|type|write|send|email|mail|message|whatsapp|search|google|play|go to|browse)\b",
+    re.IGNORECASE,
+)
+
+# Queries that only make sense with the chat history
+PRONOUNS = {"it", "that", "this", "them", "him", "her", "those", "these", "there"}
+
+
+def normalize(text):
+    text = text.strip().rstrip(".!?").strip()
+    text = POLITE_SUFFIX.sub("", POLITE_PREFIX.sub("", text))
+    return re.sub(r"\s+", " ", text)
+
+
+def _open(text):
+    match = OPEN_PATTERN.match(text)
+    if not match:
+        return None
+    name = match.group("name").lower()
+    if name in KNOWN_APPS:
+        return {"service": "system", "action": "open_app", "params": {"app_name": name}}, 1.0
+    if URL_PATTERN.match(name):
+        return {"service": "browser", "action": "open_url", "params": {"url": match.group("name")}}, 0.95
+    # Small STT slips ("notpad"); the service would suggest the same name
+    close = difflib.get_close_matches(name, KNOWN_APPS.keys(), n=1, cutoff=FALLBACK_MIN_CONFIDENCE)
+    if close:
+        ratio = difflib.SequenceMatcher(None, name, close[0]).ratio()
+        return {"service": "system", "action": "open_app", "params": {"app_name": close[0]}}, ratio
+    return None
+
+
+def _app(text):
+    # An app named on its own; "google maps" is the app, not a search for "maps"
+    name = text.lower()
+    if name in KNOWN_APPS:
+        return {"service": "system", "action": "open_app", "params": {"app_name": name}}, 0.9
+    return None
+
+
+def _visit(text):
+    match = VISIT_PATTERN.match(text)
+    if match and URL_PATTERN.match(match.group("url")):
+        return {"service": "browser", "action": "open_url", "params": {"url": match.group("url")}}, 0.95
+    return None
+
+
+def _search(text):
+    match = SEARCH_PATTERN.match(text)
+    if not match or text.lower() in KNOWN_APPS:
+        return None
+    query = match.group("query").strip()
+    if query.lower() in PRONOUNS:
+        return None
+    return {"service": "browser", "action": "search_google", "params": {"query": query}}, 0.9
+
+
+def _whatsapp(text):
+    match = WHATSAPP_PATTERN.match(text)
+    if not match:
+        return None
+    params = {"contact_name": match.group("contact").strip(), "message": match.group("message").strip()}
+    if params["contact_name"].lower() in PRONOUNS:
+        return None
+    return {"service": "system", "action": "send_whatsapp", "params": params}, 0.9
+
+
+def _email(text):
+    match = EMAIL_PATTERN.match(text)
+    if not match:
+        return None
+    return {"service": "email", "action": "send_email", "params": match.groupdict()}, 0.9
+
+
+RULES = [_email, _whatsapp, _visit, _open, _app, _search]
+
+
+def match_one(text):
+    """Best (intent, confidence) for a single command, or None."""
+    best = None
+    for rule in RULES:
+        found = rule(text)
+        if found and (best is None or found[1] > best[1]):
+            best = found
+    return best
+
+
+def split(text):
+    """
+    (parts, ambiguous): text cut at "and"/"then" before a command verb, but
+    never inside free text. ambiguous is True when such a cut was skipped
+    ("message mom saying call me and open spotify").
+    """
+    free_text = FREE_TEXT.search(text)
+    free_from = free_text.start() if free_text else len(text)
+    parts, start, ambiguous = [], 0, False
+    for separator in SPLITTER.finditer(text):
+        if separator.start() > free_from:
+            ambiguous = True
+            continue
+        parts.append(text[start:separator.start()])
+        start = separator.end()
+    parts.append(text[start:])
+    return [part for part in parts if part], ambiguous
+
+
+def _match_parts(text, parts):
+    # Several simple commands in a row, when every part is recognised
+    if len(parts) > 1:
+        found = [match_one(part) for part in parts]
+        if all(found):
+            return [intent for intent, _ in found], min(confidence for _, confidence in found)
+    # Otherwise the whole text ("search for salt and pepper")
+    found = match_one(text)
+    if found:
+        return [found[0]], found[1]
+    return None
+
+
+def match(text):
+    """(intents, confidence) for a whole utterance, or None."""
+    text = normalize(text)
+    if not text:
+        return None
+    parts, ambiguous = split(text)
+    found = _match_parts(text, parts)
+    if found and ambiguous:
+        return found[0], min(found[1], AMBIGUOUS_CONFIDENCE)
+    return found
+
+
+class IntentRouter:
+    def __init__(self, min_confidence=ROUTER_MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_total = 0.0
+
+    def route(self, text, min_confidence=None):
+        """Intents for text when the local match is confident enough, otherwise None (ask the LLM)."""
+        min_confidence = self.min_confidence if min_confidence is None else min_confidence
+        start = time.perf_counter()
+        with metrics.span("router"):
+            found = match(text)
+        elapsed = time.perf_counter() - start
+        metrics.registry.observe("assistant_router_seconds", elapsed)
+
+        if found is None or found[1] < min_confidence:
+            with self.lock:
+                self.misses += 1
+            metrics.registry.inc("assistant_router_total", result="miss")
+            return None
+
+        intents, confidence = found
+        # What the LLM would have cost, going by its recent median
+        llm = metrics.registry.quantiles("assistant_stage_seconds", stage="llm")
+        saved = max(llm[0.5] - elapsed, 0.0) if llm else None
+        with self.lock:
+            self.hits += 1
+            if saved is not None:
+                self.saved_total += saved
+        metrics.registry.inc("assistant_router_total", result="hit")
+        if saved is not None:
+            metrics.registry.observe("assistant_router_saved_seconds", saved)
+        logger.info("Routed locally in %.2f ms (confidence %.2f, ~%s saved): %s", elapsed * 1000, confidence,
+                    f"{saved * 1000:.0f} ms" if saved is not None else "? ms", text)
+        return intents
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": LOCAL_ROUTER,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "saved_seconds_total": round(self.saved_total, 3),
+                "saved_seconds_avg": round(self.saved_total / self.hits, 3) if self.hits else 0.0,
+            }
+
+
+router = IntentRouter()
+metrics.registry.describe("assistant_router_total", "Commands handled by the local intent router (hit) or passed to the LLM (miss).")
+metrics.registry.describe("assistant_router_seconds", "Time spent matching a command locally.")
+metrics.registry.describe("assistant_router_saved_seconds", "Estimated LLM time saved per routed command (LLM p50 minus routing time).")
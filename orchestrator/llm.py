@@ -1,29 +1,38 @@
-import requests
+import logging
 import os
 import json
+import re
+import copy
+import time
+import textwrap
 from dotenv import load_dotenv
+from . import metrics
+from . import intent_router
+from . import llm_cache
+from . import llm_client
+from .llm_backends import OpenAICompatibleBackend, LlamaCppBackend, BackendRouter, BackendError, MALFORMED_REPLY_ERRORS
+from .context import ConversationContext
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 api_key = os.getenv("GROQ_API_KEY")
 
-# Chat History Storage
-CHAT_HISTORY = []
+# Groq uses an OpenAI-compatible endpoint; overridable for a local stand-in server
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+# remote | local | auto (simple commands to the local model) | fake
+LLM_BACKEND = os.getenv("LLM_BACKEND", "remote")
+# llama.cpp: llama-server -m model.gguf --port 8080
+LOCAL_LLM_URL = os.getenv("LOCAL_LLM_URL", "http://127.0.0.1:8080/v1/chat/completions")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "local")
+# Stream the reply (SSE) and hand out intents / spoken sentences as they are generated
+LLM_STREAMING = os.getenv("LLM_STREAMING", "1") == "1"
+MIN_SENTENCE_CHARS = 12  # Don't hand TTS tiny fragments
+ABBREVIATIONS = {"e.g.", "i.e.", "etc.", "vs.", "mr.", "mrs.", "ms.", "dr.", "st.", "no."}
 
-def parse_command(command_text: str):
-    """
-    Sends the user command to Groq (Llama 3) via Raw HTTP and expects a JSON response.
-    """
-    print(f"DEBUG: Parse Command called with: {command_text}")
-    
-    if not api_key:
-        print("Error: GROQ_API_KEY not found in .env")
-        return [{"service": "error", "message": "Groq API Key Missing"}]
-
-    # Groq uses OpenAI-compatible endpoint
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    
-    # System Prompt
-    system_prompt = """
+# Built once: an identical prefix on every request lets providers cache it
+SYSTEM_PROMPT = textwrap.dedent("""
     You are AI-assistant, a highly intelligent and helpful Desktop Assistant Orchestrator.
     
     CAPABILITIES:
@@ -36,6 +45,7 @@ def parse_command(command_text: str):
 
     JSON STRUCTURE:
     Every response MUST be a list of objects: [{"service": "...", "action": "...", "params": {...}, "expect_reply": false}]
+    Independent actions run at the same time. If an action needs an earlier one to finish first, add "depends_on": [index of that earlier action] (0-based).
     
     SERVICES:
     - "system": for local apps (notepad, calculator, settings, etc.) or typing.
@@ -70,82 +80,301 @@ def parse_command(command_text: str):
     CONTEXT:
     - Use the provided chat history.
     - If user says "search for it", look at previous message to know what "it" is.
+    - Older turns may be given as a short summary right after these instructions.
+    """).strip()
+
+# Chat History Storage (compact replies; see context.py)
+CHAT_HISTORY = []
+CONTEXT = ConversationContext(CHAT_HISTORY)
+
+BACKENDS = BackendRouter(
+    remote=OpenAICompatibleBackend(GROQ_API_URL, api_key, LLM_MODEL),
+    local=LlamaCppBackend(LOCAL_LLM_URL, LOCAL_LLM_MODEL),
+    mode=LLM_BACKEND,
+)
+
+class IntentStreamParser:
     """
+    Incremental parser for the JSON array of intents while it is being generated.
+    feed(text) calls on_intent(intent) for every object that just became
+    complete, and on_sentence(text) for every finished sentence of the
+    "response" string currently being written.
+    Anything before the opening '[' (chatter, ```json fences) is skipped.
+    """
+    ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', '\\': '\\', '/': '/'}
+
+    def __init__(self, on_intent=None, on_sentence=None):
+        self.on_intent = on_intent
+        self.on_sentence = on_sentence
+        self.started = False    # Inside the top-level array
+        self.finished = False   # Saw its closing ']'
+        self.depth = 0          # 0 = between objects, 1 = inside an intent object
+        self.raw = []           # Characters of the current intent object
+        self.in_string = False
+        self.escape = False
+        self.unicode = None     # Hex digits of a \uXXXX escape
+        self.text = []          # Decoded current string
+        self.key = None         # Last key read at depth 1
+        self.expect_value = False
+        self.in_response = False
+        self.sentence = []
+        self.sentence_end = False
+        self.streamed = False   # The current object's response was handed out
+        self.intents = []
+        self.errors = 0
+
+    def feed(self, chunk):
+        for ch in chunk:
+            if self.finished:
+                return
+            if not self.started:
+                self.started = ch == '['
+                continue
+            if self.depth > 0:
+                self.raw.append(ch)
+            if self.in_string:
+                self._string_char(ch)
+            elif ch == '"':
+                self.in_string = True
+                self.text = []
+                self.in_response = self.depth == 1 and self.expect_value and self.key == "response"
+            elif ch in '{[':
+                self.depth += 1
+                if self.depth == 1:
+                    self.raw = [ch]
+                    self.key = None
+                    self.expect_value = False
+                    self.streamed = False
+            elif ch in '}]':
+                if self.depth == 0:
+                    self.finished = ch == ']'
+                    continue
+                self.depth -= 1
+                if self.depth == 0:
+                    self._complete_object()
+            elif self.depth == 1 and ch == ':':
+                self.expect_value = True
+            elif self.depth == 1 and ch == ',':
+                self.expect_value = False
+
+    def _string_char(self, ch):
+        if self.unicode is not None:
+            self.unicode += ch
+            if len(self.unicode) == 4:
+                try:
+                    self._decoded(chr(int(self.unicode, 16)))
+                except ValueError:
+                    pass
+                self.unicode = None
+        elif self.escape:
+            self.escape = False
+            if ch == 'u':
+                self.unicode = ""
+            else:
+                self._decoded(self.ESCAPES.get(ch, ch))
+        elif ch == '\\':
+            self.escape = True
+        elif ch == '"':
+            self.in_string = False
+            if self.in_response:
+                self._flush_sentence()
+                self.in_response = False
+            elif self.depth == 1 and not self.expect_value:
+                self.key = "".join(self.text)
+            if self.depth == 1:
+                self.expect_value = False
+        else:
+            self._decoded(ch)
+
+    def _decoded(self, ch):
+        if not self.in_response:
+            self.text.append(ch)
+            return
+        if self.sentence_end and ch.isspace() and self._sentence_complete():
+            self._flush_sentence()
+            return
+        self.sentence_end = ch in '.!?' or (self.sentence_end and ch in '"\')')
+        if ch == '\n':
+            self._flush_sentence()
+            return
+        self.sentence.append(ch)
+
+    def _sentence_complete(self):
+        sentence = "".join(self.sentence).strip()
+        if len(sentence) < MIN_SENTENCE_CHARS:
+            return False
+        return sentence.rsplit(None, 1)[-1].lower() not in ABBREVIATIONS
+
+    def _flush_sentence(self):
+        sentence = "".join(self.sentence).strip()
+        self.sentence = []
+        self.sentence_end = False
+        if sentence:
+            self.streamed = True
+            if self.on_sentence:
+                self.on_sentence(sentence)
+
+    def _complete_object(self):
+        try:
+            intent = json.loads("".join(self.raw))
+        except json.JSONDecodeError:
+            self.errors += 1
+            logger.warning("Skipping malformed streamed intent: %s", "".join(self.raw))
+            return
+        if not isinstance(intent, dict):
+            return
+        if self.streamed:
+            intent["streamed"] = True  # Its response has already been spoken
+        self.intents.append(intent)
+        if self.on_intent:
+            self.on_intent(intent)
+
+
+def extract_intents(content):
+    """Parses a complete reply (non-streaming path, or a stream that never opened an array)."""
+    # Clean up markdown if present
+    content = content.replace("```json", "").replace("```", "")
     
-    # Construct Messages with History
-    messages = [{"role": "system", "content": system_prompt}]
-    
-    # Add last 5 turns of history to context
-    global CHAT_HISTORY
-    messages.extend(CHAT_HISTORY[-10:]) 
+    # Robust Parsing: Try to find a JSON list in the output
+    try:
+        # Look for substring starting with [ and ending with ] using regex because LLM might be chatty
+        match = re.search(r'\[.*\]', content, re.DOTALL)
+        if match:
+            json_candidate = match.group(0)
+            parsed = json.loads(json_candidate)
+        else:
+            # Try direct parse if regex failed (maybe it's a dict or simple structure)
+            parsed = json.loads(content)
+            
+    except json.JSONDecodeError as je:
+        logger.error("Failed to parse JSON. Content was: %s", content)
+        # Fallback: Treat entire response as conversational
+        parsed = [{"service": "conversational", "response": content}]
     
-    # Add current command
-    messages.append({"role": "user", "content": command_text})
-
-    payload = {
-        "model": "llama-3.3-70b-versatile",
-        "messages": messages,
-        "temperature": 0.7
-    }
+    # Ensure it's always a list
+    if isinstance(parsed, dict):
+        parsed = [parsed]
+    return parsed
+
+
+def _fallback(command_text, on_intent=None):
+    """While the LLM API is down: anything the local router can make out, else a quick error."""
+    routed = intent_router.router.route(command_text, min_confidence=intent_router.FALLBACK_MIN_CONFIDENCE)
+    if routed is None:
+        return {"service": "error", "message": "The language model is unavailable right now, please try again shortly."}
+    if on_intent:
+        for intent in routed:
+            on_intent(intent)
+    return routed
+
+
+def _remember(command_text, intents, content):
+    CONTEXT.remember(command_text, intents, content)
+
+
+def parse_command(command_text: str, on_intent=None, on_sentence=None):
+    """
+    Sends the user command to the LLM backend (see llm_backends.py) and expects a JSON response.
+    With streaming on, on_intent(intent) is called for each intent as soon as
+    it is complete and on_sentence(text) for each sentence of a "response";
+    the returned list then holds exactly the intents passed to on_intent
+    (unless nothing could be parsed incrementally, in which case none were).
+    """
+    logger.debug("Parse command called with: %s", command_text)
+
+    # Plain commands don't need the LLM (works without an API key too)
+    if intent_router.LOCAL_ROUTER:
+        routed = intent_router.router.route(command_text)
+        if routed is not None:
+            _remember(command_text, routed, json.dumps(routed))
+            if on_intent:
+                for intent in routed:
+                    on_intent(intent)
+            return routed
     
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
+    problem = BACKENDS.unavailable(command_text)
+    if problem:
+        logger.error("No LLM backend available (%s): %s", BACKENDS.mode, problem)
+        return [{"service": "error", "message": problem}]
+
+    # Same command (and, if it refers back, same recent history) -> same reply
+    key = llm_cache.response_cache.key(command_text, CONTEXT.snapshot()) if llm_cache.LLM_CACHE else None
+    if key is None:
+        llm_cache.response_cache.bypass()
+        return _ask_llm(command_text, on_intent, on_sentence)[0]
 
+    entry, ticket = llm_cache.response_cache.get(key)
+    if entry is not None:
+        logger.debug("LLM cache hit: %s", key)
+        intents = copy.deepcopy(entry["intents"])
+        _remember(command_text, intents, entry["content"])
+        if on_intent:
+            for intent in intents:
+                on_intent(intent)
+        return intents
+
+    parsed, content = None, None
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=10)
-        
-        if response.status_code != 200:
-            print(f"DEBUG: API Error Body: {response.text}")
-            error_msg = f"API Error {response.status_code}: "
+        parsed, content = _ask_llm(command_text, on_intent, on_sentence)
+    finally:
+        llm_cache.response_cache.complete(key, ticket, command_text, parsed if content is not None else None, content)
+    return parsed
+
+
+def _ask_llm(command_text, on_intent=None, on_sentence=None):
+    """The actual LLM call. Returns (intents, raw reply text), or (error, None)."""
+    # Constant system prompt, then the summary and recent history under the token budget, then the command
+    messages, _ = CONTEXT.build(SYSTEM_PROMPT, command_text)
+    plan = BACKENDS.plan(command_text)
+
+    try:
+        metrics.mark("llm_request")
+        for i, backend in enumerate(plan):
+            has_fallback = i + 1 < len(plan)
+            # A local answer may still be thrown away, so only the last candidate streams
+            parser = IntentStreamParser(on_intent=on_intent, on_sentence=on_sentence)
+            on_delta = parser.feed if LLM_STREAMING and not has_fallback else None
+            start = time.perf_counter()
             try:
-                error_body = response.json()
-                if "error" in error_body:
-                    error_msg += error_body["error"]["message"]
-            except:
-                error_msg += response.text[:50]
-                
-            return {"service": "error", "message": error_msg}
-            
-        data = response.json()
-        
-        # Parse OpenAI format
-        content = data['choices'][0]['message']['content']
-        print(f"DEBUG: LLM Raw Text: {content}")
+                with metrics.span(f"llm_{backend.name}"):
+                    completion = backend.chat(messages, on_delta=on_delta)
+            except (BackendError, llm_client.CircuitOpenError, *llm_client.NETWORK_ERRORS, *MALFORMED_REPLY_ERRORS) as e:
+                metrics.registry.inc("assistant_llm_backend_total", backend=backend.name, outcome="error")
+                if not has_fallback:
+                    raise
+                logger.warning("%s backend failed (%s), trying the next one", backend.name, e)
+                continue
+            metrics.registry.observe("assistant_llm_backend_seconds", time.perf_counter() - start, backend=backend.name)
+            if not BACKENDS.accept(backend, completion, has_fallback):
+                logger.info("Local model unsure (confidence %s), escalating: %s", completion.confidence, command_text)
+                metrics.registry.inc("assistant_llm_backend_total", backend=backend.name, outcome="escalated")
+                continue
+            metrics.registry.inc("assistant_llm_backend_total", backend=backend.name, outcome="ok")
+            break
 
-        import re
-        
-        # Clean up markdown if present
-        content = content.replace("```json", "").replace("```", "")
-        
-        # Robust Parsing: Try to find a JSON list in the output
-        try:
-            # Look for substring starting with [ and ending with ] using regex because LLM might be chatty
-            match = re.search(r'\[.*\]', content, re.DOTALL)
-            if match:
-                json_candidate = match.group(0)
-                parsed = json.loads(json_candidate)
-            else:
-                # Try direct parse if regex failed (maybe it's a dict or simple structure)
-                parsed = json.loads(content)
-                
-        except json.JSONDecodeError as je:
-            print(f"ERROR: Failed to parse JSON. Content was: {content}")
-            # Fallback: Treat entire response as conversational
-            parsed = [{"service": "conversational", "response": content}]
-        
-        # Ensure it's always a list
-        if isinstance(parsed, dict):
-            parsed = [parsed]
+        content = completion.content
+        if on_delta is not None:
+            parsed = parser.intents if parser.intents else extract_intents(content)
+        else:
+            parsed = extract_intents(content)
+            if on_intent:
+                for intent in parsed:
+                    on_intent(intent)
+        metrics.mark("llm_done")
+        logger.debug("LLM raw text (%s): %s", completion.backend, content)
             
         # Update History
-        CHAT_HISTORY.append({"role": "user", "content": command_text})
-        # We store the raw content as assistant response for context
-        CHAT_HISTORY.append({"role": "assistant", "content": content})
+        _remember(command_text, parsed, content)
             
-        return parsed
+        return parsed, content
+
+    except BackendError as e:
+        return {"service": "error", "message": str(e)}, None
+
+    except llm_client.CircuitOpenError as e:
+        logger.warning("%s; using the local fallback", e)
+        return _fallback(command_text, on_intent), None
         
     except Exception as e:
-        print(f"Error parsing command with Groq: {e}")
-        return {"service": "error", "message": str(e)}
+        logger.error("Error parsing command with Groq: %s", e)
+        return {"service": "error", "message": str(e)}, None
@@ -0,0 +1,293 @@
+import os
+import re
+import json
+import math
+import time
+import logging
+
+from . import metrics
+from . import llm_client
+from .llm_client import LLMClient
+from .intent_router import AUTOMATION_PATTERN
+
+logger = logging.getLogger(__name__)
+
+# LLM backends behind parse_command.
+# Every backend takes chat messages and returns a Completion (the reply text
+# and, if it can tell, how confident the model was). on_delta(text) is called
+# with each piece of a streamed reply.
+#   remote - any OpenAI-compatible chat completions API (Groq by default)
+#   local  - a small model on this machine behind a llama.cpp-style server
+#   fake   - deterministic canned replies, for tests and running without a key
+# BackendRouter picks one per command: in "auto" mode short tool-style
+# commands go to the local model and everything else (or anything the local
+# model wasn't sure about) to the remote one.
+
+# Short commands with an action verb are what the small model handles well
+SIMPLE_MAX_WORDS = 12
+QUESTION_PATTERN = re.compile(r"^(what|why|how|who|when|where|which|explain|describe|tell me|write|compare|should)\b|\?$",
+                              re.IGNORECASE)
+LOCAL_MIN_CONFIDENCE = float(os.getenv("LOCAL_LLM_MIN_CONFIDENCE", "0.8"))
+
+
+class BackendError(Exception):
+    """The backend answered, but with an error (message is ready for the user)."""
+
+
+# What a reply that isn't the expected JSON shape raises while it is read
+MALFORMED_REPLY_ERRORS = (ValueError, KeyError, IndexError, TypeError)
+
+
+class Completion:
+    def __init__(self, content, confidence=None, backend=None):
+        self.content = content
+        self.confidence = confidence    # 0..1, None if the backend can't tell
+        self.backend = backend
+
+
+def error_message(response):
+    logger.warning("API error body: %s", response.text)
+    error_msg = f"API Error {response.status_code}: "
+    try:
+        error_body = response.json()
+        if "error" in error_body:
+            error_msg += error_body["error"]["message"]
+    except:
+        error_msg += response.text[:50]
+    return error_msg
+
+
+def read_stream(response, on_delta, logprobs=None):
+    """Consumes OpenAI-style SSE chunks, calling on_delta(text). Returns the full text."""
+    content = []
+    # chunk_size=None: hand over each network chunk as it arrives instead of waiting for a full buffer
+    lines = response.iter_lines(chunk_size=None, decode_unicode=True)
+    for line in lines:
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        try:
+            choice = json.loads(data)["choices"][0]
+            delta = choice["delta"].get("content")
+        except (ValueError, KeyError, IndexError):
+            continue
+        if logprobs is not None:
+            logprobs.extend(_token_logprobs(choice))
+        if delta:
+            if not content:
+                metrics.mark("llm_first_token")
+            content.append(delta)
+            on_delta(delta)
+    for _ in lines:
+        pass  # Read to the end so the keep-alive connection goes back to the pool
+    return "".join(content)
+
+
+def _token_logprobs(choice):
+    tokens = (choice.get("logprobs") or {}).get("content") or []
+    return [token["logprob"] for token in tokens if isinstance(token.get("logprob"), (int, float))]
+
+
+def confidence_from_logprobs(logprobs):
+    """Geometric mean token probability (1.0 = the model never hesitated)."""
+    if not logprobs:
+        return None
+    return math.exp(sum(logprobs) / len(logprobs))
+
+
+class LLMBackend:
+    name = "base"
+
+    def available(self):
+        return True
+
+    def unavailable_reason(self):
+        """Why available() is False, in words for the user."""
+        return f"The {self.name} LLM backend is unavailable"
+
+    def chat(self, messages, on_delta=None):
+        raise NotImplementedError
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    name = "remote"
+
+    def __init__(self, url, api_key=None, model="llama-3.3-70b-versatile", temperature=0.7, client=None):
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+        self.temperature = temperature
+        self.client = client    # None = the shared llm_client.client (looked up per call)
+
+    def available(self):
+        return bool(self.api_key)
+
+    def unavailable_reason(self):
+        return "Groq API Key Missing"
+
+    def _headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _payload(self, messages, stream):
+        return {"model": self.model, "messages": messages, "temperature": self.temperature, "stream": stream}
+
+    def _post(self, messages, stream):
+        client = self.client or llm_client.client
+        # Returns once the headers arrive, so the first byte can be timed
+        response = client.post(self.url, headers=self._headers(), payload=self._payload(messages, stream), stream=True)
+        metrics.mark("llm_first_byte")
+        if response.status_code != 200:
+            raise BackendError(error_message(response))
+        return response
+
+    def chat(self, messages, on_delta=None):
+        response = self._post(messages, stream=on_delta is not None)
+        if on_delta is not None:
+            return Completion(read_stream(response, on_delta), backend=self.name)
+        # Parse OpenAI format
+        data = response.json()
+        return Completion(data['choices'][0]['message']['content'], backend=self.name)
+
+
+class LlamaCppBackend(OpenAICompatibleBackend):
+    """
+    Small CPU model behind llama.cpp's server (or anything with its
+    OpenAI-compatible /v1/chat/completions). Asks for token log-probabilities
+    to report how sure the model was.
+    """
+    name = "local"
+
+    def __init__(self, url, model="local", temperature=0.0, client=None):
+        # Own client: short connect timeout, no retries/hedging, its own breaker
+        client = client or LLMClient(connect_timeout=0.5, read_timeout=30, retries=0, hedge=False)
+        super().__init__(url, api_key=None, model=model, temperature=temperature, client=client)
+
+    def available(self):
+        # Not while its breaker is open (server not running); half-open lets one try through
+        return bool(self.url) and self.client.breaker.state != "open"
+
+    def unavailable_reason(self):
+        if not self.url:
+            return "Local LLM not configured (set LOCAL_LLM_URL)"
+        return f"Local LLM server at {self.url} is not responding"
+
+    def _payload(self, messages, stream):
+        payload = super()._payload(messages, stream)
+        payload["logprobs"] = True
+        return payload
+
+    def chat(self, messages, on_delta=None):
+        response = self._post(messages, stream=on_delta is not None)
+        if on_delta is not None:
+            logprobs = []
+            content = read_stream(response, on_delta, logprobs)
+            return Completion(content, confidence_from_logprobs(logprobs), backend=self.name)
+        choice = response.json()["choices"][0]
+        return Completion(choice["message"]["content"], confidence_from_logprobs(_token_logprobs(choice)),
+                          backend=self.name)
+
+
+class FakeBackend(LLMBackend):
+    """Deterministic replies: replies[command] or a conversational echo. Streams in fixed-size pieces."""
+    name = "fake"
+
+    def __init__(self, replies=None, confidence=1.0, chunk=8, delay=0.0, name="fake"):
+        self.name = name        # Can stand in for "local" or "remote"
+        self.replies = dict(replies or {})
+        self.confidence = confidence
+        self.chunk = chunk
+        self.delay = delay      # Seconds per streamed piece
+        self.calls = []         # Commands seen, in order
+
+    def reply_for(self, command):
+        if command in self.replies:
+            reply = self.replies[command]
+            return reply if isinstance(reply, str) else json.dumps(reply)
+        return json.dumps([{"service": "conversational", "response": f"You said: {command}", "expect_reply": False}])
+
+    def chat(self, messages, on_delta=None):
+        command = messages[-1]["content"]
+        self.calls.append(command)
+        content = self.reply_for(command)
+        metrics.mark("llm_first_byte")
+        if on_delta is not None:
+            for i in range(0, len(content), self.chunk):
+                if self.delay:
+                    time.sleep(self.delay)
+                on_delta(content[i:i + self.chunk])
+        return Completion(content, self.confidence, backend=self.name)
+
+
+def looks_simple(command):
+    """Short tool-style command ("open spotify and play jazz") rather than a real question."""
+    words = command.split()
+    return (0 < len(words) <= SIMPLE_MAX_WORDS and bool(AUTOMATION_PATTERN.search(command))
+            and not QUESTION_PATTERN.search(command.strip()))
+
+
+class BackendRouter:
+    """
+    Chooses the backend for a command (LLM_BACKEND):
+      remote / local / fake - always that one
+      auto - local first for simple commands, remote for the rest and for
+             anything the local model answered with low confidence
+    """
+    def __init__(self, remote, local=None, fake=None, mode="remote", min_confidence=LOCAL_MIN_CONFIDENCE):
+        self.backends = {"remote": remote, "local": local, "fake": fake or FakeBackend()}
+        self.mode = mode
+        self.min_confidence = min_confidence
+
+    @property
+    def remote(self):
+        return self.backends["remote"]
+
+    @property
+    def local(self):
+        return self.backends["local"]
+
+    def plan(self, command):
+        """Backends to try, in order."""
+        if self.mode != "auto":
+            backend = self.backends.get(self.mode)
+            if backend is None:
+                logger.error("Unknown LLM_BACKEND '%s', using remote", self.mode)
+                backend = self.remote
+            return [backend]
+        plan = []
+        if self.local is not None and self.local.available() and looks_simple(command):
+            plan.append(self.local)
+        if self.remote.available():
+            plan.append(self.remote)
+        return plan or [self.local or self.remote]
+
+    def unavailable(self, command):
+        """None if a backend can take the command, otherwise why none can."""
+        plan = self.plan(command)
+        if any(backend.available() for backend in plan):
+            return None
+        return "; ".join(backend.unavailable_reason() for backend in plan)
+
+    def accept(self, backend, completion, has_fallback):
+        """Whether to keep a local answer instead of asking the next backend."""
+        if backend is not self.local or not has_fallback:
+            return True
+        if completion.confidence is not None:
+            metrics.registry.observe("assistant_local_llm_confidence", completion.confidence)
+            if completion.confidence < self.min_confidence:
+                return False
+        # The small model must at least produce the JSON array
+        match = re.search(r'\[.*\]', completion.content, re.DOTALL)
+        try:
+            return match is not None and isinstance(json.loads(match.group(0)), list)
+        except ValueError:
+            return False
+
+
+metrics.registry.describe("assistant_llm_backend_total", "LLM calls per backend by outcome (ok, escalated, error).")
+metrics.registry.describe("assistant_llm_backend_seconds", "LLM call duration per backend.")
+metrics.registry.describe("assistant_local_llm_confidence", "Local model confidence (geometric mean token probability).")
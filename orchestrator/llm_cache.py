@@ -0,0 +1,222 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from . import metrics
+from .intent_router import normalize
+
+logger = logging.getLogger(__name__)
+
+# Cache for parse_command replies.
+# Keys are the normalized command plus, when the command leans on the
+# conversation ("search for it", or answering a question the assistant just
+# asked), a fingerprint of the last turns. Entries live in an LRU with a TTL
+# per service; with LLM_CACHE_FILE set they are also kept on disk and
+# survive restarts. Identical commands arriving together share one LLM call.
+
+LLM_CACHE = os.getenv("LLM_CACHE", "1") == "1"
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "256"))
+LLM_CACHE_FILE = os.getenv("LLM_CACHE_FILE")     # Optional on-disk tier, e.g. llm_cache.json
+INFLIGHT_WAIT = 30                               # Seconds a duplicate waits for the first call
+
+# Seconds an entry may be served, by the services it uses (the shortest wins).
+# 0 = never cached; services not listed are not cached either.
+SERVICE_TTLS = {
+    "system": 24 * 3600,
+    "browser": 24 * 3600,
+    "email": 10 * 60,            # Generated bodies should not feel canned
+    "conversational": 3600,
+}
+
+FINGERPRINT_TURNS = 2            # Last user + assistant message
+
+# The answer depends on when it is asked; never serve these from the cache
+TIME_DEPENDENT = re.compile(
+    r"\b(time|date|day|today|tonight|tomorrow|yesterday|now|currently|current|latest|recent|news|weather|"
+    r"forecast|score|scores|stock|stocks|price|prices|this (?:week|month|year)|next (?:week|month|year)|"
+    r"last (?:week|month|year)|how long until|ago)\b",
+    re.IGNORECASE)
+# Words that resolve against the previous turns
+REFERENCES = re.compile(r"\b(it|that|this|them|him|her|those|these|there|again|same|previous|last one|another)\b",
+                        re.IGNORECASE)
+EXPECTS_REPLY = re.compile(r'"expect_reply"\s*:\s*true')
+
+
+def history_fingerprint(history, turns=FINGERPRINT_TURNS):
+    recent = history[-turns:] if turns else []
+    return hashlib.sha1(json.dumps(recent, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def needs_history(text, history):
+    """True when the reply depends on the conversation, not just on text."""
+    if REFERENCES.search(text):
+        return True
+    # An answer to the assistant's own question ("bob@example.com")
+    last = next((m["content"] for m in reversed(history) if m.get("role") == "assistant"), "")
+    return bool(EXPECTS_REPLY.search(last))
+
+
+def entry_ttl(text, intents):
+    """How long this reply may be reused (0 = don't cache)."""
+    if not isinstance(intents, list) or not intents:
+        return 0
+    ttls = []
+    for intent in intents:
+        service = intent.get("service") if isinstance(intent, dict) else None
+        if service == "conversational" and TIME_DEPENDENT.search(text):
+            return 0
+        ttls.append(SERVICE_TTLS.get(service, 0))
+    return min(ttls)
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None       # The leader's reply, even if it wasn't cacheable
+
+
+class ResponseCache:
+    def __init__(self, size=LLM_CACHE_SIZE, path=LLM_CACHE_FILE):
+        self.size = size
+        self.path = path
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.entries = OrderedDict()    # key -> {"intents", "content", "expires"}
+        self.inflight = {}              # key -> _InFlight
+        self.counts = {"hit": 0, "miss": 0, "coalesced": 0, "bypass": 0, "stored": 0, "evicted": 0}
+        if path:
+            self._load()
+
+    def key(self, text, history):
+        """Cache key for a command, or None if it must not be cached at all."""
+        normalized = normalize(text).lower()
+        if not normalized:
+            return None
+        if needs_history(normalized, history):
+            return f"{normalized}|{history_fingerprint(history)}"
+        return normalized
+
+    def _count(self, result):
+        with self.lock:
+            self.counts[result] += 1
+        metrics.registry.inc("assistant_llm_cache_total", result=result)
+
+    def bypass(self):
+        self._count("bypass")
+
+    def get(self, key):
+        """
+        Returns (entry, None) on a hit, or (None, ticket) when the caller should
+        ask the LLM and then call complete(key, ticket, ...). A caller that finds
+        the same key already in flight waits for it instead.
+        """
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry and entry["expires"] > time.time():
+                    self.entries.move_to_end(key)
+                    result = "hit"
+                elif key in self.inflight:
+                    waiting = self.inflight[key]
+                    result = "wait"
+                else:
+                    if entry:
+                        del self.entries[key]   # Expired
+                    ticket = self.inflight[key] = _InFlight()
+                    result = "miss"
+            if result == "hit":
+                self._count("hit")
+                return entry, None
+            if result == "miss":
+                self._count("miss")
+                return None, ticket
+            # Identical command already being parsed: share its reply
+            if waiting.done.wait(INFLIGHT_WAIT) and waiting.entry is not None:
+                self._count("coalesced")
+                return waiting.entry, None
+            # The first call failed; try again (as the leader if nobody else is)
+
+    def complete(self, key, ticket, text, intents, content):
+        """Stores the reply (if cacheable) and releases anyone waiting on the same key."""
+        ttl = entry_ttl(text, intents)
+        entry = None
+        if isinstance(intents, list) and not any(i.get("service") == "error" for i in intents if isinstance(i, dict)):
+            entry = {"intents": [_clean(intent) for intent in intents], "content": content,
+                     "expires": time.time() + ttl}
+        with self.lock:
+            if entry and ttl > 0:
+                self.entries[key] = entry
+                self.entries.move_to_end(key)
+                self.counts["stored"] += 1
+                while len(self.entries) > self.size:
+                    self.entries.popitem(last=False)
+                    self.counts["evicted"] += 1
+            if self.inflight.get(key) is ticket:
+                del self.inflight[key]
+        ticket.entry = entry    # Duplicates waiting right now get it either way
+        ticket.done.set()
+        if entry and ttl > 0 and self.path:
+            self._save()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.path:
+            self._save()
+
+    def stats(self):
+        with self.lock:
+            looked_up = self.counts["hit"] + self.counts["coalesced"] + self.counts["miss"]
+            return {
+                "enabled": LLM_CACHE,
+                "entries": len(self.entries),
+                "size": self.size,
+                "in_flight": len(self.inflight),
+                "disk": self.path,
+                **self.counts,
+                "hit_rate": round((self.counts["hit"] + self.counts["coalesced"]) / looked_up, 3) if looked_up else 0.0,
+            }
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable LLM cache file %s: %s", self.path, e)
+            return
+        now = time.time()
+        for key, entry in stored.items():
+            if entry.get("expires", 0) > now:
+                self.entries[key] = entry
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        logger.info("Loaded %d cached LLM replies from %s", len(self.entries), self.path)
+
+    def _save(self):
+        with self.lock:
+            now = time.time()
+            snapshot = {key: entry for key, entry in self.entries.items() if entry["expires"] > now}
+        temp = f"{self.path}.tmp"
+        try:
+            with self.save_lock:
+                with open(temp, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f)
+                os.replace(temp, self.path)
+        except OSError as e:
+            logger.warning("Could not write LLM cache file %s: %s", self.path, e)
+
+
+def _clean(intent):
+    # "streamed" only applies to the turn that spoke it
+    return {k: v for k, v in intent.items() if k != "streamed"} if isinstance(intent, dict) else intent
+
+
+response_cache = ResponseCache()
+metrics.registry.describe("assistant_llm_cache_total", "parse_command cache lookups by result (hit, miss, coalesced, bypass).")
@@ -0,0 +1,235 @@
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# HTTP client for the LLM API.
+# One pooled keep-alive session (no TLS handshake per command), separate
+# connect/read timeouts, retries with jittered backoff on 429/5xx that honour
+# Retry-After, an optional hedged second request when the first is slower
+# than the usual p95, and a circuit breaker that fails fast while the API is
+# down so the caller can use its local fallback.
+# Only the wait for the response headers is retried or hedged; once a
+# streamed reply has started, intents may already be running.
+
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "3.05"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "15"))
+LLM_POOL_SIZE = 4
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+RETRY_BACKOFF = 0.25            # Base of the exponential backoff (seconds)
+RETRY_BACKOFF_MAX = 4.0
+RETRY_AFTER_MAX = 10.0          # Never wait longer than this for a Retry-After
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "1.5"))   # Until enough samples for a p95
+HEDGE_MIN_DELAY = 0.2
+HEDGE_MIN_SAMPLES = 20
+
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))     # Consecutive failures that open it
+BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))  # Seconds before one trial request
+
+
+# Errors a request can fail with before any response arrives
+NETWORK_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+class CircuitOpenError(Exception):
+    """The LLM API has been failing; not even trying."""
+
+
+class RetryableStatus(Exception):
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+def retry_after(response):
+    """Seconds asked for by a Retry-After header (delta or HTTP date), or None."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt, response=None):
+    """Full-jitter exponential backoff, or what the server asked for."""
+    asked = retry_after(response)
+    if asked is not None:
+        return min(asked, RETRY_AFTER_MAX)
+    return random.uniform(0, min(RETRY_BACKOFF * (2 ** attempt), RETRY_BACKOFF_MAX))
+
+
+class CircuitBreaker:
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.consecutive = 0
+        self.opened_at = None
+        self.trial = False      # Half-open: one request is testing the API
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half_open" if time.time() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.time() - self.opened_at < self.cooldown or self.trial:
+                return False
+            self.trial = True
+            return True
+
+    def success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                logger.info("LLM API recovered, closing the circuit breaker")
+            self.consecutive = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failure(self):
+        with self.lock:
+            self.consecutive += 1
+            if self.trial or (self.opened_at is None and self.consecutive >= self.failures):
+                logger.warning("LLM API failing (%d in a row), opening the circuit breaker for %.0f s",
+                               self.consecutive, self.cooldown)
+                self.opened_at = time.time()
+                self.trial = False
+                metrics.registry.inc("assistant_llm_breaker_opened_total")
+
+
+class LLMClient:
+    def __init__(self, connect_timeout=LLM_CONNECT_TIMEOUT, read_timeout=LLM_READ_TIMEOUT,
+                 retries=LLM_RETRIES, hedge=LLM_HEDGE, breaker=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=LLM_POOL_SIZE, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=LLM_POOL_SIZE, thread_name_prefix="llm-http")
+        self.first_byte = metrics.Series()   # Successful header waits, for the hedge delay
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "retries": 0, "hedged": 0, "hedge_won": 0, "failed": 0, "rejected": 0}
+
+    def _count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+        metrics.registry.inc("assistant_llm_client_total", event=name)
+
+    def hedge_delay(self):
+        with self.lock:
+            if self.first_byte.count < HEDGE_MIN_SAMPLES:
+                return HEDGE_DELAY
+            return max(self.first_byte.quantile(0.95), HEDGE_MIN_DELAY)
+
+    def _send(self, url, headers, payload, stream):
+        start = time.perf_counter()
+        response = self.session.post(url, headers=headers, json=payload, timeout=self.timeout, stream=stream)
+        if response.status_code in RETRY_STATUSES:
+            response.content   # Small error body; reading it returns the connection to the pool
+            raise RetryableStatus(response)
+        with self.lock:
+            self.first_byte.observe(time.perf_counter() - start)
+        return response
+
+    def _attempt(self, url, headers, payload, stream):
+        """One try, hedged with a second identical request if the first is slow to answer."""
+        if not self.hedge:
+            return self._send(url, headers, payload, stream)
+        first = self.executor.submit(self._send, url, headers, payload, stream)
+        done, _ = wait([first], timeout=self.hedge_delay())
+        if done:
+            return first.result()
+
+        self._count("hedged")
+        second = self.executor.submit(self._send, url, headers, payload, stream)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self._count("hedge_won")
+                    loser = first if future is second else second
+                    loser.add_done_callback(_close_quietly)   # Whenever it finishes, give its connection back
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def post(self, url, headers, payload, stream=True):
+        """
+        POSTs payload and returns the response once its headers have arrived.
+        Raises CircuitOpenError while the breaker is open, or the last error
+        once the retries are used up.
+        """
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError("LLM API unavailable (circuit open)")
+        self._count("requests")
+        attempt = 0
+        while True:
+            try:
+                response = self._attempt(url, headers, payload, stream)
+                self.breaker.success()
+                return response
+            except (RetryableStatus, *NETWORK_ERRORS) as e:
+                self.breaker.failure()
+                failed_response = e.response if isinstance(e, RetryableStatus) else None
+                if attempt >= self.retries or not self.breaker.allow():
+                    self._count("failed")
+                    if failed_response is not None:
+                        return failed_response   # Let the caller report the API's own error
+                    raise
+                delay = backoff(attempt, failed_response)
+                logger.warning("LLM request failed (%s), retry %d/%d in %.2f s", e, attempt + 1, self.retries, delay)
+                self._count("retries")
+                attempt += 1
+                time.sleep(delay)
+            except Exception:
+                # Anything else (bad URL, TLS, a broken reply) still counts, or a half-open trial never ends
+                self.breaker.failure()
+                self._count("failed")
+                raise
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.counts)
+        return {**counts, "breaker": self.breaker.state, "hedge": self.hedge,
+                "hedge_delay": round(self.hedge_delay(), 3)}
+
+
+def _close_quietly(future):
+    if future.exception() is None:
+        future.result().close()
+
+
+client = LLMClient()
+metrics.registry.describe("assistant_llm_client_total", "LLM HTTP client events (requests, retries, hedged, failed, rejected).")
+metrics.registry.describe("assistant_llm_breaker_opened_total", "Times the LLM circuit breaker opened.")
@@ -0,0 +1,64 @@
+import os
+import sys
+import queue
+import atexit
+import logging
+import logging.handlers
+
+# Logging for the orchestrator and the services.
+# Records are put on a queue and written by a listener thread, so the audio
+# callback and the event loop never block on console/file I/O. Levels come
+# from .env:
+#   LOG_LEVEL=INFO
+#   LOG_LEVELS=orchestrator.audio=DEBUG,services.browser=WARNING
+#   LOG_FILE=assistant.log   (optional; the windowed build has no console)
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+_listener = None
+
+
+def parse_levels(spec):
+    """'a=DEBUG,b.c=warning' -> {'a': 'DEBUG', 'b.c': 'WARNING'}. Bad entries are ignored."""
+    levels = {}
+    for entry in (spec or "").split(","):
+        name, sep, level = entry.partition("=")
+        level = level.strip().upper()
+        if sep and name.strip() and isinstance(logging.getLevelName(level), int):
+            levels[name.strip()] = level
+    return levels
+
+
+def setup_logging():
+    """Configures the root logger once per process. Safe to call from every entry point."""
+    global _listener
+    if _listener is not None:
+        return
+
+    handlers = []
+    if sys.stderr is not None:  # None in PyInstaller --windowed builds
+        handlers.append(logging.StreamHandler(sys.stderr))
+    log_file = os.getenv("LOG_FILE")
+    if log_file:
+        handlers.append(logging.handlers.RotatingFileHandler(log_file, maxBytes=2_000_000, backupCount=2))
+    if not handlers:
+        handlers.append(logging.NullHandler())
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    # A typo here must not stop the orchestrator and every service from starting
+    level = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+    valid = isinstance(logging.getLevelName(level), int)
+    root.setLevel(level if valid else "INFO")
+    for name, level_name in parse_levels(os.getenv("LOG_LEVELS")).items():
+        logging.getLogger(name).setLevel(level_name)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    if not valid:
+        logging.getLogger(__name__).warning("Unknown LOG_LEVEL '%s', using INFO", level)
@@ -1,18 +1,30 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import uvicorn
-import requests
 import sys
 import os
 from dotenv import load_dotenv
-from .llm import parse_command
+from .llm import parse_command, BACKENDS
+from .intent_router import router as intent_router
+from . import llm_cache
+from . import llm_client
 from .audio import speak
-import threading
-import time
-import json
+from .telemetry import VolumeTelemetry
+from .tts import tts_worker
+from .scheduler import scheduler
+from .service_client import ServiceClient
+from .command_pool import CommandWorkerPool
+from .connections import ConnectionManager
+from . import metrics
 import asyncio
+import itertools
+import logging
+from .logging_setup import setup_logging
 
 load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
 
 from contextlib import asynccontextmanager
 
@@ -20,7 +32,7 @@ from contextlib import asynccontextmanager
 async def lifespan(app: FastAPI):
     global main_loop
     main_loop = asyncio.get_running_loop()
-    print("DEBUG: Main Loop captured.")
+    logger.debug("Main loop captured.")
     
     # Start the Assistant Core Loop
     from .core import core_loop
@@ -28,14 +40,23 @@ async def lifespan(app: FastAPI):
     core_loop.set_dependencies(
         ui_update_cb=send_ui_update,
         ui_log_cb=send_ui_log,
-        intent_exec_cb=execute_single_intent,
-        ws_manager=manager
+        intent_exec_cb=execute_intents,
+        ws_manager=manager,
+        telemetry=volume_telemetry,
+        turn_factory=StreamedTurn
     )
+    volume_telemetry.waveform_source = core_loop.recorder.waveform
+    volume_telemetry.start()
+    command_pool.start()
     core_loop.start(main_loop)
     
     yield
-    print("Shutting down...")
+    logger.info("Shutting down...")
     core_loop.stop()
+    command_pool.stop()
+    volume_telemetry.stop()
+    for client in service_clients.values():
+        await client.aclose()
 
 from fastapi.staticfiles import StaticFiles
 
@@ -50,19 +71,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Serve Frontend if built (Priority over root)
-# Check if running in PyInstaller bundle
-if getattr(sys, 'frozen', False):
-    base_path = sys._MEIPASS
-    frontend_path = os.path.join(base_path, "frontend_dist")
-else:
-    # Check local dist
-    frontend_path = os.path.join(os.path.dirname(__file__), "frontend/dist")
-
-if os.path.exists(frontend_path):
-    print(f"Serving frontend from {frontend_path}")
-    app.mount("/", StaticFiles(directory=frontend_path, html=True), name="static")
-
 @app.get("/api/health")
 def home():
     return {"message": "AI-assistant Orchestrator is running."}
@@ -70,80 +78,88 @@ BROWSER_SERVICE_URL = os.getenv("BROWSER_SERVICE_URL", "http://localhost:8002")
 SYSTEM_SERVICE_URL = os.getenv("SYSTEM_SERVICE_URL", "http://localhost:8001")
 EMAIL_SERVICE_URL = os.getenv("EMAIL_SERVICE_URL", "http://localhost:8003")
 
-# WebSocket Manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+# One keep-alive pool per micro-service
+service_clients = {
+    "system": ServiceClient("system", SYSTEM_SERVICE_URL),
+    "browser": ServiceClient("browser", BROWSER_SERVICE_URL),
+    "email": ServiceClient("email", EMAIL_SERVICE_URL),
+}
 
-    async def broadcast(self, message: dict):
-        print(f"DEBUG: Broadcasting to {len(self.active_connections)} clients: {message}")
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(message))
-            except Exception as e:
-                print(f"DEBUG: Send failed: {e}")
-                # self.disconnect(connection) # causing race condition?
+def register_local_services(apps: dict):
+    """
+    Called by launcher.py when the service apps are imported into this process.
+    Their intents are then dispatched straight to the ASGI apps, no sockets.
+    """
+    for name, service_app in apps.items():
+        service_clients[name].use_app(service_app)
+        logger.info("'%s' service runs in-process.", name)
+
+@app.get("/api/pool")
+def pool_stats():
+    """Connection pool usage per service (in use, idle, reuse rate)."""
+    return {name: client.stats() for name, client in service_clients.items()}
+
+@app.get("/api/router")
+def router_stats():
+    """Local intent router hit rate and estimated LLM time saved."""
+    return intent_router.stats()
+
+@app.get("/api/cache")
+def cache_stats():
+    """parse_command cache size and hit/miss counters."""
+    return llm_cache.response_cache.stats()
+
+@app.get("/api/llm")
+def llm_client_stats():
+    """LLM backend mode and HTTP client: retries, hedged requests, circuit breaker state."""
+    stats = {"backend": BACKENDS.mode, **llm_client.client.stats()}
+    if BACKENDS.local is not None:
+        stats["local"] = BACKENDS.local.client.stats()
+    return stats
 
 manager = ConnectionManager()
+# Binary telemetry frames (see telemetry.py) go to their own sockets
+telemetry_manager = ConnectionManager()
+volume_telemetry = VolumeTelemetry(manager.broadcast, broadcast_binary=telemetry_manager.broadcast_bytes)
 
 # Async wrapper for broadcast to call from sync functions
 def broadcast_sync(message: dict):
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(manager.broadcast(message))
-    loop.close()
-
-# We need a thread-safe way to broadcast since listen loop is in a thread
-# But asyncio loops in threads are tricky. 
-# Better approach: The listen loop is sync. FastAPI is async.
-# We will use a global queue or just fire-and-forget for now, 
-# strictly speaking, "manager.broadcast" needs an event loop.
-# Let's use a simple global reference to the main loop if possible, or use run_coroutine_threadsafe.
-
-# Simplified for this context: We will rely on the fact that we can't easily await from the sync thread 
-# without the loop. So we will make the listen loop async too? No, speech_recognition is blocking.
-# Correction: We will use a global variable to store the loop and run_coroutine_threadsafe.
+    # Client queues belong to the main loop, so hand the message over to it
+    if main_loop and main_loop.is_running():
+        asyncio.run_coroutine_threadsafe(manager.broadcast(message), main_loop)
 
 main_loop = None
 
 def send_ui_update(state: str, message: str):
-    print(f"UI UPDATE: {state} - {message}") # Debug
+    logger.debug("UI update: %s - %s", state, message)
     if main_loop and main_loop.is_running():
         asyncio.run_coroutine_threadsafe(
             manager.broadcast({"type": "state", "state": state, "message": message}), 
             main_loop
         )
 
-def send_ui_log(message: str, source: str = "system"):
+def send_ui_log(message: str, source: str = "system", **extra):
     if main_loop and main_loop.is_running():
         asyncio.run_coroutine_threadsafe(
-            manager.broadcast({"type": "log", "message": message, "source": source}), 
+            manager.broadcast({"type": "log", "message": message, "source": source, **extra}), 
             main_loop
         )
 
-def execute_single_intent(intent):
+async def run_intent(intent):
     """
-    Executes a single workflow intent.
+    Executes a single workflow intent and returns its result without announcing it.
+    Runs on the FastAPI loop; service calls go through the pooled clients.
+    Result: {"status": ..., "message": text for the UI log, "speech": text to say}
     """
     service = intent.get("service")
     action = intent.get("action")
     params = intent.get("params", {})
     
-    print(f"Executing: Service={service}, Action={action}, Params={params}")
+    logger.info("Executing: service=%s, action=%s, params=%s", service, action, params)
 
     if service == "conversational":
         response = intent.get("response", "I heard you.")
-        send_ui_log(response, "system")
-        send_ui_update("speaking", "Speaking...")
-        speak(response)
-        send_ui_update("idle", "Ready")
+        return {"status": "success", "message": response, "speech": response}
 
     elif service == "system":
         endpoint = ""
@@ -159,17 +175,12 @@ def execute_single_intent(intent):
 
         if endpoint:
             try:
-                # Add delay between actions for multi-step to be visible
-                time.sleep(1) 
-                resp = requests.post(f"{SYSTEM_SERVICE_URL}{endpoint}", params=params)
+                resp = await service_clients["system"].post(endpoint, params=params)
                 data = resp.json()
                 msg = data.get("message", "Task completed")
-                send_ui_log(msg, "system")
-                speak(msg)
+                return {"status": "success", "message": msg, "speech": msg}
             except Exception as e:
-                send_ui_log(f"Error: {e}", "error")
-                speak("I encountered an error executing that task.")
-            send_ui_update("idle", "Done")
+                return {"status": "error", "message": f"Error: {e}", "speech": "I encountered an error executing that task."}
 
     elif service == "email":
         endpoint = ""
@@ -179,11 +190,10 @@ def execute_single_intent(intent):
 
         if endpoint:
             try:
-                # Add delay
-                time.sleep(1)
-                resp = requests.post(f"{EMAIL_SERVICE_URL}{endpoint}", json=params)
-                print(f"DEBUG: Email Service returned {resp.status_code}")
+                resp = await service_clients["email"].post(endpoint, json=params)
+                logger.debug("Email service returned %s", resp.status_code)
                 
+                data = {}
                 try:
                     data = resp.json()
                     msg = data.get("message", "Email sent")
@@ -191,16 +201,10 @@ def execute_single_intent(intent):
                     msg = "Email sent (no json)"
 
                 if resp.status_code == 200 and data.get("status") == "success":
-                   send_ui_log(msg, "system")
-                   speak("Email sent successfully.")
-                else:
-                   send_ui_log(f"Email Failed: {msg}", "error")
-                   speak("Failed to send email.")
-                
-                send_ui_update("idle", "Done")
+                    return {"status": "success", "message": msg, "speech": "Email sent successfully."}
+                return {"status": "error", "message": f"Email Failed: {msg}", "speech": "Failed to send email."}
             except Exception as e:
-                send_ui_log(f"Error: {e}", "error")
-                speak("I couldn't reach the email service.")
+                return {"status": "error", "message": f"Error: {e}", "speech": "I couldn't reach the email service."}
 
     elif service == "browser":
         endpoint = ""
@@ -212,50 +216,205 @@ def execute_single_intent(intent):
         if endpoint:
             try:
                 send_ui_update("processing", "Executing Browser Task...")
-                resp = requests.post(f"{BROWSER_SERVICE_URL}{endpoint}", params=params)
-                print(f"DEBUG: Browser Service returned {resp.status_code}")
+                resp = await service_clients["browser"].post(endpoint, params=params)
+                logger.debug("Browser service returned %s", resp.status_code)
                 try:
                     data = resp.json()
                 except Exception as json_err:
-                    print(f"DEBUG: Failed to parse JSON. Raw response: {resp.text}")
+                    logger.warning("Failed to parse JSON. Raw response: %s", resp.text)
                     raise json_err
                     
                 msg = data.get("message", "Browser task completed")
-                send_ui_log(msg, "system")
-                send_ui_update("idle", "Done") 
-                speak(msg)
+                return {"status": "success", "message": msg, "speech": msg}
             except Exception as e:
-                send_ui_log(f"Error: {e}", "error")
-                speak(f"Failed to communicate with Browser Service")
+                return {"status": "error", "message": f"Error: {e}", "speech": "Failed to communicate with Browser Service"}
 
     elif service == "error":
         error_msg = intent.get("message", "Unknown Error")
-        send_ui_log(f"Brain Error: {error_msg}", "error")
-        send_ui_update("error", "Error")
-        speak(f"I encountered an error: {error_msg}")
+        return {"status": "error", "message": f"Brain Error: {error_msg}", "speech": f"I encountered an error: {error_msg}"}
 
     else:
-        send_ui_log(f"I didn't understand. Intent was: {service}", "error")
-        speak("I did not understand which service to use.")
+        return {"status": "error", "message": f"I didn't understand. Intent was: {service}",
+                "speech": "I did not understand which service to use."}
+
+    # Known service but unsupported action: nothing was done
+    return {"status": "skipped", "message": None, "speech": None}
+
+def announce_result(intent, result):
+    """Shows a result in the UI and speaks it."""
+    if not result or result.get("status") in ("skipped", "cancelled"):
+        return
+    service = intent.get("service")
+    # A streamed reply was already shown and spoken sentence by sentence
+    streamed = intent.get("streamed", False)
+
+    if result.get("message") and not streamed:
+        send_ui_log(result["message"], "error" if result["status"] == "error" else "system")
+    if service == "conversational" and not streamed:
+        send_ui_update("speaking", "Speaking...")
+    if result.get("speech") and not streamed:
+        speak(result["speech"])
+
+    if service == "error":
+        send_ui_update("error", "Error")
+    elif service in ("system", "email", "browser"):
+        send_ui_update("idle", "Done")
+    else:
         send_ui_update("idle", "Ready")
 
-def process_command(command_text: str):
+async def execute_intent(intent):
+    """
+    Executes a single workflow intent and announces the result.
+    """
+    result = await run_intent(intent)
+    announce_result(intent, result)
+    return result
+
+def execute_single_intent(intent):
+    """Blocking version of execute_intent for worker threads."""
+    return run_on_main_loop(execute_intent(intent))
+
+def run_on_main_loop(coro):
+    """Runs a coroutine on the FastAPI loop from a worker thread and waits for it."""
+    coro = metrics.with_trace(metrics.current_trace(), coro)  # Keep timing the same turn over there
+    if main_loop and main_loop.is_running():
+        return asyncio.run_coroutine_threadsafe(coro, main_loop).result()
+    return asyncio.run(coro)
+
+def execute_intents(intents, cancelled=None):
+    """
+    Executes all intents of one command. Independent intents run concurrently
+    (see scheduler.py); results are announced in the order they were given.
+    """
+    if not isinstance(intents, list):
+        intents = [intents]
+    if cancelled is not None and cancelled.is_set():
+        return []
+    if len(intents) == 1:
+        return [execute_single_intent(intents[0])]
+
+    return run_on_main_loop(scheduler.run(
+        intents, run_intent,
+        on_result=lambda i, intent, result: announce_result(intent, result),
+        cancelled=cancelled,
+    ))
+
+class StreamedTurn:
+    """
+    Runs a command's intents while the LLM is still writing them (see
+    IntentStreamParser): each intent starts as soon as it is complete, and
+    sentences of a "response" are shown and spoken as they arrive.
+    add()/say() are the parse_command callbacks; close() ends the stream
+    without blocking, wait() blocks until everything has been executed.
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, cancelled=None):
+        self.id = next(self._ids)
+        self.cancelled = cancelled
+        self.added = 0
+        self.intents = []
+        self.speaking = False
+        self.future = None
+        self.stream = None
+        if main_loop and main_loop.is_running():
+            self.stream = run_on_main_loop(self._open())
+        # Without the FastAPI loop (scripts, tests) intents are collected and run in wait()
+
+    async def _open(self):
+        return scheduler.stream(
+            run_intent,
+            on_result=lambda i, intent, result: announce_result(intent, result),
+            cancelled=self.cancelled,
+        )
+
+    def add(self, intent):
+        self.added += 1
+        self.intents.append(intent)
+        if self.stream is not None:
+            # call_soon_threadsafe copies this thread's context, so the turn's trace follows
+            main_loop.call_soon_threadsafe(self.stream.add, intent)
+
+    def say(self, sentence):
+        if self.cancelled is not None and self.cancelled.is_set():
+            return
+        if not self.speaking:
+            self.speaking = True
+            send_ui_update("speaking", "Speaking...")
+        send_ui_log(sentence, "stream", stream=self.id)
+        speak(sentence)
+
+    def close(self, intents):
+        """The LLM is done; intents is what parse_command returned."""
+        if not isinstance(intents, list):
+            intents = [intents]
+        if not self.added:
+            # Nothing was parsed incrementally (error, plain-text reply, streaming off)
+            for intent in intents:
+                self.add(intent)
+        if self.stream is not None:
+            self.future = asyncio.run_coroutine_threadsafe(
+                metrics.with_trace(metrics.current_trace(), self.stream.finish()), main_loop)
+
+    def wait(self):
+        if self.future is not None:
+            return self.future.result()
+        return execute_intents(self.intents, cancelled=self.cancelled)
+
+def process_command(command_text: str, cancelled=None):
     if not command_text:
         return
 
     send_ui_update("thinking", "Thinking...")
     send_ui_log(f"User said: {command_text}", "user")
 
-    intent = parse_command(command_text)
-    print(f"Intent: {intent}")
+    turn = StreamedTurn(cancelled=cancelled)
+    try:
+        intent = parse_command(command_text, on_intent=turn.add, on_sentence=turn.say)
+    except Exception:
+        turn.close([])  # Still finish whatever already started
+        raise
+    logger.debug("Intent: %s", intent)
     
-    if isinstance(intent, list):
-        # Handle multiple commands
-        for single_intent in intent:
-            execute_single_intent(single_intent)
-    else:
-        # Handle single command
-        execute_single_intent(intent)
+    # Handles single and multiple commands
+    turn.close(intent)
+    turn.wait()
+
+def send_command_event(job, status):
+    """Tells the UI where a typed command is (queued, started, done, cancelled)."""
+    if main_loop and main_loop.is_running():
+        asyncio.run_coroutine_threadsafe(
+            manager.broadcast({"type": "command", "id": job.id, "text": job.text, "status": status}),
+            main_loop
+        )
+
+# Typed commands run on a few workers instead of a thread each
+command_pool = CommandWorkerPool(
+    lambda job: process_command(job.text, cancelled=job.cancelled),
+    on_event=send_command_event,
+)
+
+def send_timing(summary: dict):
+    """Per-turn latency breakdown for the UI."""
+    if main_loop and main_loop.is_running():
+        asyncio.run_coroutine_threadsafe(manager.broadcast({"type": "timing", **summary}), main_loop)
+
+metrics.registry.trace_listeners.append(send_timing)
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Latency summaries (p50/p95/p99) in Prometheus text format."""
+    return metrics.registry.render()
+
+@app.get("/api/clients")
+def client_stats():
+    """Websocket clients: outbound queue depth, sent and dropped messages, evictions."""
+    return {"events": manager.stats(), "telemetry": telemetry_manager.stats()}
+
+@app.get("/api/queue")
+def queue_stats():
+    """Depth and wait times of the typed-command pool and the voice pipeline."""
+    return {"text": command_pool.stats(), "voice": core_loop.pipeline.stats()}
 
 from .core import core_loop
 
@@ -265,7 +424,7 @@ async def websocket_endpoint(websocket: WebSocket):
     try:
         while True:
             data = await websocket.receive_text()
-            print(f"DEBUG: WS Received: {data}")
+            logger.debug("WS received: %s", data)
             
             if data == "start_listening":
                 # Manual override: Force start listening?
@@ -275,24 +434,64 @@ async def websocket_endpoint(websocket: WebSocket):
                 send_ui_update("listening", "Listening (Manual)...")
                 
                 # We need to signal the core loop to switch state.
-                # Since core loop is running in thread, we can just set state.
-                core_loop.state = "LISTENING"
+                # set_state also interrupts the idle capture so it switches immediately.
+                core_loop.set_state("LISTENING")
 
             elif data == "stop_listening":
-                # Cancel current listening
+                # Cancel current listening and cut off anything being spoken
                 core_loop.recorder.stop()
+                tts_worker.interrupt()
                 
             elif data.startswith("text_command:"):
-                command_text = data.split("text_command:")[1]
-                # Run processing in thread
-                threading.Thread(target=process_command, args=(command_text,), daemon=True).start()
+                command_text = data.split("text_command:", 1)[1]
+                job, status = command_pool.submit(command_text, client=id(websocket))
+                if job is None:
+                    await manager.send(websocket, {"type": "command", "id": None, "text": command_text, "status": status})
+                elif status == "coalesced":
+                    logger.debug("'%s' is already pending as command %s", command_text, job.id)
+
+            elif data.startswith("cancel_command:"):
+                try:
+                    command_pool.cancel(int(data.split("cancel_command:", 1)[1]))
+                except ValueError:
+                    pass
                 
     except WebSocketDisconnect:
         manager.disconnect(websocket)
+        command_pool.cancel_all(client=id(websocket))
+
+@app.websocket("/ws/telemetry")
+async def telemetry_endpoint(websocket: WebSocket):
+    """Server -> client only: packed float32 volume/waveform frames."""
+    await telemetry_manager.connect(websocket)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    except (WebSocketDisconnect, RuntimeError):
+        pass  # Socket already closed (e.g. evicted)
+    finally:
+        telemetry_manager.disconnect(websocket)
+
 
 
 
 
+# Serve Frontend if built. Mounted last: a mount at "/" matches every path,
+# so the /api and /ws routes above must be registered before it.
+# Check if running in PyInstaller bundle
+if getattr(sys, 'frozen', False):
+    base_path = sys._MEIPASS
+    frontend_path = os.path.join(base_path, "frontend_dist")
+else:
+    # Check local dist
+    frontend_path = os.path.join(os.path.dirname(__file__), "frontend/dist")
+
+if os.path.exists(frontend_path):
+    logger.info("Serving frontend from %s", frontend_path)
+    app.mount("/", StaticFiles(directory=frontend_path, html=True), name="static")
+
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
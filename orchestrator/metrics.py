@@ -0,0 +1,265 @@
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Latency metrics.
+# Every voice or typed turn gets a Trace. Code along the path marks moments
+# (capture start, end of speech, STT, LLM, service calls, TTS) on the current
+# trace; when the turn is over the trace turns those marks into stage
+# durations, feeds them to the registry and tells listeners (the UI).
+# The registry keeps a window of recent samples per series and renders
+# p50/p95/p99 summaries in Prometheus text format.
+
+METRICS_WINDOW = 1024   # Recent samples kept per series for the quantiles
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Stages derived from pairs of marks: (stage, from mark, to mark)
+MARK_STAGES = [
+    ("queue_wait", "queued", "started"),
+    ("capture", "capture_start", "speech_end"),
+    ("stt", "stt_start", "stt_end"),
+    ("llm_first_byte", "llm_request", "llm_first_byte"),
+    ("llm", "llm_request", "llm_done"),
+    ("tts", "tts_start", "tts_end"),
+    # What the user feels: stopped talking -> assistant starts answering
+    ("response", "speech_end", "tts_start"),
+]
+
+
+class Series:
+    def __init__(self):
+        self.samples = deque(maxlen=METRICS_WINDOW)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.summaries = {}     # name -> {label tuple: Series}
+        self.counters = {}      # name -> {label tuple: int}
+        self.help = {}
+        self.trace_listeners = []
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def observe(self, name, value, **labels):
+        with self.lock:
+            series = self.summaries.setdefault(name, {}).setdefault(_labels(labels), Series())
+            series.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        with self.lock:
+            counters = self.counters.setdefault(name, {})
+            key = _labels(labels)
+            counters[key] = counters.get(key, 0) + amount
+
+    def quantiles(self, name, **labels):
+        with self.lock:
+            series = self.summaries.get(name, {}).get(_labels(labels))
+            return {q: series.quantile(q) for q in QUANTILES} if series else None
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            for name, by_label in sorted(self.summaries.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} summary")
+                for key, series in sorted(by_label.items()):
+                    for q in QUANTILES:
+                        lines.append(f"{name}{_format_labels(key + (('quantile', q),))} {series.quantile(q):.6f}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {series.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {series.count}")
+            for name, by_label in sorted(self.counters.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(by_label.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+registry.describe("assistant_turn_seconds", "Duration of a whole turn, first mark to last.")
+registry.describe("assistant_stage_seconds", "Duration of each stage of a turn.")
+registry.describe("assistant_service_call_seconds", "Orchestrator -> micro-service call latency.")
+registry.describe("service_request_seconds", "Request handling time inside a micro-service.")
+
+
+class Trace:
+    """
+    Timeline of one turn. Users of the trace retain() it and release() it when
+    done (the pipeline job, each queued utterance); it finishes when the last
+    one lets go.
+    """
+    def __init__(self, source="voice"):
+        self.id = uuid.uuid4().hex[:12]
+        self.source = source
+        self.marks = {}         # name -> wall-clock time
+        self.spans = {}         # stage -> [total seconds, count]
+        self.lock = threading.Lock()
+        self.refs = 0
+        self.finished = False
+
+    def mark(self, name, at=None, overwrite=False):
+        with self.lock:
+            if overwrite or name not in self.marks:
+                self.marks[name] = at if at is not None else time.time()
+
+    def add_span(self, stage, seconds):
+        with self.lock:
+            total = self.spans.setdefault(stage, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+
+    @contextmanager
+    def span(self, stage):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_span(stage, time.time() - start)
+
+    def retain(self):
+        with self.lock:
+            self.refs += 1
+
+    def release(self):
+        with self.lock:
+            self.refs -= 1
+            done = self.refs <= 0 and not self.finished
+            if done:
+                self.finished = True
+        if done:
+            self._finish()
+
+    def summary(self):
+        with self.lock:
+            marks = dict(self.marks)
+            spans = {stage: total for stage, (total, _) in self.spans.items()}
+        stages = dict(spans)
+        for stage, start, end in MARK_STAGES:
+            if start in marks and end in marks and marks[end] >= marks[start]:
+                stages[stage] = marks[end] - marks[start]
+        origin = min(marks.values()) if marks else time.time()
+        return {
+            "trace_id": self.id,
+            "source": self.source,
+            "total": round(max(marks.values()) - origin, 4) if marks else 0.0,
+            "stages": {stage: round(seconds, 4) for stage, seconds in stages.items()},
+            "marks": {name: round(at - origin, 4) for name, at in sorted(marks.items(), key=lambda m: m[1])},
+        }
+
+    def _finish(self):
+        if not self.marks:
+            return  # Nothing happened (e.g. cancelled while queued)
+        summary = self.summary()
+        registry.observe("assistant_turn_seconds", summary["total"], source=self.source)
+        for stage, seconds in summary["stages"].items():
+            registry.observe("assistant_stage_seconds", seconds, stage=stage)
+        logger.debug("Turn %s timings: %s", self.id, summary["stages"])
+        for listener in list(registry.trace_listeners):
+            try:
+                listener(summary)
+            except Exception as e:
+                logger.warning("Trace listener failed: %s", e)
+
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def activate(trace):
+    """Makes trace the current one for this thread/task (None is allowed)."""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+async def with_trace(trace, coro):
+    """Runs a coroutine with trace as the current one (for run_coroutine_threadsafe)."""
+    _current.set(trace)
+    return await coro
+
+
+def mark(name, at=None, overwrite=False):
+    """Marks a moment on the current trace, if any."""
+    trace = _current.get()
+    if trace is not None:
+        trace.mark(name, at, overwrite)
+
+
+@contextmanager
+def span(stage):
+    """Times a block into the current trace, if any."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(stage):
+        yield
+
+
+def instrument_app(app, service):
+    """
+    Adds request timing middleware and a GET /metrics endpoint (Prometheus text)
+    to a micro-service's FastAPI app.
+    """
+    from fastapi import Request
+    from fastapi.responses import PlainTextResponse
+
+    @app.middleware("http")
+    async def time_requests(request: Request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            if request.url.path != "/metrics":
+                registry.observe("service_request_seconds", time.perf_counter() - start,
+                                 service=service, path=request.url.path)
+                registry.inc("service_requests_total", service=service, path=request.url.path, status=status)
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics():
+        return registry.render()
+
+    return app
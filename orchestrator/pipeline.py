@@ -0,0 +1,192 @@
+import logging
+import queue
+import threading
+import itertools
+import time
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Command pipeline.
+# The core loop keeps capturing and recognizing speech while earlier commands
+# are parsed and executed on their own workers. Stages are connected by
+# bounded queues; jobs carry a cancel flag that every stage checks.
+
+STAGE_QUEUE_SIZE = 4
+
+_job_ids = itertools.count(1)
+
+
+class Job:
+    """One user command moving through the pipeline."""
+    def __init__(self, text, source="voice", trace=None):
+        self.id = next(_job_ids)
+        self.text = text
+        self.source = source
+        self.trace = trace          # metrics.Trace of the turn, if any
+        self.intents = None
+        self.created = time.time()
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.text!r})"
+
+
+class Stage:
+    """A worker thread draining a bounded queue into a handler."""
+    def __init__(self, name, handler, maxsize=STAGE_QUEUE_SIZE, on_skip=None):
+        self.name = name
+        self.handler = handler
+        self.on_skip = on_skip
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.thread = None
+        self.processed = 0
+        self.busy = False
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name=f"stage-{self.name}", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread:
+            self.queue.put(None)
+            self.thread = None
+
+    def offer(self, job):
+        """Non-blocking submit. Returns False when the stage is full."""
+        try:
+            self.queue.put_nowait(job)
+            return True
+        except queue.Full:
+            return False
+
+    def put(self, job, poll=0.2):
+        """Blocking submit (backpressure) that gives up if the job is cancelled meanwhile."""
+        while not job.cancelled.is_set():
+            try:
+                self.queue.put(job, timeout=poll)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            if job.cancelled.is_set():
+                logger.debug("[%s] skipping cancelled %s", self.name, job)
+                if self.on_skip:
+                    self.on_skip(job)
+                continue
+            self.busy = True
+            try:
+                with metrics.activate(job.trace):
+                    self.handler(job)
+            except Exception as e:
+                logger.exception("Error in pipeline stage '%s': %s", self.name, e)
+            finally:
+                self.busy = False
+                self.processed += 1
+
+    def stats(self):
+        return {"queued": self.queue.qsize(), "busy": self.busy, "processed": self.processed}
+
+
+class CommandPipeline:
+    """
+    parse -> execute, each on its own worker. Speaking is already asynchronous
+    (TTS worker), and capture/recognition stay on the core loop thread.
+    """
+    def __init__(self, parse, execute, on_error=None):
+        self.parse = parse          # parse(job) -> sets job.intents
+        self.execute = execute      # execute(job)
+        self.on_error = on_error    # on_error(job, exception)
+        self.lock = threading.Lock()
+        self.active = set()
+        self.parse_stage = Stage("parse", self._parse, on_skip=self._forget)
+        self.execute_stage = Stage("execute", self._execute, on_skip=self._forget)
+
+    def start(self):
+        self.parse_stage.start()
+        self.execute_stage.start()
+
+    def stop(self):
+        self.cancel_all()
+        self.parse_stage.stop()
+        self.execute_stage.stop()
+
+    def submit(self, text, source="voice", trace=None):
+        """Queues a command. Returns the Job, or None if the pipeline is saturated."""
+        job = Job(text, source, trace)
+        if trace is not None:
+            trace.retain()  # Released when the job leaves the pipeline
+        with self.lock:
+            self.active.add(job)
+        if not self.parse_stage.offer(job):
+            self._forget(job)
+            return None
+        return job
+
+    def cancel_all(self):
+        """Aborts everything queued or in flight (results of running calls are dropped)."""
+        with self.lock:
+            jobs = list(self.active)
+        for job in jobs:
+            job.cancel()
+        if jobs:
+            logger.debug("Cancelled %d command(s).", len(jobs))
+        return len(jobs)
+
+    def busy(self):
+        with self.lock:
+            return bool(self.active)
+
+    def busy_except(self, job):
+        """True if any other command is still queued or running."""
+        with self.lock:
+            return any(other is not job for other in self.active)
+
+    def _forget(self, job):
+        if job.done.is_set():
+            return
+        job.done.set()
+        with self.lock:
+            self.active.discard(job)
+        if job.trace is not None:
+            job.trace.release()
+
+    def _parse(self, job):
+        try:
+            self.parse(job)
+        except Exception as e:
+            self._forget(job)
+            if self.on_error:
+                self.on_error(job, e)
+            return
+        if job.cancelled.is_set() or not self.execute_stage.put(job):
+            self._forget(job)
+
+    def _execute(self, job):
+        try:
+            self.execute(job)
+        except Exception as e:
+            if self.on_error:
+                self.on_error(job, e)
+        finally:
+            self._forget(job)
+
+    def stats(self):
+        with self.lock:
+            active = len(self.active)
+        return {
+            "active": active,
+            "parse": self.parse_stage.stats(),
+            "execute": self.execute_stage.stats(),
+        }
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Intent scheduler.
+# A multi-intent command becomes a small dependency graph: independent intents
+# run concurrently (bounded per service), results are announced in the order
+# the user gave them. An intent that fails only fails itself; the intents
+# that depend on it are skipped (quietly, the failure is what gets reported).
+
+# How many calls each service may run at once. System actions drive the
+# keyboard/mouse, so they stay strictly one at a time.
+SERVICE_CONCURRENCY = {
+    "system": 1,
+    "browser": 2,
+    "email": 2,
+    "conversational": 1,
+}
+DEFAULT_CONCURRENCY = 2
+
+
+def build_dependencies(intents):
+    """
+    Returns a list of sets: deps[i] holds the indices intent i must wait for.
+    An explicit "depends_on" (index or list of indices) wins; otherwise each
+    system intent waits for the previous system intent (e.g. type_text after
+    open_app) and everything else is independent.
+    """
+    deps = []
+    last_system = None
+    for i, intent in enumerate(intents):
+        explicit = intent.get("depends_on")
+        if explicit is not None:
+            if not isinstance(explicit, list):
+                explicit = [explicit]
+            found = set()
+            for d in explicit:
+                try:
+                    d = int(d)
+                except (TypeError, ValueError):
+                    continue
+                if 0 <= d < i:  # Only earlier intents, so the graph can't cycle
+                    found.add(d)
+            deps.append(found)
+        elif intent.get("service") == "system" and last_system is not None:
+            deps.append({last_system})
+        else:
+            deps.append(set())
+
+        if intent.get("service") == "system":
+            last_system = i
+    return deps
+
+
+class IntentStream:
+    """
+    Intents that arrive one at a time (a streamed LLM reply). Each one starts
+    as soon as it is added and its dependencies are done; results are still
+    announced in order. Must be used on the event loop.
+    """
+    def __init__(self, scheduler, execute, on_result=None, cancelled=None):
+        self.scheduler = scheduler
+        self.execute = execute
+        self.on_result = on_result
+        self.cancelled = cancelled
+        self.intents = []
+        self.tasks = []
+        self.results = []
+        self.closed = False
+        self.changed = asyncio.Event()
+        self.announcer = asyncio.ensure_future(self._announce())
+
+    def add(self, intent):
+        i = len(self.intents)
+        self.intents.append(intent)
+        # Dependencies only ever point backwards, so intent i's are already final
+        deps = build_dependencies(self.intents)[i]
+        self.tasks.append(asyncio.ensure_future(self._run_one(i, intent, deps)))
+        self.changed.set()
+
+    async def finish(self):
+        """No more intents will come. Returns the results in order."""
+        self.closed = True
+        self.changed.set()
+        return await self.announcer
+
+    async def _run_one(self, i, intent, deps):
+        if deps:
+            deps = sorted(deps)
+            for d, result in zip(deps, await asyncio.gather(*(self.tasks[d] for d in deps))):
+                if result and (result.get("status") == "error" or "failed_dependency" in result):
+                    # Name the intent that actually failed, not an intermediate skip
+                    failed = result.get("failed_dependency", d)
+                    return {"status": "skipped", "message": f"Skipped because step {failed + 1} failed",
+                            "speech": None, "failed_dependency": failed}
+        if self.cancelled is not None and self.cancelled.is_set():
+            return {"status": "cancelled", "message": "Cancelled", "speech": None}
+        try:
+            async with self.scheduler._semaphore(intent.get("service")):
+                return await self.execute(intent)
+        except Exception as e:
+            logger.exception("Intent %d (%s) failed: %s", i + 1, intent.get("action", intent.get("service")), e)
+            return {"status": "error", "message": f"Error: {e}", "speech": "I encountered an error executing that task."}
+
+    async def _announce(self):
+        i = 0
+        while True:
+            if i < len(self.tasks):
+                result = await self.tasks[i]
+                self.results.append(result)
+                if self.on_result:
+                    self.on_result(i, self.intents[i], result)
+                i += 1
+            elif self.closed:
+                return self.results
+            else:
+                self.changed.clear()
+                await self.changed.wait()
+
+
+class IntentScheduler:
+    def __init__(self, limits=None):
+        self.limits = dict(SERVICE_CONCURRENCY, **(limits or {}))
+        self.semaphores = {}
+
+    def _semaphore(self, service):
+        # Created lazily so they bind to the running (FastAPI) loop
+        if service not in self.semaphores:
+            self.semaphores[service] = asyncio.Semaphore(self.limits.get(service, DEFAULT_CONCURRENCY))
+        return self.semaphores[service]
+
+    def stream(self, execute, on_result=None, cancelled=None):
+        """Opens an IntentStream for intents that are still being generated."""
+        return IntentStream(self, execute, on_result, cancelled)
+
+    async def run(self, intents, execute, on_result=None, cancelled=None):
+        """
+        execute(intent) is an async callable returning a result dict.
+        on_result(index, intent, result) is called in the original order, as
+        soon as a result and every result before it are available.
+        cancelled is an optional threading.Event; intents not started yet are skipped.
+        Returns the results in order.
+        """
+        stream = self.stream(execute, on_result, cancelled)
+        for intent in intents:
+            stream.add(intent)
+        return await stream.finish()
+
+
+scheduler = IntentScheduler()
@@ -0,0 +1,96 @@
+import os
+import time
+import weakref
+import httpx
+
+from . import metrics
+
+# Pooled async HTTP clients for the micro-services.
+# One keep-alive connection pool per service, shared by every intent and
+# running on the FastAPI event loop. When a service's app lives in this same
+# process (launcher.py), requests are dispatched to it directly over ASGI.
+
+SERVICE_CONNECT_TIMEOUT = float(os.getenv("SERVICE_CONNECT_TIMEOUT", "2.0"))
+# GUI automation (WhatsApp) and SMTP can legitimately take a while
+SERVICE_READ_TIMEOUT = float(os.getenv("SERVICE_READ_TIMEOUT", "60.0"))
+SERVICE_MAX_CONNECTIONS = int(os.getenv("SERVICE_MAX_CONNECTIONS", "8"))
+SERVICE_KEEPALIVE_CONNECTIONS = 4
+
+
+class ServiceClient:
+    def __init__(self, name, base_url):
+        self.name = name
+        self.base_url = base_url
+        self.transport = None   # None = HTTP over the network
+        self.client = None
+
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.new_connections = 0
+        self.seen_connections = weakref.WeakSet()
+
+    def use_app(self, app):
+        """Calls a co-located ASGI app in-process instead of over loopback HTTP."""
+        self.transport = httpx.ASGITransport(app=app)
+        self.base_url = f"http://{self.name}.inprocess"  # Host is ignored, only the path is routed
+        self.client = None
+
+    def _get_client(self):
+        # Created lazily so it binds to the running event loop
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                transport=self.transport,
+                timeout=httpx.Timeout(SERVICE_READ_TIMEOUT, connect=SERVICE_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=SERVICE_MAX_CONNECTIONS,
+                                    max_keepalive_connections=SERVICE_KEEPALIVE_CONNECTIONS),
+            )
+        return self.client
+
+    def _pool_connections(self):
+        # httpx doesn't expose its pool publicly; only used for stats
+        pool = getattr(getattr(self.client, "_transport", None), "_pool", None)
+        return list(getattr(pool, "connections", []))
+
+    async def post(self, path, **kwargs):
+        client = self._get_client()
+        self.requests += 1
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await client.post(path, **kwargs)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            elapsed = time.perf_counter() - start
+            metrics.registry.observe("assistant_service_call_seconds", elapsed, service=self.name, path=path)
+            trace = metrics.current_trace()
+            if trace is not None:
+                trace.add_span(f"service_{self.name}", elapsed)
+            for conn in self._pool_connections():
+                if conn not in self.seen_connections:
+                    self.seen_connections.add(conn)
+                    self.new_connections += 1
+
+    def stats(self):
+        connections = self._pool_connections()
+        idle = sum(1 for c in connections if c.is_idle())
+        return {
+            "transport": "asgi" if self.transport else "http",
+            "base_url": self.base_url,
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "in_use": len(connections) - idle,
+            "idle": idle,
+            "connections_opened": self.new_connections,
+            "reuse_rate": round(1 - self.new_connections / self.requests, 3) if self.requests else 0.0,
+        }
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
@@ -0,0 +1,266 @@
+import logging
+import os
+import sys
+import time
+import json
+import wave
+import numpy as np
+import speech_recognition as sr
+
+logger = logging.getLogger(__name__)
+
+# Speech-to-Text engines.
+# Every engine takes int16 mono samples and returns the recognized text ("" if nothing).
+# Engines are created once and reused, so local models stay loaded between utterances.
+
+STT_ENGINE = os.getenv("STT_ENGINE", "google")  # google, vosk, fake
+# Engine to use instead when STT_ENGINE can't start, e.g. "google". Empty = don't, report the error.
+STT_FALLBACK = os.getenv("STT_FALLBACK", "").lower()
+VOSK_MODEL_PATH = os.getenv("VOSK_MODEL_PATH", "models/vosk-model-small-en-us-0.15")
+
+
+class STTEngineError(Exception):
+    """The configured engine could not be started."""
+
+
+class STTStream:
+    """
+    Incremental recognition session for one utterance.
+    feed() takes new samples as they arrive and returns the current partial
+    hypothesis (or None); finish() returns the final text.
+    """
+    def __init__(self, engine, sample_rate):
+        self.engine = engine
+        self.sample_rate = sample_rate
+        self.samples_fed = 0
+        self.processing_seconds = 0.0
+
+    def feed(self, samples):
+        start = time.perf_counter()
+        partial = self.accept(samples)
+        self.processing_seconds += time.perf_counter() - start
+        self.samples_fed += len(samples)
+        return partial
+
+    def finish(self, samples):
+        """samples is the whole utterance, for engines that can't decode incrementally."""
+        start = time.perf_counter()
+        text = self.final(samples)
+        elapsed = self.processing_seconds + time.perf_counter() - start
+        self.engine.record(len(samples) / float(self.sample_rate), elapsed)
+        return text
+
+    def accept(self, samples):
+        return None
+
+    def final(self, samples):
+        return self.engine.transcribe(samples, self.sample_rate)
+
+
+class STTEngine:
+    """Base class for speech-to-text backends."""
+    name = "base"
+    supports_streaming = False
+
+    def __init__(self):
+        self.calls = 0
+        self.audio_seconds = 0.0
+        self.processing_seconds = 0.0
+        self.last_rtf = 0.0
+
+    def transcribe(self, samples, sample_rate):
+        """Returns the text for int16 mono samples."""
+        raise NotImplementedError
+
+    def recognize(self, samples, sample_rate):
+        """Runs transcribe() and records the real-time factor (processing time / audio time)."""
+        start = time.perf_counter()
+        text = self.transcribe(samples, sample_rate)
+        self.record(len(samples) / float(sample_rate), time.perf_counter() - start)
+        return text
+
+    def create_stream(self, sample_rate):
+        """Starts an incremental session. The default one only decodes at finish()."""
+        return STTStream(self, sample_rate)
+
+    def record(self, duration, elapsed):
+        self.calls += 1
+        self.audio_seconds += duration
+        self.processing_seconds += elapsed
+        self.last_rtf = elapsed / duration if duration else 0.0
+        logger.debug("STT[%s] %.2fs audio in %.3fs (RTF %.2f)", self.name, duration, elapsed, self.last_rtf)
+
+    def stats(self):
+        return {
+            "engine": self.name,
+            "calls": self.calls,
+            "audio_seconds": round(self.audio_seconds, 3),
+            "processing_seconds": round(self.processing_seconds, 3),
+            "rtf": round(self.processing_seconds / self.audio_seconds, 3) if self.audio_seconds else 0.0,
+            "last_rtf": round(self.last_rtf, 3),
+        }
+
+
+class GoogleSTT(STTEngine):
+    """Google Web Speech API through SpeechRecognition (needs network)."""
+    name = "google"
+
+    def __init__(self):
+        super().__init__()
+        self.recognizer = sr.Recognizer()
+
+    def transcribe(self, samples, sample_rate):
+        audio = sr.AudioData(samples.tobytes(), sample_rate, 2)
+        try:
+            return self.recognizer.recognize_google(audio)
+        except sr.UnknownValueError:
+            logger.debug("Audio not understood.")
+            return ""
+        except sr.RequestError as e:
+            logger.warning("Request error; %s", e)
+            return ""
+
+
+class VoskStream(STTStream):
+    def __init__(self, engine, sample_rate):
+        super().__init__(engine, sample_rate)
+        self.rec = engine._recognizer(sample_rate)
+        self.segments = []
+
+    def accept(self, samples):
+        if self.rec.AcceptWaveform(samples.tobytes()):
+            # Vosk closed a segment at an internal pause
+            text = json.loads(self.rec.Result()).get("text", "")
+            if text:
+                self.segments.append(text)
+            return " ".join(self.segments)
+        partial = json.loads(self.rec.PartialResult()).get("partial", "")
+        return " ".join(self.segments + ([partial] if partial else []))
+
+    def final(self, samples):
+        # Only the tail that was never fed still needs decoding
+        if len(samples) > self.samples_fed:
+            self.rec.AcceptWaveform(samples[self.samples_fed:].tobytes())
+        text = json.loads(self.rec.FinalResult()).get("text", "")
+        return " ".join(self.segments + ([text] if text else []))
+
+
+class VoskSTT(STTEngine):
+    """Offline CPU recognition with a Vosk (Kaldi) model, loaded once."""
+    name = "vosk"
+    supports_streaming = True
+
+    def __init__(self, model_path=None):
+        super().__init__()
+        # Optional dependency, only needed when this engine is selected
+        from vosk import Model, SetLogLevel
+        SetLogLevel(-1)
+        model_path = model_path or VOSK_MODEL_PATH
+        logger.info("Loading Vosk model from %s...", model_path)
+        self.model = Model(model_path)
+
+    def _recognizer(self, sample_rate):
+        from vosk import KaldiRecognizer
+        return KaldiRecognizer(self.model, sample_rate)
+
+    def transcribe(self, samples, sample_rate):
+        rec = self._recognizer(sample_rate)
+        rec.AcceptWaveform(samples.tobytes())
+        return json.loads(rec.FinalResult()).get("text", "")
+
+    def create_stream(self, sample_rate):
+        return VoskStream(self, sample_rate)
+
+
+class FakeStream(STTStream):
+    """Reveals the next scripted transcript one word per feed() call."""
+    def __init__(self, engine, sample_rate):
+        super().__init__(engine, sample_rate)
+        self.words = engine.transcripts[0].split() if engine.transcripts else []
+        self.revealed = 0
+
+    def accept(self, samples):
+        if not self.words:
+            return None
+        self.revealed = min(self.revealed + 1, len(self.words))
+        return " ".join(self.words[:self.revealed])
+
+
+class FakeSTT(STTEngine):
+    """Deterministic engine for tests: returns scripted transcripts in order."""
+    name = "fake"
+    supports_streaming = True
+
+    def __init__(self, transcripts=None, latency=0.0):
+        super().__init__()
+        self.transcripts = list(transcripts or [])
+        self.latency = latency
+
+    def transcribe(self, samples, sample_rate):
+        if self.latency:
+            time.sleep(self.latency)
+        if not self.transcripts:
+            return ""
+        return self.transcripts.pop(0)
+
+    def create_stream(self, sample_rate):
+        return FakeStream(self, sample_rate)
+
+
+ENGINES = {
+    "google": GoogleSTT,
+    "vosk": VoskSTT,
+    "fake": FakeSTT,
+}
+
+
+def _create_engine(name):
+    engine_cls = ENGINES.get(name)
+    if engine_cls is None:
+        raise ValueError(f"unknown engine (choose from {', '.join(ENGINES)})")
+    return engine_cls()
+
+
+def get_stt_engine(name=None, fallback=None):
+    """
+    Creates the configured engine. If it can't start (unknown name, missing
+    model or package) the fallback engine (STT_FALLBACK) is used when one is
+    set, otherwise STTEngineError is raised.
+    """
+    name = (name or STT_ENGINE).lower()
+    fallback = STT_FALLBACK if fallback is None else fallback.lower()
+    try:
+        return _create_engine(name)
+    except Exception as e:
+        if not fallback or fallback == name:
+            raise STTEngineError(f"Could not start STT engine '{name}': {e}") from e
+        # Never silent: the fallback may send audio somewhere the user didn't pick (google is online)
+        logger.warning("Could not start STT engine '%s': %s. STT_FALLBACK is set, using '%s' instead.",
+                       name, e, fallback)
+        return _create_engine(fallback)
+
+
+def load_wav(path):
+    """Reads a 16-bit mono WAV file into (int16 samples, sample_rate)."""
+    with wave.open(path, "rb") as wf:
+        sample_rate = wf.getframerate()
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        if wf.getnchannels() > 1:
+            samples = samples[::wf.getnchannels()]
+    return samples, sample_rate
+
+
+if __name__ == "__main__":
+    # Real-time factor benchmark: python -m orchestrator.stt clip.wav [engine ...]
+    if len(sys.argv) < 2:
+        print("Usage: python -m orchestrator.stt <clip.wav> [engine ...]")
+        sys.exit(1)
+
+    samples, rate = load_wav(sys.argv[1])
+    for engine_name in sys.argv[2:] or [STT_ENGINE]:
+        engine = get_stt_engine(engine_name)
+        engine.recognize(samples, rate)  # Warm-up, not counted
+        engine.calls, engine.audio_seconds, engine.processing_seconds = 0, 0.0, 0.0
+        for _ in range(3):
+            text = engine.recognize(samples, rate)
+        print(f"{engine.name}: '{text}' {engine.stats()}")
@@ -0,0 +1,97 @@
+import logging
+import struct
+import asyncio
+from collections import deque
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# High-rate UI telemetry (microphone volume, waveform preview).
+# The audio thread only appends the latest value; publishing happens on a
+# fixed tick from the event loop, once per tick for all clients.
+#
+# On the binary channel (/ws/telemetry) every message is one frame:
+#   uint8 version | uint8 kind | uint16 count | uint32 seq | count x float32
+# all little-endian, so the samples start 4-byte aligned at offset 8 and the
+# browser can view them directly as a Float32Array.
+
+TELEMETRY_HZ = 30
+
+FRAME_VERSION = 1
+KIND_VOLUME = 1     # Levels since the previous frame, oldest first
+KIND_WAVEFORM = 2   # Peak envelope of the last fraction of a second, 0..1
+FRAME_HEADER = struct.Struct("<BBHI")
+
+MAX_BATCH = 64      # Levels kept between ticks (the callback runs ~16x a second)
+
+
+def pack_frame(kind, seq, samples):
+    samples = np.asarray(samples, dtype="<f4")
+    return FRAME_HEADER.pack(FRAME_VERSION, kind, len(samples), seq & 0xFFFFFFFF) + samples.tobytes()
+
+
+def unpack_frame(data):
+    """Returns (version, kind, seq, float32 samples)."""
+    version, kind, count, seq = FRAME_HEADER.unpack_from(data)
+    samples = np.frombuffer(data, dtype="<f4", count=count, offset=FRAME_HEADER.size)
+    return version, kind, seq, samples
+
+
+class VolumeTelemetry:
+    def __init__(self, broadcast, hz=TELEMETRY_HZ, broadcast_binary=None, waveform_source=None):
+        self.broadcast = broadcast                  # async callable(message: dict), JSON fallback
+        self.broadcast_binary = broadcast_binary    # async callable(frame: bytes)
+        self.waveform_source = waveform_source      # callable() -> float32 array, or None
+        self.interval = 1.0 / hz
+        self.level = 0.0
+        self.levels = deque(maxlen=MAX_BATCH)
+        self.seq = 0                 # Bumped by every update
+        self.published_seq = 0
+        self.frame_seq = 0
+        self.task = None
+
+    def update(self, level):
+        """Called from the PortAudio thread. Just stores the value, never schedules anything."""
+        self.level = level
+        self.levels.append(level)   # deque.append is atomic
+        self.seq += 1
+
+    def _drain_levels(self):
+        batch = []
+        while self.levels:
+            batch.append(self.levels.popleft())
+        return batch
+
+    async def publish(self):
+        if self.broadcast_binary is None:
+            await self.broadcast({"type": "volume", "level": float(self.level)})
+            return
+
+        batch = self._drain_levels() or [self.level]
+        self.frame_seq += 1
+        await self.broadcast_binary(pack_frame(KIND_VOLUME, self.frame_seq, batch))
+        if self.waveform_source is not None:
+            self.frame_seq += 1
+            await self.broadcast_binary(pack_frame(KIND_WAVEFORM, self.frame_seq, self.waveform_source()))
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            seq = self.seq
+            if seq == self.published_seq:
+                continue  # Nothing new since the last tick
+            self.published_seq = seq
+            try:
+                await self.publish()
+            except Exception as e:
+                logger.debug("Volume telemetry publish failed: %s", e)
+
+    def start(self):
+        """Must be called from the event loop (e.g. the FastAPI lifespan)."""
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
@@ -0,0 +1,178 @@
+import logging
+import os
+import queue
+import tempfile
+import threading
+import sounddevice as sd
+import pyttsx3
+
+from .stt import load_wav
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Text-to-Speech worker.
+# One thread owns the pyttsx3 engine (it isn't thread-safe) and plays queued
+# utterances in order, so speak() never blocks the caller. Fixed phrases are
+# synthesized to PCM once and replayed from memory.
+
+TTS_ENABLED = os.getenv("TTS_ENABLED", "1") == "1"
+TTS_RATE = 170
+
+# Acknowledgements that should start instantly
+CACHED_PHRASES = [
+    "Yes?",
+    "I didn't hear a response.",
+    "Email sent successfully.",
+    "Failed to send email.",
+    "I couldn't reach the email service.",
+    "Sorry, I had trouble understanding that.",
+    "I encountered an error executing that task.",
+]
+
+
+class Utterance:
+    """Handle for a queued phrase. done is set when it finished or was interrupted."""
+    def __init__(self, text, generation, trace=None):
+        self.text = text
+        self.generation = generation
+        self.trace = trace      # Turn this answer belongs to; kept open until it is spoken
+        self.done = threading.Event()
+        self.interrupted = False
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+
+class TTSWorker:
+    def __init__(self, enabled=TTS_ENABLED):
+        self.enabled = enabled
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.engine = None
+        self.cache = {}              # text -> (int16 samples, sample_rate)
+        self.generation = 0          # Bumped by interrupt(); older utterances are skipped
+        self.speaking = None         # Utterance the worker thread is on
+        self.pending = 0             # Queued + playing
+        self.idle = threading.Event()
+        self.idle.set()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def say(self, text):
+        """Queues text and returns immediately with an Utterance to wait on."""
+        if not self.enabled or not text:
+            utterance = Utterance(text, self.generation)
+            utterance.done.set()
+            return utterance
+        self.start()
+        utterance = Utterance(text, self.generation, metrics.current_trace())
+        if utterance.trace is not None:
+            utterance.trace.retain()
+        with self.lock:
+            self.pending += 1
+            self.idle.clear()
+        self.queue.put(utterance)
+        return utterance
+
+    def interrupt(self):
+        """
+        Barge-in: stops the current phrase and drops everything queued.
+        Safe from any thread: cached audio is stopped here, a phrase the
+        engine is speaking is stopped by the worker thread at its next word.
+        """
+        with self.lock:
+            self.generation += 1
+        try:
+            while True:
+                self._finish(self.queue.get_nowait(), interrupted=True)
+        except queue.Empty:
+            pass
+        sd.stop()
+
+    def _on_word(self, name, location, length):
+        # Engine callback, on the worker thread inside runAndWait()
+        utterance = self.speaking
+        if utterance is not None and utterance.generation != self.generation:
+            self.engine.stop()
+
+    def wait_idle(self, timeout=None):
+        """Blocks until everything queued so far has been spoken."""
+        return self.idle.wait(timeout)
+
+    def _finish(self, utterance, interrupted=False):
+        utterance.interrupted = interrupted
+        utterance.done.set()
+        with self.lock:
+            self.pending -= 1
+            if self.pending == 0:
+                self.idle.set()
+        if utterance.trace is not None:
+            utterance.trace.release()
+
+    def _init_engine(self):
+        self.engine = pyttsx3.init()
+        voices = self.engine.getProperty('voices')
+        if len(voices) > 1:
+            self.engine.setProperty('voice', voices[1].id)
+        self.engine.setProperty('rate', TTS_RATE)
+        self.engine.connect('started-word', self._on_word)
+
+    def _synthesize(self, text):
+        """Renders text to PCM through the engine (worker thread only)."""
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            self.engine.save_to_file(text, path)
+            self.engine.runAndWait()
+            return load_wav(path)
+        finally:
+            os.remove(path)
+
+    def _warm_cache(self):
+        for phrase in CACHED_PHRASES:
+            try:
+                self.cache[phrase] = self._synthesize(phrase)
+            except Exception as e:
+                logger.debug("Could not pre-synthesize '%s': %s", phrase, e)
+                break  # Engine can't render to file; live synthesis still works
+        logger.info("TTS ready, %d cached phrases.", len(self.cache))
+
+    def _run(self):
+        try:
+            self._init_engine()
+            self._warm_cache()
+        except Exception as e:
+            logger.error("Error starting TTS engine: %s", e)
+
+        while True:
+            utterance = self.queue.get()
+            if utterance.generation != self.generation or self.engine is None:
+                self._finish(utterance, interrupted=True)
+                continue
+            if utterance.trace is not None:
+                utterance.trace.mark("tts_start")
+            self.speaking = utterance
+            try:
+                cached = self.cache.get(utterance.text)
+                if cached is not None:
+                    samples, rate = cached
+                    sd.play(samples, rate)
+                    sd.wait()
+                else:
+                    self.engine.say(utterance.text)
+                    self.engine.runAndWait()
+            except Exception as e:
+                logger.warning("TTS playback failed: %s", e)
+            self.speaking = None
+            if utterance.trace is not None:
+                utterance.trace.mark("tts_end", overwrite=True)
+            self._finish(utterance, interrupted=utterance.generation != self.generation)
+
+
+tts_worker = TTSWorker()
@@ -0,0 +1,130 @@
+import os
+import numpy as np
+
+# Voice Activity Detection.
+# A VAD gets every captured block and returns "start", "end" or None.
+# `speaking` tells whether we are currently inside a speech segment.
+
+VAD_MODE = os.getenv("VAD_MODE", "adaptive")  # adaptive or fixed
+
+# Fixed VAD (the original hand-tuned values)
+SILENCE_THRESHOLD = 3.0   # norm(block) * 10
+SILENCE_DURATION = 1.2
+
+# Adaptive VAD
+VAD_START_DB = float(os.getenv("VAD_START_DB", "9.0"))   # Above the noise floor to start speech
+VAD_END_DB = float(os.getenv("VAD_END_DB", "5.0"))       # Below floor + this counts as silence (hysteresis)
+VAD_HANGOVER = float(os.getenv("VAD_HANGOVER", "0.3"))   # Seconds of silence before speech "end"
+VAD_MIN_SPEECH = 0.1                                     # Seconds above start level before speech "start"
+VAD_FLATNESS_MAX = 0.5                                   # Spectral flatness above this is noise, not voice
+
+
+class EnergyVAD:
+    """Fixed threshold on block energy, as originally tuned."""
+    def __init__(self, sample_rate=16000, block_size=1024,
+                 threshold=SILENCE_THRESHOLD, silence_duration=SILENCE_DURATION):
+        self.block_seconds = block_size / float(sample_rate)
+        self.threshold = threshold
+        self.silence_duration = silence_duration
+        self.speaking = False
+        self.silence = 0.0
+
+    def process(self, block):
+        amplitude = np.linalg.norm(block) * 10
+        if amplitude > self.threshold:
+            self.silence = 0.0
+            if not self.speaking:
+                self.speaking = True
+                return "start"
+            return None
+
+        self.silence += self.block_seconds
+        if self.speaking and self.silence >= self.silence_duration:
+            self.speaking = False
+            return "end"
+        return None
+
+
+class AdaptiveVAD:
+    """
+    Tracks the room's noise floor and decides speech relative to it.
+    - Noise floor: asymmetric moving average of block level (dB), fast to
+      follow quieter levels, slow to follow louder ones.
+    - Hysteresis: speech starts at floor + start_db, ends below floor + end_db.
+    - Hangover: speech only ends after `hangover` seconds below the end level.
+    - Optional spectral flatness / zero-crossing checks reject steady noise
+      (fans, hiss) that is loud but not voice-like.
+    """
+    def __init__(self, sample_rate=16000, block_size=1024, start_db=VAD_START_DB, end_db=VAD_END_DB,
+                 hangover=VAD_HANGOVER, min_speech=VAD_MIN_SPEECH, use_spectral=False, use_zcr=False):
+        self.block_seconds = block_size / float(sample_rate)
+        self.start_db = start_db
+        self.end_db = end_db
+        self.hangover = hangover
+        self.min_speech = min_speech
+        self.use_spectral = use_spectral
+        self.use_zcr = use_zcr
+
+        self.noise_floor = None
+        self.speaking = False
+        self.above = 0.0     # Seconds continuously above the start level
+        self.below = 0.0     # Seconds continuously below the end level
+        self.level = -100.0
+
+    def _is_voice_like(self, x):
+        if self.use_zcr:
+            zcr = np.count_nonzero(np.diff(np.signbit(x))) / float(len(x))
+            if zcr > 0.35:  # Hiss / fricative-only noise
+                return False
+        if self.use_spectral:
+            power = np.abs(np.fft.rfft(x)) ** 2 + 1e-12
+            flatness = np.exp(np.mean(np.log(power))) / np.mean(power)
+            if flatness > VAD_FLATNESS_MAX:
+                return False
+        return True
+
+    def process(self, block):
+        x = block.reshape(-1)
+        self.level = 10.0 * np.log10(np.mean(np.square(x, dtype=np.float64)) + 1e-10)
+
+        if self.noise_floor is None:
+            self.noise_floor = self.level
+
+        # Floor follows quiet levels quickly and loud ones slowly; inside speech it barely moves
+        if self.level < self.noise_floor:
+            rate = 0.3
+        elif self.speaking:
+            rate = 0.002
+        else:
+            rate = 0.02
+        self.noise_floor += rate * (self.level - self.noise_floor)
+
+        if not self.speaking:
+            if self.level > self.noise_floor + self.start_db and self._is_voice_like(x):
+                self.above += self.block_seconds
+                if self.above >= self.min_speech:
+                    self.speaking = True
+                    self.below = 0.0
+                    return "start"
+            else:
+                self.above = 0.0
+            return None
+
+        if self.level < self.noise_floor + self.end_db:
+            self.below += self.block_seconds
+            if self.below >= self.hangover:
+                self.speaking = False
+                self.above = 0.0
+                return "end"
+        else:
+            self.below = 0.0
+        return None
+
+
+def create_vad(mode=None, sample_rate=16000, block_size=1024):
+    mode = (mode or VAD_MODE).lower()
+    if mode == "fixed":
+        return EnergyVAD(sample_rate, block_size)
+    return AdaptiveVAD(sample_rate, block_size,
+                       use_spectral=os.getenv("VAD_SPECTRAL", "0") == "1",
+                       use_zcr=os.getenv("VAD_ZCR", "0") == "1")
@@ -0,0 +1,91 @@
+import unittest
+import sys
+import os
+import threading
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from orchestrator.command_pool import CommandWorkerPool, command_priority, PRIORITY_AUTOMATION, PRIORITY_CONVERSATION
+
+
+class TestCommandWorkerPool(unittest.TestCase):
+    def setUp(self):
+        self.gate = threading.Event()
+        self.order = []
+        self.events = []
+
+        def handler(job):
+            self.gate.wait(5)
+            self.order.append(job.text)
+
+        self.pool = CommandWorkerPool(handler, on_event=lambda job, status: self.events.append((job.id, status)),
+                                      workers=1, max_per_client=3)
+
+    def tearDown(self):
+        self.gate.set()
+        self.pool.stop()
+
+    def test_priority(self):
+        self.assertEqual(command_priority("open notepad"), PRIORITY_AUTOMATION)
+        self.assertEqual(command_priority("how are you"), PRIORITY_CONVERSATION)
+
+        blocker, _ = self.pool.submit("open chrome", client="a")   # Occupies the single worker
+        while blocker.started is None:
+            threading.Event().wait(0.01)
+        slow, _ = self.pool.submit("send an email to bob", client="b")
+        chat, _ = self.pool.submit("tell me a joke", client="c")
+        self.gate.set()
+        slow.done.wait(5)
+        chat.done.wait(5)
+        self.assertEqual(self.order, ["open chrome", "tell me a joke", "send an email to bob"])
+        self.assertEqual(self.pool.stats()["completed"], 3)
+
+    def test_per_client_limit_and_coalescing(self):
+        first, status = self.pool.submit("what time is it", client="a")
+        self.assertEqual(status, "queued")
+        again, status = self.pool.submit("What time is it ", client="a")
+        self.assertEqual(status, "coalesced")
+        self.assertIs(again, first)
+
+        self.pool.submit("hello", client="a")
+        self.pool.submit("how are you", client="a")
+        job, status = self.pool.submit("one more", client="a")
+        self.assertIsNone(job)
+        self.assertEqual(status, "rejected")
+
+        # Other clients have their own allowance
+        _, status = self.pool.submit("one more", client="b")
+        self.assertEqual(status, "queued")
+        self.assertEqual(self.pool.stats()["rejected"], 1)
+
+    def test_cancel_queued(self):
+        blocker, _ = self.pool.submit("open chrome", client="a")
+        queued, _ = self.pool.submit("tell me a joke", client="a")
+        self.assertTrue(self.pool.cancel(queued.id))
+        self.gate.set()
+        blocker.done.wait(5)
+        queued.done.wait(5)
+        self.assertEqual(self.order, ["open chrome"])
+        self.assertIn((queued.id, "cancelled"), self.events)
+        self.assertNotIn((queued.id, "started"), self.events)
+
+    def test_stop_with_a_full_queue(self):
+        pool = CommandWorkerPool(lambda job: self.gate.wait(5), workers=1, maxsize=2)
+        blocker, _ = pool.submit("open chrome", client="a")
+        while blocker.started is None:
+            threading.Event().wait(0.01)
+        queued = [pool.submit("open notepad", client="b")[0], pool.submit("open spotify", client="c")[0]]
+        self.assertEqual(pool.submit("open calculator", client="d")[1], "rejected")   # Queue is full
+
+        stopper = threading.Thread(target=pool.stop, daemon=True)
+        stopper.start()
+        stopper.join(1)
+        self.assertFalse(stopper.is_alive(), "stop() blocked on the full queue")
+        self.assertTrue(all(job.done.is_set() for job in queued))   # Dropped, not left waiting
+        self.gate.set()
+        self.assertTrue(blocker.done.wait(5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import sys
+import os
+import asyncio
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+import numpy as np
+
+from orchestrator.connections import ConnectionManager
+from orchestrator.telemetry import VolumeTelemetry, pack_frame, unpack_frame, KIND_VOLUME, KIND_WAVEFORM
+
+
+class FakeSocket:
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.received = []
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_bytes(self, data):
+        await self.send_text(data)
+
+    async def send_text(self, text):
+        if self.fail:
+            raise RuntimeError("socket is gone")
+        await asyncio.sleep(self.delay)
+        self.received.append(text)
+
+    async def close(self, code=1000):
+        self.closed = True
+
+
+class TestConnectionManager(unittest.IsolatedAsyncioTestCase):
+    async def test_slow_client_does_not_stall_others(self):
+        manager = ConnectionManager(queue_size=8)
+        fast, stale = FakeSocket(), FakeSocket(delay=60)
+        await manager.connect(fast)
+        await manager.connect(stale)
+
+        loop = asyncio.get_running_loop()
+        for i in range(20):
+            started = loop.time()
+            await manager.broadcast({"type": "log", "message": str(i), "source": "system"})
+            self.assertLess(loop.time() - started, 0.01)   # broadcast never waits on a socket
+            await asyncio.sleep(0.001)
+
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(fast.received), 20)
+        # The stale client filled its queue with state/log messages and was dropped
+        self.assertNotIn(stale, manager.active_connections)
+        self.assertEqual(manager.evicted, 1)
+        await asyncio.sleep(0)
+        self.assertTrue(stale.closed)
+
+    async def test_telemetry_is_dropped_not_evicted(self):
+        manager = ConnectionManager(queue_size=4)
+        slow = FakeSocket(delay=60)
+        await manager.connect(slow)
+        for i in range(50):
+            await manager.broadcast({"type": "volume", "level": i})
+        await manager.broadcast({"type": "state", "state": "idle", "message": "Ready"})
+        self.assertIn(slow, manager.active_connections)
+        stats = manager.stats()["queues"][0]
+        self.assertGreater(stats["dropped"], 40)
+        manager.disconnect(slow)
+
+    async def test_dead_socket_is_evicted(self):
+        manager = ConnectionManager()
+        dead = FakeSocket(fail=True)
+        await manager.connect(dead)
+        await manager.broadcast({"type": "state", "state": "idle", "message": "Ready"})
+        await asyncio.sleep(0.01)
+        self.assertEqual(manager.active_connections, [])
+        self.assertFalse(manager.disconnect(dead))   # Endpoint cleanup afterwards is harmless
+
+    async def test_serialized_once(self):
+        manager = ConnectionManager()
+        sockets = [FakeSocket() for _ in range(3)]
+        for ws in sockets:
+            await manager.connect(ws)
+        await manager.broadcast({"type": "log", "message": "hi", "source": "system"})
+        await asyncio.sleep(0.01)
+        texts = [ws.received[0] for ws in sockets]
+        self.assertTrue(all(t is texts[0] for t in texts))
+        for ws in sockets:
+            manager.disconnect(ws)
+
+
+class TestTelemetryFrames(unittest.IsolatedAsyncioTestCase):
+    def test_round_trip(self):
+        frame = pack_frame(KIND_WAVEFORM, 7, [0.0, 0.5, 1.0])
+        self.assertEqual(len(frame), 8 + 3 * 4)
+        version, kind, seq, samples = unpack_frame(frame)
+        self.assertEqual((version, kind, seq), (1, KIND_WAVEFORM, 7))
+        np.testing.assert_array_equal(samples, np.array([0.0, 0.5, 1.0], dtype=np.float32))
+
+    async def test_levels_are_batched_per_frame(self):
+        manager = ConnectionManager()
+        ws = FakeSocket()
+        await manager.connect(ws)
+        telemetry = VolumeTelemetry(manager.broadcast, broadcast_binary=manager.broadcast_bytes,
+                                    waveform_source=lambda: np.zeros(128, dtype=np.float32))
+        for level in (1.0, 2.0, 3.0):
+            telemetry.update(level)   # What the audio callback does between ticks
+        await telemetry.publish()
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(len(ws.received), 2)
+        _, kind, _, levels = unpack_frame(ws.received[0])
+        self.assertEqual(kind, KIND_VOLUME)
+        self.assertEqual(list(levels), [1.0, 2.0, 3.0])
+        _, kind, _, wave = unpack_frame(ws.received[1])
+        self.assertEqual((kind, len(wave)), (KIND_WAVEFORM, 128))
+        manager.disconnect(ws)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import sys
+import os
+import json
+import threading
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from orchestrator import llm
+from orchestrator import metrics
+from orchestrator.context import ConversationContext, compact_reply, estimate_tokens, message_tokens, SUMMARY_HEADER
+
+LONG_ANSWER = "Quantum physics is the study of matter and energy at the smallest scales. " * 20
+
+
+class TestCompactReply(unittest.TestCase):
+    def test_long_texts_are_cut_and_defaults_dropped(self):
+        intents = [{"service": "conversational", "response": LONG_ANSWER, "expect_reply": False, "streamed": True},
+                   {"service": "email", "action": "send_email", "params": {"recipient": "boss@x.com", "body": LONG_ANSWER}}]
+        compact = compact_reply(intents, json.dumps(intents))
+        self.assertLess(len(compact), len(json.dumps(intents)) / 3)
+        parsed = json.loads(compact)   # Still JSON the model can imitate
+        self.assertNotIn("expect_reply", parsed[0])
+        self.assertNotIn("streamed", parsed[0])
+        self.assertTrue(parsed[1]["params"]["body"].endswith("..."))
+        self.assertEqual(parsed[1]["params"]["recipient"], "boss@x.com")
+
+    def test_plain_text_reply(self):
+        self.assertEqual(compact_reply({"service": "error"}, "Sorry?"), "Sorry?")
+
+
+class TestBudget(unittest.TestCase):
+    def setUp(self):
+        self.history = []
+        self.context = ConversationContext(self.history, budget=estimate_tokens(llm.SYSTEM_PROMPT) + 400)
+
+    def test_stays_under_budget_and_summarises(self):
+        for i in range(8):
+            self.context.remember(f"question {i}", [{"service": "conversational", "response": LONG_ANSWER}], "")
+        self.context.remember("open notepad", [{"service": "system", "action": "open_app", "params": {"app_name": "notepad"}}], "")
+
+        messages, tokens = self.context.build(llm.SYSTEM_PROMPT, "search for it")
+        self.assertLessEqual(tokens, self.context.budget)
+        self.assertEqual(tokens, message_tokens(messages))
+        # Constant prefix first, then the summary, recent turns and the command
+        self.assertEqual(messages[0]["content"], llm.SYSTEM_PROMPT)
+        self.assertTrue(messages[1]["content"].startswith(SUMMARY_HEADER))
+        self.assertIn("- User: question 0", messages[1]["content"])
+        self.assertEqual(messages[-2]["content"], json.dumps(
+            [{"service": "system", "action": "open_app", "params": {"app_name": "notepad"}}], separators=(",", ":")))
+        self.assertEqual(messages[-1], {"role": "user", "content": "search for it"})
+        self.assertIsNotNone(metrics.registry.quantiles("assistant_prompt_tokens"))
+
+    def test_short_history_is_sent_as_is(self):
+        self.context.remember("hi", [{"service": "conversational", "response": "Hello!"}], "")
+        messages, _ = self.context.build(llm.SYSTEM_PROMPT, "open notepad")
+        self.assertEqual(len(messages), 4)
+        self.assertEqual(self.context.summary, [])
+
+    def test_concurrent_commands_keep_turns_paired(self):
+        errors = []
+
+        def command(n):
+            try:
+                for i in range(50):
+                    self.context.build(llm.SYSTEM_PROMPT, f"command {n}.{i}")
+                    self.context.remember(f"command {n}.{i}", [{"service": "conversational", "response": LONG_ANSWER}], "")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=command, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        history = self.context.snapshot()
+        self.assertEqual([m["role"] for m in history], ["user", "assistant"] * (len(history) // 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,17 +7,29 @@ import os
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
 
-# Mock dependencies before importing core
-sys.modules["orchestrator.audio"] = MagicMock()
-sys.modules["orchestrator.llm"] = MagicMock()
-sys.modules["orchestrator.main"] = MagicMock()
+# Mock dependencies while core is imported and tested. patch.dict puts
+# sys.modules back afterwards, so other verify_* files in the same session
+# get the real modules.
+MOCKED_MODULES = patch.dict(sys.modules, {
+    "orchestrator.audio": MagicMock(),
+    "orchestrator.tts": MagicMock(),  # core imports tts_worker (sounddevice, pyttsx3)
+    "orchestrator.llm": MagicMock(),
+    "orchestrator.main": MagicMock(),
+})
+AssistantLoop = None
 
-try:
-    from orchestrator.core import AssistantLoop
-except ImportError:
-    # If run from root, path might be different
+
+def setUpModule():
+    global AssistantLoop
+    MOCKED_MODULES.start()
+    sys.modules.pop("orchestrator.core", None)  # Import it against the mocks, not a cached real one
     from orchestrator.core import AssistantLoop
 
+
+def tearDownModule():
+    MOCKED_MODULES.stop()
+
+
 class TestAssistantLoop(unittest.TestCase):
     def setUp(self):
         self.loop = AssistantLoop()
@@ -32,5 +44,31 @@ class TestAssistantLoop(unittest.TestCase):
         self.assertFalse(self.loop._is_wake_word("hello world"))
         self.assertFalse(self.loop._is_wake_word("hey"))
 
+    def test_wake_word_remainder(self):
+        """Exact and fuzzy hits both hand back the command spoken after the wake word."""
+        corpus = [
+            ("hey genie open notepad", (True, "open notepad")),
+            ("Hey Genie, search google for cats", (True, "search google for cats")),
+            ("hey jimy open notepad", (True, "open notepad")),
+            ("hi jimmi open google.com", (True, "open google.com")),
+            ("hey geenie", (True, "")),
+            ("okay genie what time is it", (True, "what time is it")),
+            ("jimmy", (True, "")),
+            ("jimy open notepad", (True, "open notepad")),
+            ("geenie open notepad", (True, "open notepad")),
+            ("hey - genie open notepad", (True, "open notepad")),
+            ("hey genie - open notepad", (True, "open notepad")),
+            ("open notepad", (False, "")),
+            ("what is the weather today", (False, "")),
+            ("", (False, "")),
+        ]
+        for text, expected in corpus:
+            self.assertEqual(self.loop._check_wake_word_and_extract(text), expected, text)
+
+    def test_wake_word_matcher_speed(self):
+        from orchestrator.wakeword import bench_matcher
+        us = bench_matcher(["hey jimy open notepad", "what is the weather today"], rounds=200)
+        self.assertLess(us, 1000, f"WakeWordMatcher took {us:.1f} us per transcript")
+
 if __name__ == "__main__":
     unittest.main()
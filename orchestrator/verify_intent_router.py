@@ -0,0 +1,95 @@
+import unittest
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from orchestrator import llm
+from orchestrator import metrics
+from orchestrator import intent_router
+from orchestrator.intent_router import IntentRouter, match
+
+
+class TestMatching(unittest.TestCase):
+    def test_catalogue_actions(self):
+        cases = {
+            "open notepad": ("system", "open_app", {"app_name": "notepad"}),
+            "Could you please launch the Calculator app?": ("system", "open_app", {"app_name": "calculator"}),
+            "open notpad": ("system", "open_app", {"app_name": "notepad"}),   # STT slip
+            "go to github.com/explore": ("browser", "open_url", {"url": "github.com/explore"}),
+            "search google for weather": ("browser", "search_google", {"query": "weather"}),
+            "search for salt and pepper": ("browser", "search_google", {"query": "salt and pepper"}),
+            "send a whatsapp message to Mom saying I'll be late":
+                ("system", "send_whatsapp", {"contact_name": "Mom", "message": "I'll be late"}),
+            "send email to a@b.com with subject Hi and body See you soon":
+                ("email", "send_email", {"recipient": "a@b.com", "subject": "Hi", "body": "See you soon"}),
+        }
+        for text, (service, action, params) in cases.items():
+            intents, confidence = match(text)
+            self.assertEqual(intents, [{"service": service, "action": action, "params": params}], text)
+            self.assertGreaterEqual(confidence, intent_router.ROUTER_MIN_CONFIDENCE, text)
+
+    def test_compound_command(self):
+        intents, _ = match("open notepad and then search for cats")
+        self.assertEqual([i["action"] for i in intents], ["open_app", "search_google"])
+
+    def test_and_inside_a_query(self):
+        intents, _ = match("search google for rock and roll and open notepad")
+        self.assertEqual(intents, [
+            {"service": "browser", "action": "search_google", "params": {"query": "rock and roll"}},
+            {"service": "system", "action": "open_app", "params": {"app_name": "notepad"}},
+        ])
+
+    def test_no_split_inside_a_message(self):
+        intents, confidence = match("message mom saying call me and open spotify please")
+        self.assertEqual(len(intents), 1)
+        self.assertLess(confidence, intent_router.FALLBACK_MIN_CONFIDENCE)
+        self.assertIsNone(intent_router.router.route("message mom saying call me and open spotify please"))
+        # Commands before the message still split
+        intents, _ = match("open notepad and message mom saying call me")
+        self.assertEqual([i["action"] for i in intents], ["open_app", "send_whatsapp"])
+
+    def test_multi_word_app_names(self):
+        for text in ["google maps", "open google maps", "launch google chrome"]:
+            intents, confidence = match(text)
+            self.assertEqual(intents[0]["action"], "open_app", text)
+            self.assertGreaterEqual(confidence, intent_router.ROUTER_MIN_CONFIDENCE, text)
+        self.assertEqual(match("google maps")[0][0]["params"], {"app_name": "google maps"})
+        self.assertEqual(match("launch google chrome")[0][0]["params"], {"app_name": "google chrome"})
+
+    def test_left_to_the_llm(self):
+        for text in ["search for it", "email my boss about sick leave", "what is quantum physics",
+                     "open the pod bay doors", "send message"]:
+            self.assertIsNone(match(text), text)
+
+
+class TestParseCommand(unittest.TestCase):
+    def setUp(self):
+        self.saved = (llm.BACKENDS.remote.api_key, intent_router.router)
+        llm.BACKENDS.remote.api_key = None   # Any LLM call would fail
+        intent_router.router = IntentRouter()
+        llm.CHAT_HISTORY.clear()
+
+    def tearDown(self):
+        llm.BACKENDS.remote.api_key, intent_router.router = self.saved
+
+    def test_routed_without_the_llm(self):
+        seen = []
+        metrics.registry.observe("assistant_stage_seconds", 0.8, stage="llm")
+        intents = llm.parse_command("open spotify", on_intent=seen.append)
+        self.assertEqual(intents, [{"service": "system", "action": "open_app", "params": {"app_name": "spotify"}}])
+        self.assertEqual(seen, intents)
+        self.assertEqual(len(llm.CHAT_HISTORY), 2)   # Still context for "search for it"
+
+        missed = llm.parse_command("tell me a joke")
+        self.assertEqual(missed, [{"service": "error", "message": "Groq API Key Missing"}])
+
+        stats = intent_router.router.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+        self.assertGreater(stats["saved_seconds_total"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
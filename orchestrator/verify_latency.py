@@ -0,0 +1,184 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import threading
+import time
+import sys
+import os
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+# No audio hardware or LLM in tests: the synthetic source drives the callback directly.
+# patch.dict puts sys.modules back afterwards, so the mocks don't leak into other verify_* files.
+MOCKED_MODULES = patch.dict(sys.modules, {
+    "sounddevice": MagicMock(),
+    "pyttsx3": MagicMock(),
+    "orchestrator.llm": MagicMock(),
+})
+# Modules that take the mocks at import time; imported afresh inside the patch
+USES_MOCKS = ["orchestrator.audio", "orchestrator.tts", "orchestrator.core"]
+
+
+def setUpModule():
+    global AudioRecorder, SAMPLE_RATE, BLOCK_SIZE, PRE_ROLL_SECONDS, AssistantLoop, FakeSTT, TTSWorker
+    MOCKED_MODULES.start()
+    for name in USES_MOCKS:
+        sys.modules.pop(name, None)
+    from orchestrator.audio import AudioRecorder, SAMPLE_RATE, BLOCK_SIZE, PRE_ROLL_SECONDS
+    from orchestrator.core import AssistantLoop
+    from orchestrator.stt import FakeSTT
+    from orchestrator.tts import TTSWorker
+
+
+def tearDownModule():
+    MOCKED_MODULES.stop()
+
+
+END_OF_SPEECH_BOUND = 0.6  # VAD hangover (0.3 s) + block granularity + handoff
+
+
+class SyntheticSource:
+    """Feeds quiet/speech blocks into the recorder callback in real time."""
+    def __init__(self, recorder, quiet_before=1.0, speech=1.0, quiet_after=2.0):
+        self.recorder = recorder
+        self.plan = [(quiet_before, 0.0), (speech, 0.3), (quiet_after, 0.0)]
+        self.speech_end_time = None
+        self.rng = np.random.default_rng(2)
+
+    def run(self):
+        block_seconds = BLOCK_SIZE / SAMPLE_RATE
+        next_time = time.perf_counter()
+        for seconds, level in self.plan:
+            for i in range(int(seconds / block_seconds)):
+                t = (np.arange(BLOCK_SIZE) + i * BLOCK_SIZE) / SAMPLE_RATE
+                block = 0.002 * self.rng.standard_normal(BLOCK_SIZE) + level * np.sin(2 * np.pi * 220 * t)
+                self.recorder.callback(block.astype(np.float32).reshape(-1, 1), BLOCK_SIZE, None, None)
+                next_time += block_seconds
+                time.sleep(max(next_time - time.perf_counter(), 0))
+            if level:
+                self.speech_end_time = time.perf_counter()
+
+
+class TestEndOfSpeechLatency(unittest.TestCase):
+    def test_end_of_speech_to_process_text(self):
+        stt = FakeSTT(["open notepad"])
+        stt.supports_streaming = False  # Measure the VAD path, not the stable-partial shortcut
+        loop = AssistantLoop()
+        loop.recorder = AudioRecorder(stt_engine=stt)
+        loop.state = "LISTENING"
+
+        processed = threading.Event()
+        result = {}
+
+        def fake_process(text):
+            result["text"] = text
+            result["time"] = time.perf_counter()
+            loop.running = False
+            processed.set()
+
+        loop._process_text = fake_process
+        source = SyntheticSource(loop.recorder)
+        feeder = threading.Thread(target=source.run, daemon=True)
+
+        loop.start(main_loop=None)
+        feeder.start()
+        self.assertTrue(processed.wait(5), "command was never processed")
+        loop.stop()
+
+        latency = result["time"] - source.speech_end_time
+        print(f"End of speech -> _process_text: {latency * 1000:.0f} ms")
+        self.assertEqual(result["text"], "open notepad")
+        self.assertLess(latency, END_OF_SPEECH_BOUND)
+
+
+class TestPartials(unittest.TestCase):
+    def test_on_partial_runs_every_chunk(self):
+        # A stream with no hypothesis yet still ticks on_partial, so stability timers advance in silence
+        recorder = AudioRecorder(stt_engine=FakeSTT())
+        calls = []
+
+        def on_partial(text):
+            calls.append(text)
+            return False
+
+        source = SyntheticSource(recorder, quiet_before=0.2, speech=0.5, quiet_after=1.0)
+        feeder = threading.Thread(target=source.run, daemon=True)
+        feeder.start()
+        recorder.listen(timeout=5, on_partial=on_partial)
+        recorder.close()
+        self.assertGreater(len(calls), 5)
+        self.assertEqual(set(calls), {""})
+
+
+class TestCaptureAccounting(unittest.TestCase):
+    def test_audio_before_the_pre_roll_is_counted(self):
+        recorder = AudioRecorder(stt_engine=FakeSTT())
+        recorder.open()
+        quiet = np.zeros((BLOCK_SIZE, 1), dtype=np.float32)
+        for _ in range(int(3 * SAMPLE_RATE / BLOCK_SIZE)):   # 3 s nobody listened to
+            recorder.callback(quiet, BLOCK_SIZE, None, None)
+        written = recorder.ring.write_pos
+        recorder.capture(timeout=0.01)
+        recorder.close()
+        self.assertEqual(recorder.skipped_samples, written - int(PRE_ROLL_SECONDS * SAMPLE_RATE))
+        self.assertEqual(recorder.dropped_samples, 0)
+
+
+class WordEngine:
+    """Stand-in pyttsx3 engine: speaks one word every 20 ms, firing started-word."""
+    def __init__(self):
+        self.on_word = None
+        self.words = []
+        self.stopped = False
+        self.stop_threads = []
+
+    def getProperty(self, name):
+        return []
+
+    def setProperty(self, name, value):
+        pass
+
+    def connect(self, topic, callback):
+        self.on_word = callback
+
+    def save_to_file(self, text, path):
+        raise RuntimeError("no file output")
+
+    def say(self, text):
+        self.words = text.split()
+
+    def runAndWait(self):
+        self.stopped = False
+        for i, word in enumerate(self.words):
+            if self.stopped:
+                break
+            self.on_word(None, i, len(word))
+            time.sleep(0.02)
+
+    def stop(self):
+        self.stopped = True
+        self.stop_threads.append(threading.current_thread())
+
+
+class TestBargeIn(unittest.TestCase):
+    def test_interrupt_stops_engine_on_worker_thread(self):
+        engine = WordEngine()
+        sys.modules["pyttsx3"].init.return_value = engine
+        worker = TTSWorker(enabled=True)
+        utterance = worker.say(" ".join(["word"] * 100))
+        deadline = time.time() + 2
+        while worker.speaking is not utterance and time.time() < deadline:
+            time.sleep(0.01)
+
+        start = time.perf_counter()
+        worker.interrupt()
+        self.assertTrue(utterance.wait(1), "phrase kept playing after interrupt()")
+        latency = time.perf_counter() - start
+        self.assertTrue(utterance.interrupted)
+        self.assertEqual(engine.stop_threads, [worker.thread])
+        self.assertLess(latency, 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
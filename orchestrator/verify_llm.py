@@ -0,0 +1,345 @@
+import unittest
+import sys
+import os
+import json
+import requests
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from orchestrator import llm
+from orchestrator import intent_router
+from orchestrator import llm_cache
+from orchestrator import llm_client
+from orchestrator.llm_client import LLMClient, CircuitBreaker, CircuitOpenError
+from orchestrator.llm_backends import BackendRouter, FakeBackend, LlamaCppBackend, BackendError, OpenAICompatibleBackend
+from orchestrator.scheduler import IntentScheduler
+
+REPLY = json.dumps([
+    {"service": "browser", "action": "open_url", "params": {"url": "https://example.com"}},
+    {"service": "conversational", "response": "Opening it now. It should load in a second! Anything else?", "expect_reply": False},
+])
+PAUSE_AFTER = REPLY.index("}}") + 2     # The stream stalls right after the first intent
+PAUSE_SECONDS = 0.5
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible chat completions endpoint (SSE when asked to stream)."""
+    protocol_version = "HTTP/1.1"   # Chunked SSE, like the real API
+    content = REPLY
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if not payload.get("stream"):
+            choice = {"message": {"content": self.content}}
+            if payload.get("logprobs"):   # llama.cpp-style token log-probabilities
+                choice["logprobs"] = {"content": [{"token": "x", "logprob": -0.1}] * 4}
+            body = json.dumps({"choices": [choice]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        paused = False
+        for i in range(0, len(self.content), 7):   # Token-sized pieces
+            if i >= PAUSE_AFTER and not paused and self.content is REPLY:
+                paused = True
+                time.sleep(PAUSE_SECONDS)
+            chunk = {"choices": [{"delta": {"content": self.content[i:i + 7]}}]}
+            self._send_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+    def _send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class TestStreamingParse(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.saved = (llm.BACKENDS.remote.api_key, llm.BACKENDS.remote.url, llm.LLM_STREAMING,
+                     intent_router.LOCAL_ROUTER, llm_cache.LLM_CACHE)
+        llm.BACKENDS.remote.api_key = "test"
+        intent_router.LOCAL_ROUTER = False   # Every command goes to the stand-in
+        llm_cache.LLM_CACHE = False
+        llm.BACKENDS.remote.url = f"http://127.0.0.1:{cls.server.server_address[1]}/v1/chat/completions"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        (llm.BACKENDS.remote.api_key, llm.BACKENDS.remote.url, llm.LLM_STREAMING,
+         intent_router.LOCAL_ROUTER, llm_cache.LLM_CACHE) = cls.saved
+
+    def setUp(self):
+        llm.CHAT_HISTORY.clear()
+        llm.LLM_STREAMING = True
+        StandInHandler.content = REPLY
+
+    def test_intents_arrive_before_the_reply_ends(self):
+        events = []
+        start = time.time()
+        intents = llm.parse_command(
+            "open example.com",
+            on_intent=lambda intent: events.append(("intent", intent["service"], time.time() - start)),
+            on_sentence=lambda text: events.append(("sentence", text, time.time() - start)),
+        )
+        total = time.time() - start
+
+        self.assertEqual([e[1] for e in events], [
+            "browser", "Opening it now.", "It should load in a second!", "Anything else?", "conversational"])
+        # The browser intent was usable before the stalled remainder of the reply
+        self.assertLess(events[0][2], total - PAUSE_SECONDS * 0.8)
+        self.assertEqual([i["service"] for i in intents], ["browser", "conversational"])
+        self.assertTrue(intents[1]["streamed"])
+        self.assertNotIn("streamed", intents[0])
+        # History keeps the compact form of the reply
+        self.assertEqual(json.loads(llm.CHAT_HISTORY[-1]["content"]), [{k: v for k, v in i.items() if k != "expect_reply"}
+                                                                        for i in json.loads(REPLY)])
+
+    def test_plain_text_reply_falls_back(self):
+        StandInHandler.content = "I'm not sure what you mean."
+        seen = []
+        intents = llm.parse_command("hmm", on_intent=seen.append)
+        self.assertEqual(seen, [])
+        self.assertEqual(intents, [{"service": "conversational", "response": "I'm not sure what you mean."}])
+
+    def test_non_streaming_mode(self):
+        llm.LLM_STREAMING = False
+        intents = llm.parse_command("open example.com")
+        self.assertEqual([i["service"] for i in intents], ["browser", "conversational"])
+
+
+class FaultyHandler(BaseHTTPRequestHandler):
+    """Answers each request with the next scripted fault: (status, delay, headers)."""
+    protocol_version = "HTTP/1.1"   # Keep-alive, so connection reuse is visible
+    script = []
+    seen = []                       # Client ports, one per request
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        FaultyHandler.seen.append(self.client_address[1])
+        status, delay, headers = FaultyHandler.script.pop(0) if FaultyHandler.script else (200, 0, {})
+        time.sleep(delay)
+        body = json.dumps({"choices": [{"message": {"content": "[]"}}]} if status == 200
+                          else {"error": {"message": f"injected {status}"}}).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestResilientClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FaultyHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/v1/chat/completions"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        FaultyHandler.script = []
+        FaultyHandler.seen = []
+
+    def post(self, client):
+        response = client.post(self.url, headers={}, payload={"stream": False})
+        response.content
+        return response
+
+    def test_retries_honour_retry_after_and_reuse_the_connection(self):
+        FaultyHandler.script = [(503, 0, {}), (429, 0, {"Retry-After": "0.3"})]
+        start = time.time()
+        response = self.post(LLMClient(retries=2))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(time.time() - start, 0.3)
+        self.assertEqual(len(FaultyHandler.seen), 3)
+        self.assertEqual(len(set(FaultyHandler.seen)), 1)   # One keep-alive connection throughout
+
+    def test_client_errors_are_not_retried(self):
+        FaultyHandler.script = [(400, 0, {})]
+        self.assertEqual(self.post(LLMClient(retries=2)).status_code, 400)
+        self.assertEqual(len(FaultyHandler.seen), 1)
+
+    def test_hedged_request_beats_a_slow_one(self):
+        FaultyHandler.script = [(200, 1.0, {}), (200, 0, {})]
+        saved = llm_client.HEDGE_DELAY
+        llm_client.HEDGE_DELAY = 0.1
+        try:
+            client = LLMClient(hedge=True)
+            start = time.time()
+            self.assertEqual(self.post(client).status_code, 200)
+            self.assertLess(time.time() - start, 0.6)
+            self.assertEqual(client.stats()["hedge_won"], 1)
+        finally:
+            llm_client.HEDGE_DELAY = saved
+
+    def test_unexpected_error_ends_the_half_open_trial(self):
+        breaker = CircuitBreaker(failures=1, cooldown=60)
+        breaker.opened_at = time.time() - 61    # Half-open: the next request is the trial
+        client = LLMClient(retries=0, breaker=breaker)
+        with self.assertRaises(requests.exceptions.MissingSchema):
+            client.post("chat/completions", headers={}, payload={})
+        self.assertFalse(breaker.trial)
+        self.assertEqual(breaker.state, "open")     # Failed trial: wait out another cooldown
+
+    def test_breaker_fails_fast_to_the_local_fallback(self):
+        FaultyHandler.script = [(500, 0, {})] * 5
+        client = LLMClient(retries=5, breaker=CircuitBreaker(failures=2, cooldown=60))
+        self.assertEqual(self.post(client).status_code, 500)   # Gave up once the breaker opened
+        self.assertEqual(len(FaultyHandler.seen), 2)
+        with self.assertRaises(CircuitOpenError):
+            client.post(self.url, headers={}, payload={})
+
+        saved = (llm.BACKENDS.remote.api_key, llm.BACKENDS.remote.url, llm_client.client, llm_cache.LLM_CACHE)
+        llm.BACKENDS.remote.api_key, llm.BACKENDS.remote.url, llm_client.client, llm_cache.LLM_CACHE = "test", self.url, client, False
+        try:
+            start = time.time()
+            # Too unsure for the normal fast path, good enough while the LLM is down
+            intents = llm.parse_command("launch notpd")
+            self.assertEqual(intents, [{"service": "system", "action": "open_app", "params": {"app_name": "notepad"}}])
+            self.assertEqual(llm.parse_command("what is love")["service"], "error")
+            self.assertLess(time.time() - start, 0.1)
+            self.assertEqual(len(FaultyHandler.seen), 2)   # Nothing more reached the API
+        finally:
+            llm.BACKENDS.remote.api_key, llm.BACKENDS.remote.url, llm_client.client, llm_cache.LLM_CACHE = saved
+
+
+class TestBackendRouter(unittest.TestCase):
+    OPEN = [{"service": "system", "action": "open_app", "params": {"app_name": "spotify"}}]
+
+    def setUp(self):
+        self.saved = (llm.BACKENDS, intent_router.LOCAL_ROUTER, llm_cache.LLM_CACHE, llm.LLM_STREAMING)
+        intent_router.LOCAL_ROUTER = False
+        llm_cache.LLM_CACHE = False
+        llm.LLM_STREAMING = True
+        llm.CHAT_HISTORY.clear()
+        StandInHandler.content = REPLY   # Shared with TestStreamingParse, which changes it
+        self.local = FakeBackend({"start spotify for me and play jazz": self.OPEN}, name="local")
+        self.remote = FakeBackend({"start spotify for me and play jazz": self.OPEN}, name="remote")
+        llm.BACKENDS = BackendRouter(remote=self.remote, local=self.local, mode="auto", min_confidence=0.8)
+
+    def tearDown(self):
+        llm.BACKENDS, intent_router.LOCAL_ROUTER, llm_cache.LLM_CACHE, llm.LLM_STREAMING = self.saved
+
+    def test_simple_command_stays_local(self):
+        seen = []
+        self.assertEqual(llm.parse_command("start spotify for me and play jazz", on_intent=seen.append), self.OPEN)
+        self.assertEqual(seen, self.OPEN)
+        self.assertEqual((len(self.local.calls), len(self.remote.calls)), (1, 0))
+
+    def test_unsure_local_answer_escalates(self):
+        self.local.confidence = 0.4
+        seen = []
+        llm.parse_command("start spotify for me and play jazz", on_intent=seen.append)
+        self.assertEqual((len(self.local.calls), len(self.remote.calls)), (1, 1))
+        self.assertEqual(seen, self.OPEN)   # Only the answer that was kept reached the caller
+
+    def test_questions_and_failures_go_remote(self):
+        llm.parse_command("why is the sky blue when the sun is white")
+        self.assertEqual((len(self.local.calls), len(self.remote.calls)), (0, 1))
+
+        def broken(messages, on_delta=None):
+            raise BackendError("API Error 500: model not loaded")
+        self.local.chat = broken
+        self.assertEqual(llm.parse_command("start spotify for me and play jazz"), self.OPEN)
+        self.assertEqual(len(self.remote.calls), 2)
+
+    def test_malformed_local_reply_goes_remote(self):
+        def malformed(messages, on_delta=None):
+            return json.loads("<html>502 Bad Gateway</html>")   # What response.json() raises on a proxy error page
+        self.local.chat = malformed
+        self.assertEqual(llm.parse_command("start spotify for me and play jazz"), self.OPEN)
+        self.assertEqual(len(self.remote.calls), 1)
+
+    def test_unavailable_backend_is_named(self):
+        local = LlamaCppBackend("http://127.0.0.1:9/v1/chat/completions")
+        local.client.breaker.opened_at = time.time()   # Server not responding
+        llm.BACKENDS = BackendRouter(remote=OpenAICompatibleBackend("http://unused", api_key="test"),
+                                     local=local, mode="local")
+        reply = llm.parse_command("start spotify for me and play jazz")
+        self.assertIn("Local LLM server at http://127.0.0.1:9", reply[0]["message"])
+
+        llm.BACKENDS = BackendRouter(remote=OpenAICompatibleBackend("http://unused"), local=local, mode="remote")
+        self.assertEqual(llm.parse_command("tell me a joke")[0]["message"], "Groq API Key Missing")
+
+    def test_llama_cpp_confidence_from_logprobs(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            backend = LlamaCppBackend(f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions")
+            completion = backend.chat([{"role": "user", "content": "open example.com"}])
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(completion.content, REPLY)
+        self.assertAlmostEqual(completion.confidence, 0.9048, places=3)
+
+
+class TestIntentStream(unittest.IsolatedAsyncioTestCase):
+    async def test_runs_as_added_and_announces_in_order(self):
+        started, announced = [], []
+
+        async def execute(intent):
+            started.append(intent["id"])
+            await asyncio.sleep(intent["delay"])
+            return {"status": "success"}
+
+        stream = IntentScheduler().stream(execute, on_result=lambda i, intent, result: announced.append(intent["id"]))
+        stream.add({"id": 0, "service": "browser", "delay": 0.05})
+        await asyncio.sleep(0.01)
+        self.assertEqual(started, [0])   # Running before the rest of the reply exists
+        stream.add({"id": 1, "service": "email", "delay": 0.0})
+        stream.add({"id": 2, "service": "browser", "delay": 0.0, "depends_on": 1})
+        results = await stream.finish()
+        self.assertEqual(len(results), 3)
+        self.assertEqual(announced, [0, 1, 2])
+
+    async def test_failure_skips_dependents_only(self):
+        started = []
+
+        async def execute(intent):
+            started.append(intent["id"])
+            if intent["id"] == 0:
+                raise RuntimeError("app not found")
+            return {"status": "success"}
+
+        intents = [
+            {"id": 0, "service": "system"},
+            {"id": 1, "service": "system"},                     # Waits for 0 (previous system intent)
+            {"id": 2, "service": "browser", "depends_on": 1},
+            {"id": 3, "service": "browser"},
+        ]
+        results = await IntentScheduler().run(intents, execute)
+        self.assertEqual([r["status"] for r in results], ["error", "skipped", "skipped", "success"])
+        self.assertEqual(results[0]["message"], "Error: app not found")
+        self.assertEqual(results[1]["message"], "Skipped because step 1 failed")
+        self.assertEqual(results[2]["message"], "Skipped because step 1 failed")
+        self.assertEqual(started, [0, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
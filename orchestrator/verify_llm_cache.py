@@ -0,0 +1,133 @@
+import unittest
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from orchestrator import llm
+from orchestrator import llm_cache
+from orchestrator import intent_router
+from orchestrator.llm_cache import ResponseCache
+
+
+class TestParseCommandCache(unittest.TestCase):
+    """parse_command with the LLM call replaced by a counting stand-in."""
+
+    def setUp(self):
+        self.saved = (llm.BACKENDS.remote.api_key, llm._ask_llm, llm_cache.response_cache,
+                      intent_router.LOCAL_ROUTER, llm_cache.LLM_CACHE)
+        llm.BACKENDS.remote.api_key = "test"
+        llm._ask_llm = self.fake_llm
+        llm_cache.response_cache = ResponseCache(size=8, path=None)
+        intent_router.LOCAL_ROUTER = False
+        llm_cache.LLM_CACHE = True
+        llm.CHAT_HISTORY.clear()
+        self.calls = []
+        self.delay = 0
+        self.replies = {}
+
+    def tearDown(self):
+        (llm.BACKENDS.remote.api_key, llm._ask_llm, llm_cache.response_cache,
+         intent_router.LOCAL_ROUTER, llm_cache.LLM_CACHE) = self.saved
+
+    def fake_llm(self, text, on_intent=None, on_sentence=None):
+        self.calls.append(text)
+        time.sleep(self.delay)
+        intents = self.replies.get(text, [{"service": "browser", "action": "open_url", "params": {"url": "youtube.com"}}])
+        if intents and intents[0].get("service") == "error":
+            return intents[0], None
+        intents = [dict(intent) for intent in intents]
+        content = json.dumps(intents)
+        llm._remember(text, intents, content)
+        if on_intent:
+            for intent in intents:
+                on_intent(intent)
+        return intents, content
+
+    def test_repeat_is_served_from_cache(self):
+        first = llm.parse_command("Open YouTube")
+        seen = []
+        second = llm.parse_command("open youtube!", on_intent=seen.append)
+        self.assertEqual(self.calls, ["Open YouTube"])
+        self.assertEqual(second, first)
+        self.assertEqual(seen, second)          # Streaming turns still get their intents
+        self.assertEqual(len(llm.CHAT_HISTORY), 4)
+        self.assertEqual(llm_cache.response_cache.stats()["hit"], 1)
+
+    def test_references_depend_on_history(self):
+        llm.CHAT_HISTORY.extend([{"role": "user", "content": "who wrote dune"},
+                                 {"role": "assistant", "content": "Frank Herbert"}])
+        llm.parse_command("search for it")
+        llm.CHAT_HISTORY.extend([{"role": "user", "content": "who wrote emma"},
+                                 {"role": "assistant", "content": "Jane Austen"}])
+        llm.parse_command("search for it")
+        self.assertEqual(len(self.calls), 2)
+
+    def test_time_dependent_answers_are_not_cached(self):
+        self.replies["what time is it in tokyo"] = [{"service": "conversational", "response": "It is 9 PM in Tokyo."}]
+        llm.parse_command("what time is it in tokyo")
+        llm.parse_command("what time is it in tokyo")
+        self.assertEqual(len(self.calls), 2)
+
+    def test_streamed_flag_is_not_cached(self):
+        self.replies["tell me a joke"] = [{"service": "conversational", "response": "Knock knock.", "streamed": True}]
+        llm.parse_command("tell me a joke")
+        self.assertNotIn("streamed", llm.parse_command("tell me a joke")[0])   # This turn has to speak it
+
+    def test_errors_are_not_cached(self):
+        self.replies["open youtube"] = [{"service": "error", "message": "API Error 503"}]
+        llm.parse_command("open youtube")
+        llm.parse_command("open youtube")
+        self.assertEqual(len(self.calls), 2)
+
+    def test_concurrent_duplicates_share_one_call(self):
+        self.delay = 0.2
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(llm.parse_command("open youtube"))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(len(results), 4)
+        self.assertEqual(llm_cache.response_cache.stats()["coalesced"], 3)
+
+
+class TestResponseCache(unittest.TestCase):
+    def store(self, cache, key, service="system"):
+        _, ticket = cache.get(key)
+        intents = [{"service": service, "action": "open_app", "params": {"app_name": key}}]
+        cache.complete(key, ticket, key, intents, json.dumps(intents))
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(size=2, path=None)
+        self.store(cache, "a")
+        self.store(cache, "b")
+        cache.get("a")        # Touch a
+        self.store(cache, "c")
+        self.assertEqual(list(cache.entries), ["a", "c"])
+
+    def test_service_ttl(self):
+        cache = ResponseCache(size=4, path=None)
+        self.store(cache, "mail", service="email")
+        self.store(cache, "unknown", service="calendar")
+        self.assertLessEqual(cache.entries["mail"]["expires"], time.time() + llm_cache.SERVICE_TTLS["email"])
+        self.assertNotIn("unknown", cache.entries)
+
+    def test_disk_tier_survives_restart(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "cache.json")
+            self.store(ResponseCache(size=4, path=path), "notepad")
+            restarted = ResponseCache(size=4, path=path)
+            entry, ticket = restarted.get("notepad")
+            self.assertIsNone(ticket)
+            self.assertEqual(entry["intents"][0]["params"]["app_name"], "notepad")
+
+
+if __name__ == "__main__":
+    unittest.main()
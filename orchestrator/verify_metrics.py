@@ -0,0 +1,104 @@
+import unittest
+import sys
+import os
+import threading
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from orchestrator import metrics
+from orchestrator.pipeline import CommandPipeline
+
+
+class TestTrace(unittest.TestCase):
+    def setUp(self):
+        self.summaries = []
+        metrics.registry.trace_listeners.append(self.summaries.append)
+
+    def tearDown(self):
+        metrics.registry.trace_listeners.remove(self.summaries.append)
+
+    def test_stages_from_marks(self):
+        trace = metrics.Trace("voice")
+        trace.retain()
+        for name, at in [("capture_start", 10.0), ("speech_end", 11.5), ("stt_start", 11.5), ("stt_end", 11.8),
+                         ("llm_request", 11.8), ("llm_first_byte", 12.1), ("llm_done", 12.6),
+                         ("tts_start", 12.7), ("tts_end", 14.0)]:
+            trace.mark(name, at=at)
+        trace.add_span("service_browser", 0.25)
+        trace.release()
+
+        self.assertEqual(len(self.summaries), 1)
+        summary = self.summaries[0]
+        self.assertEqual(summary["trace_id"], trace.id)
+        self.assertAlmostEqual(summary["total"], 4.0)
+        stages = summary["stages"]
+        self.assertAlmostEqual(stages["capture"], 1.5)
+        self.assertAlmostEqual(stages["llm_first_byte"], 0.3)
+        self.assertAlmostEqual(stages["response"], 1.2)   # End of speech -> first audio
+        self.assertAlmostEqual(stages["service_browser"], 0.25)
+
+    def test_finishes_after_last_release(self):
+        trace = metrics.Trace("text")
+        trace.retain()   # The job
+        trace.retain()   # An utterance still being spoken
+        trace.mark("llm_request")
+        trace.release()
+        self.assertEqual(self.summaries, [])
+        trace.release()
+        self.assertEqual(len(self.summaries), 1)
+
+    def test_pipeline_carries_the_trace(self):
+        done = threading.Event()
+
+        def parse(job):
+            metrics.mark("llm_request")
+            job.intents = []
+
+        def execute(job):
+            metrics.mark("llm_done")   # Stands in for anything marked while executing
+            done.set()
+
+        pipeline = CommandPipeline(parse, execute)
+        pipeline.start()
+        trace = metrics.Trace("voice")
+        job = pipeline.submit("hello", trace=trace)
+        self.assertTrue(job.done.wait(2))
+        pipeline.stop()
+        self.assertEqual(len(self.summaries), 1)
+        self.assertIn("llm", self.summaries[0]["stages"])
+
+
+class TestRegistry(unittest.TestCase):
+    def test_prometheus_text(self):
+        registry = metrics.MetricsRegistry()
+        registry.describe("demo_seconds", "Demo.")
+        for i in range(100):
+            registry.observe("demo_seconds", i / 100, stage="stt")
+        text = registry.render()
+        self.assertIn("# TYPE demo_seconds summary", text)
+        self.assertIn('demo_seconds{stage="stt",quantile="0.5"} 0.500000', text)
+        self.assertIn('demo_seconds{stage="stt",quantile="0.99"} 0.990000', text)
+        self.assertIn('demo_seconds_count{stage="stt"} 100', text)
+
+    def test_instrumented_service(self):
+        app = FastAPI()
+        metrics.instrument_app(app, "demo")
+
+        @app.post("/do")
+        def do():
+            return {"status": "success"}
+
+        client = TestClient(app)
+        for _ in range(3):
+            client.post("/do")
+        text = client.get("/metrics").text
+        self.assertIn('service_request_seconds_count{path="/do",service="demo"} 3', text)
+        self.assertIn('service_requests_total{path="/do",service="demo",status="200"} 3', text)
+
+
+if __name__ == "__main__":
+    unittest.main()
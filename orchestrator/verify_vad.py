@@ -0,0 +1,64 @@
+import unittest
+import sys
+import os
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from orchestrator.vad import AdaptiveVAD, EnergyVAD
+
+SAMPLE_RATE = 16000
+BLOCK_SIZE = 1024
+BLOCK_SECONDS = BLOCK_SIZE / SAMPLE_RATE
+rng = np.random.default_rng(1)
+
+
+def blocks(seconds, noise, speech=0.0):
+    """Float32 blocks of background noise, with a 220 Hz 'voice' of the given level on top."""
+    out = []
+    for i in range(int(seconds / BLOCK_SECONDS)):
+        t = (np.arange(BLOCK_SIZE) + i * BLOCK_SIZE) / SAMPLE_RATE
+        x = noise * rng.standard_normal(BLOCK_SIZE) + speech * np.sin(2 * np.pi * 220 * t)
+        out.append(x.astype(np.float32).reshape(-1, 1))
+    return out
+
+
+def run(vad, sequence):
+    """Returns [(event, seconds)] for a list of blocks."""
+    events = []
+    for i, block in enumerate(sequence):
+        event = vad.process(block)
+        if event:
+            events.append((event, (i + 1) * BLOCK_SECONDS))
+    return events
+
+
+class TestAdaptiveVAD(unittest.TestCase):
+    def test_start_and_end_events(self):
+        vad = AdaptiveVAD(SAMPLE_RATE, BLOCK_SIZE)
+        events = run(vad, blocks(2, 0.002) + blocks(1.5, 0.002, speech=0.2) + blocks(1.5, 0.002))
+        self.assertEqual([e for e, _ in events], ["start", "end"])
+        # Speech ends at 3.5 s; the end event should follow within a few hundred ms
+        self.assertLess(events[1][1] - 3.5, 0.45)
+
+    def test_noisy_room_still_ends(self):
+        """A loud but steady room raises the floor instead of keeping the utterance open."""
+        vad = AdaptiveVAD(SAMPLE_RATE, BLOCK_SIZE)
+        events = run(vad, blocks(4, 0.05) + blocks(1.5, 0.05, speech=0.5) + blocks(1.5, 0.05))
+        self.assertEqual([e for e, _ in events], ["start", "end"])
+        self.assertLess(events[1][1] - 5.5, 0.45)
+
+        # The original fixed threshold never sees silence in the same room
+        fixed = EnergyVAD(SAMPLE_RATE, BLOCK_SIZE)
+        events = run(fixed, blocks(4, 0.05) + blocks(1.5, 0.05, speech=0.5) + blocks(1.5, 0.05))
+        self.assertNotIn("end", [e for e, _ in events])
+
+    def test_spectral_check_rejects_noise_bursts(self):
+        vad = AdaptiveVAD(SAMPLE_RATE, BLOCK_SIZE, use_spectral=True)
+        events = run(vad, blocks(2, 0.002) + blocks(1, 0.1) + blocks(1, 0.002))
+        self.assertEqual(events, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
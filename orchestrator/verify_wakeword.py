@@ -0,0 +1,67 @@
+import unittest
+import sys
+import os
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from orchestrator.wakeword import WakeWordDetector, evaluate, SAMPLE_RATE
+
+rng = np.random.default_rng(0)
+
+
+def tone_sequence(freqs, seconds_each=0.2, stretch=1.0, noise=0.0):
+    """Synthetic 'word': a run of tones, optionally time-stretched and noisy (int16)."""
+    parts = []
+    for f in freqs:
+        n = int(seconds_each * stretch * SAMPLE_RATE)
+        t = np.arange(n) / SAMPLE_RATE
+        parts.append(0.5 * np.sin(2 * np.pi * f * t))
+    clip = np.concatenate(parts)
+    clip += noise * rng.standard_normal(len(clip))
+    return (np.clip(clip, -1, 1) * 32767).astype(np.int16)
+
+
+WAKE = [400, 900, 600, 1500]
+
+
+class TestWakeWordDetector(unittest.TestCase):
+    def setUp(self):
+        self.detector = WakeWordDetector(templates=[tone_sequence(WAKE)], sensitivity=0.25)
+
+    def test_scores_recorded_clips(self):
+        """Positives (noisy, faster/slower) fire; other sounds don't."""
+        positives = [
+            tone_sequence(WAKE, noise=0.02),
+            tone_sequence(WAKE, stretch=0.9, noise=0.02),
+            tone_sequence(WAKE, stretch=1.1, noise=0.05),
+        ]
+        negatives = [
+            tone_sequence([1500, 600, 900, 400], noise=0.02),
+            tone_sequence([300, 300, 2500, 2500], noise=0.02),
+            (0.05 * rng.standard_normal(SAMPLE_RATE) * 32767).astype(np.int16),
+        ]
+        report = evaluate(self.detector, positives, negatives)
+        self.assertEqual(report["detection_rate"], 1.0, report)
+        self.assertEqual(report["false_alarm_rate"], 0.0, report)
+
+    def test_process_fires_once_and_tracks_cpu(self):
+        clip = tone_sequence(WAKE, noise=0.02)
+        self.assertTrue(self.detector.process(clip))
+        # Refractory period: the same utterance doesn't fire twice
+        self.assertFalse(self.detector.process(clip))
+
+        stats = self.detector.stats()
+        self.assertEqual(stats["windows_scored"], 1)
+        self.assertGreater(stats["ms_per_window"], 0)
+        # Scoring one 0.8 s window should be far cheaper than real time
+        self.assertLess(stats["ms_per_window"], 50)
+
+    def test_sensitivity(self):
+        strict = WakeWordDetector(templates=[tone_sequence(WAKE)], sensitivity=0.0)
+        self.assertFalse(strict.process(tone_sequence(WAKE, noise=0.05)))
+
+
+if __name__ == "__main__":
+    unittest.main()
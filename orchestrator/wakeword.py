@@ -0,0 +1,372 @@
+import logging
+import os
+import re
+import sys
+import glob
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Wake word detection.
+# WakeWordMatcher finds the wake word in a transcript and splits off the command.
+# WakeWordDetector spots it directly in the audio: enrolled "hey genie" clips are
+# turned into MFCC templates once and live audio is scored against them with
+# vectorized NumPy, so full STT only runs after a hit.
+
+DEFAULT_WAKE_WORDS = [
+    "hyy gimi", "hey gimme", "hi gimme", "hey jimmy", "hi jimmy", "hey gimi", "high give me",
+    "hey google", "hi google", "rajini", "genie", "hey genie", "jimmy"
+]
+# Comma-separated override, e.g. WAKE_WORDS="hey genie,genie"
+WAKE_WORDS = [w.strip().lower() for w in os.getenv("WAKE_WORDS", "").split(",") if w.strip()] or DEFAULT_WAKE_WORDS
+WAKE_WORD_THRESHOLD = 0.8 # Similarity a fuzzy hit needs (1 - edits / wake word length)
+
+WAKE_WORD_ENGINE = os.getenv("WAKE_WORD_ENGINE", "stt")  # stt (transcribe + match) or kws (this detector)
+WAKEWORD_TEMPLATES_DIR = os.getenv("WAKEWORD_TEMPLATES_DIR", "wakeword_templates")
+WAKEWORD_SENSITIVITY = float(os.getenv("WAKEWORD_SENSITIVITY", "0.25"))  # 0..1, higher fires more easily
+WAKEWORD_CPU_BUDGET = float(os.getenv("WAKEWORD_CPU_BUDGET", "0.05"))    # Fraction of one core
+
+_PUNCT = re.compile(r"[^\w\s]")
+_TOKEN = re.compile(r"\S+")
+
+
+def bounded_edit_distance(a, b, max_dist):
+    """
+    Levenshtein distance, or max_dist + 1 as soon as it is known to exceed max_dist.
+    Only the diagonal band |i - j| <= max_dist is computed.
+    """
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    if a == b:
+        return 0
+    over = max_dist + 1
+    previous = [j if j <= max_dist else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        lo = max(1, i - max_dist)
+        hi = min(len(b), i + max_dist)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= max_dist else over
+        ca = a[i - 1]
+        row_min = current[0]
+        for j in range(lo, hi + 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != b[j - 1]))
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_dist:
+            return over
+        previous = current
+    return min(previous[-1], over)
+
+
+class WakeWordMatcher:
+    """
+    Single-pass wake word matcher over a transcript.
+    - Exact hits: one precompiled regex (longest alternatives first, word boundaries).
+    - Fuzzy hits: bounded edit distance over token windows near the start.
+    Both return the command that follows, aligned to the original text, so
+    "hey jimy open notepad" runs "open notepad" in the same turn.
+    """
+    def __init__(self, wake_words=None, threshold=WAKE_WORD_THRESHOLD, max_start_token=2):
+        self.wake_words = sorted({w.lower().strip() for w in (wake_words or WAKE_WORDS)}, key=len, reverse=True)
+        self.threshold = threshold
+        self.max_start_token = max_start_token
+        self.exact = re.compile(r"\b(?:" + "|".join(re.escape(w) for w in self.wake_words) + r")\b")
+        # Fuzzy candidates grouped by token count, with their edit budget
+        self.by_length = {}
+        for w in self.wake_words:
+            budget = int(len(w) * (1 - threshold) + 1e-9)   # 5 * 0.2 is 0.999... in floats
+            if budget:
+                self.by_length.setdefault(len(w.split()), []).append((w, budget))
+
+    def match(self, text):
+        """Returns (is_wake, remainder)."""
+        # Words left after dropping punctuation, with where each ends in the original text
+        # ("hey - genie" is two words, not three)
+        tokens, ends = [], []
+        for m in _TOKEN.finditer(text):
+            token = _PUNCT.sub("", m.group()).lower()
+            if token:
+                tokens.append(token)
+                ends.append(m.end())
+        if not tokens:
+            return False, ""
+
+        def remainder_after(n_tokens):
+            return text[ends[n_tokens - 1]:].strip(" ,.!?-")
+
+        # 1. Exact hit anywhere
+        normalized = " ".join(tokens)
+        m = self.exact.search(normalized)
+        if m:
+            return True, remainder_after(len(normalized[:m.end()].split()))
+
+        # 2. Fuzzy hit in the first few tokens
+        best = None
+        for start in range(min(self.max_start_token + 1, len(tokens))):
+            for n_words, candidates in self.by_length.items():
+                end = start + n_words
+                if end > len(tokens):
+                    continue
+                window = " ".join(tokens[start:end])
+                for wake_word, budget in candidates:
+                    dist = bounded_edit_distance(window, wake_word, budget)
+                    if dist <= budget and (best is None or dist / len(wake_word) < best[0]):
+                        best = (dist / len(wake_word), end)
+        if best:
+            return True, remainder_after(best[1])
+        return False, ""
+
+
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 400   # 25 ms
+FRAME_HOP = 160      # 10 ms
+N_FFT = 512
+N_MELS = 40
+N_MFCC = 13
+TEMPLATE_FRAMES = 32  # Every window/template is resampled to this many frames before comparing
+WINDOW_SCALES = (0.85, 1.0, 1.15)  # Window lengths tried relative to the template, for slow/fast speakers
+
+
+def mel_filterbank(sample_rate=SAMPLE_RATE, n_fft=N_FFT, n_mels=N_MELS):
+    """Triangular mel filters, shape (n_mels, n_fft // 2 + 1)."""
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    mel_points = np.linspace(hz_to_mel(0), hz_to_mel(sample_rate / 2), n_mels + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mel_points) / sample_rate).astype(int)
+
+    fbank = np.zeros((n_mels, n_fft // 2 + 1))
+    for m in range(1, n_mels + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        if center > left:
+            fbank[m - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+        if right > center:
+            fbank[m - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+    return fbank
+
+
+def dct_matrix(n_mfcc=N_MFCC, n_mels=N_MELS):
+    """Orthonormal DCT-II basis, shape (n_mfcc, n_mels)."""
+    n = np.arange(n_mels)
+    k = np.arange(n_mfcc)[:, None]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2 * n_mels)) * np.sqrt(2.0 / n_mels)
+    basis[0] /= np.sqrt(2.0)
+    return basis
+
+
+_FBANK = mel_filterbank()
+_DCT = dct_matrix()
+_WINDOW = np.hamming(FRAME_LENGTH)
+
+
+def log_mel(samples):
+    """Log-mel energies for int16 or float samples, shape (frames, N_MELS)."""
+    samples = np.asarray(samples)
+    x = samples.astype(np.float32)
+    if np.issubdtype(samples.dtype, np.integer):
+        x /= 32768.0
+    if len(x) < FRAME_LENGTH:
+        x = np.pad(x, (0, FRAME_LENGTH - len(x)))
+    frames = np.lib.stride_tricks.sliding_window_view(x, FRAME_LENGTH)[::FRAME_HOP]
+    power = np.abs(np.fft.rfft(frames * _WINDOW, n=N_FFT)) ** 2
+    return np.log(power @ _FBANK.T + 1e-10)
+
+
+def mfcc(samples):
+    """MFCCs with per-window cepstral mean/variance normalization, shape (frames, N_MFCC)."""
+    feats = log_mel(samples) @ _DCT.T
+    feats -= feats.mean(axis=0)
+    feats /= feats.std(axis=0) + 1e-6
+    return feats
+
+
+def _resample_frames(feats, n_frames=TEMPLATE_FRAMES):
+    """Linear time-normalization so clips of different speed line up."""
+    positions = np.linspace(0, len(feats) - 1, n_frames)
+    lower = np.floor(positions).astype(int)
+    upper = np.minimum(lower + 1, len(feats) - 1)
+    frac = (positions - lower)[:, None]
+    out = feats[lower] * (1 - frac) + feats[upper] * frac
+    # Unit-length rows so a dot product is a cosine similarity
+    return out / (np.linalg.norm(out, axis=1, keepdims=True) + 1e-9)
+
+
+class WakeWordDetector:
+    """
+    Template-matching keyword spotter.
+    Each call to process() scores the newest window of audio against every
+    enrolled template (mean frame-wise cosine similarity) and fires when the
+    best score passes 1 - sensitivity.
+    """
+    def __init__(self, templates=None, sensitivity=WAKEWORD_SENSITIVITY,
+                 cpu_budget=WAKEWORD_CPU_BUDGET, sample_rate=SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.sensitivity = sensitivity
+        self.threshold = 1.0 - sensitivity
+        self.cpu_budget = cpu_budget
+        self.templates = []
+        self.template_samples = 0
+        self.window_samples = 0
+        self.hop_seconds = 0.1
+        self.min_hop_seconds = 0.1
+        self.max_hop_seconds = 0.5
+        self.last_score = 0.0
+        self.refractory_until = 0.0
+
+        # CPU accounting: time spent scoring vs wall-clock time covered
+        self.windows_scored = 0
+        self.processing_seconds = 0.0
+        self.started = time.perf_counter()
+
+        for clip in templates or []:
+            self.add_template(clip)
+
+    def add_template(self, samples):
+        self.templates.append(_resample_frames(mfcc(samples)))
+        self.template_samples = max(self.template_samples, len(samples))
+        self.window_samples = int(self.template_samples * max(WINDOW_SCALES))
+        self._stack = np.stack(self.templates)
+
+    def load_templates(self, directory=WAKEWORD_TEMPLATES_DIR):
+        from .stt import load_wav
+        for path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+            samples, _ = load_wav(path)
+            self.add_template(samples)
+        logger.info("Wake word detector: %d templates from %s", len(self.templates), directory)
+        return self
+
+    @property
+    def enabled(self):
+        return bool(self.templates)
+
+    def score(self, samples):
+        """
+        Best similarity (-1..1) against all templates, trying windows of each
+        WINDOW_SCALES length that end at the newest sample.
+        """
+        best = -1.0
+        for scale in WINDOW_SCALES:
+            n = min(int(self.template_samples * scale), len(samples))
+            feats = _resample_frames(mfcc(samples[len(samples) - n:]))
+            # (templates, frames, coeffs) x (frames, coeffs) -> per-template mean cosine
+            sims = np.einsum("tfc,fc->t", self._stack, feats) / TEMPLATE_FRAMES
+            best = max(best, float(sims.max()))
+        return best
+
+    def process(self, samples):
+        """Scores the newest window. Returns True when the wake word fires."""
+        if not self.templates or len(samples) < FRAME_LENGTH:
+            return False
+        now = time.perf_counter()
+        if now < self.refractory_until:
+            return False
+
+        self.last_score = self.score(samples)
+        elapsed = time.perf_counter() - now
+        self.windows_scored += 1
+        self.processing_seconds += elapsed
+        self._adapt_hop()
+
+        if self.last_score >= self.threshold:
+            # Don't fire again on the same utterance
+            self.refractory_until = now + self.window_samples / float(self.sample_rate)
+            return True
+        return False
+
+    def _adapt_hop(self):
+        """Scores less often when over the CPU budget, more often when well under it."""
+        load = self.cpu_load()
+        if load > self.cpu_budget:
+            self.hop_seconds = min(self.hop_seconds * 1.5, self.max_hop_seconds)
+        elif load < self.cpu_budget / 2:
+            self.hop_seconds = max(self.hop_seconds / 1.5, self.min_hop_seconds)
+
+    def cpu_load(self):
+        wall = time.perf_counter() - self.started
+        return self.processing_seconds / wall if wall > 0 else 0.0
+
+    def stats(self):
+        return {
+            "templates": len(self.templates),
+            "threshold": self.threshold,
+            "last_score": round(self.last_score, 3),
+            "windows_scored": self.windows_scored,
+            "ms_per_window": round(1000 * self.processing_seconds / self.windows_scored, 3) if self.windows_scored else 0.0,
+            "cpu_load": round(self.cpu_load(), 4),
+            "cpu_budget": self.cpu_budget,
+            "hop_seconds": round(self.hop_seconds, 3),
+        }
+
+
+def scan_clip(detector, samples, hop_seconds=0.1):
+    """Best score of a sliding window over a whole clip (offline, no refractory/budget)."""
+    window = detector.window_samples
+    hop = int(hop_seconds * detector.sample_rate)
+    if len(samples) <= window:
+        return detector.score(samples)
+    # Windows end every hop, including at the very end of the clip
+    ends = list(range(window, len(samples) + 1, hop)) + [len(samples)]
+    return max(detector.score(samples[end - window:end]) for end in ends)
+
+
+def evaluate(detector, positives, negatives):
+    """
+    Test harness: scores recorded positive and negative clips.
+    Returns detection/false-alarm rates at the detector's threshold plus timing.
+    """
+    start = time.perf_counter()
+    pos_scores = [scan_clip(detector, clip) for clip in positives]
+    neg_scores = [scan_clip(detector, clip) for clip in negatives]
+    elapsed = time.perf_counter() - start
+    audio_seconds = sum(len(c) for c in list(positives) + list(negatives)) / float(detector.sample_rate)
+
+    hits = sum(s >= detector.threshold for s in pos_scores)
+    false_alarms = sum(s >= detector.threshold for s in neg_scores)
+    return {
+        "positives": len(pos_scores),
+        "negatives": len(neg_scores),
+        "detection_rate": hits / len(pos_scores) if pos_scores else 0.0,
+        "false_alarm_rate": false_alarms / len(neg_scores) if neg_scores else 0.0,
+        "positive_scores": [round(s, 3) for s in pos_scores],
+        "negative_scores": [round(s, 3) for s in neg_scores],
+        "rtf": elapsed / audio_seconds if audio_seconds else 0.0,
+    }
+
+
+def bench_matcher(corpus, rounds=2000):
+    """Microbenchmark: microseconds per transcript for the matcher."""
+    matcher = WakeWordMatcher()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in corpus:
+            matcher.match(text)
+    return 1e6 * (time.perf_counter() - start) / (rounds * len(corpus))
+
+
+if __name__ == "__main__":
+    # python -m orchestrator.wakeword bench "hey jimy open notepad" ...
+    if len(sys.argv) >= 2 and sys.argv[1] == "bench":
+        corpus = sys.argv[2:] or ["hey jimy open notepad", "hey genie", "what is the weather", "hi jimmy search google for cats"]
+        print(f"WakeWordMatcher: {bench_matcher(corpus):.1f} us per transcript")
+        sys.exit(0)
+
+    # python -m orchestrator.wakeword <templates_dir> <positives_dir> <negatives_dir>
+    if len(sys.argv) != 4:
+        print("Usage: python -m orchestrator.wakeword <templates_dir> <positives_dir> <negatives_dir>")
+        print("       python -m orchestrator.wakeword bench [transcript ...]")
+        sys.exit(1)
+
+    from .stt import load_wav
+
+    def load_dir(directory):
+        return [load_wav(p)[0] for p in sorted(glob.glob(os.path.join(directory, "*.wav")))]
+
+    detector = WakeWordDetector().load_templates(sys.argv[1])
+    report = evaluate(detector, load_dir(sys.argv[2]), load_dir(sys.argv[3]))
+    for key, value in report.items():
+        print(f"{key}: {value}")
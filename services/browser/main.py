@@ -8,8 +8,20 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+import os
+import sys
+import logging
+
+# Shared helpers live at the project root (run_all.py starts this file as a script)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from orchestrator.logging_setup import setup_logging
+from orchestrator.metrics import instrument_app
+
+setup_logging()
+logger = logging.getLogger("services.browser")
 
 app = FastAPI(title="Browser Control Service")
+instrument_app(app, "browser")
 
 driver = None
 
@@ -46,7 +58,7 @@ def open_url(url: str):
         if not url.startswith("http"):
             url = "https://" + url
         
-        print(f"Opening URL in Chrome Profile '{CHROME_PROFILE}': {url}")
+        logger.info("Opening URL in Chrome profile '%s': %s", CHROME_PROFILE, url)
         
         # Command to open specific profile. 
         # "start chrome" usually works if Chrome is in PATH.
@@ -54,7 +66,7 @@ def open_url(url: str):
         os.system(f'start chrome "{url}" --profile-directory="{CHROME_PROFILE}"')
         
     except Exception as e:
-        print(f"Browser Error: {e}")
+        logger.error("Browser error: %s", e)
         return {"status": "error", "message": str(e)}
         
     return {"status": "success", "message": f"Opened {url}"}
@@ -64,11 +76,11 @@ def search_google(query: str):
     """Searches Google in specific Chrome profile."""
     try:
         url = f"https://www.google.com/search?q={query}"
-        print(f"Searching in Chrome Profile '{CHROME_PROFILE}': {url}")
+        logger.info("Searching in Chrome profile '%s': %s", CHROME_PROFILE, url)
         os.system(f'start chrome "{url}" --profile-directory="{CHROME_PROFILE}"')
         
     except Exception as e:
-        print(f"Browser Error: {e}")
+        logger.error("Browser error: %s", e)
         return {"status": "error", "message": str(e)}
         
     return {"status": "success", "message": f"Searched for {query}"}
@@ -87,11 +99,11 @@ def send_whatsapp(contact_name: str, message: str):
         wait = WebDriverWait(d, 30)
         
         # 1. Wait for Search Box (div with data-tab="3" is the search box)
-        print("Waiting for WhatsApp to load...")
+        logger.debug("Waiting for WhatsApp to load...")
         search_box = wait.until(EC.presence_of_element_located((By.XPATH, '//div[@contenteditable="true"][@data-tab="3"]')))
         
         # 2. Search for contact
-        print(f"Searching for {contact_name}...")
+        logger.debug("Searching for %s...", contact_name)
         search_box.click()
         search_box.clear()
         search_box.send_keys(contact_name)
@@ -99,11 +111,11 @@ def send_whatsapp(contact_name: str, message: str):
         search_box.send_keys(Keys.ENTER)
         
         # 3. Wait for Chat to open (Message box has data-tab="10")
-        print("Waiting for chat to open...")
+        logger.debug("Waiting for chat to open...")
         msg_box = wait.until(EC.presence_of_element_located((By.XPATH, '//div[@contenteditable="true"][@data-tab="10"]')))
         
         # 4. Type and Send
-        print(f"Sending message: {message}")
+        logger.debug("Sending message: %s", message)
         msg_box.click()
         msg_box.send_keys(message)
         time.sleep(0.5)
@@ -112,7 +124,7 @@ def send_whatsapp(contact_name: str, message: str):
         return {"status": "success", "message": f"Sent WhatsApp message to {contact_name}"}
 
     except Exception as e:
-        print(f"WhatsApp Error: {e}")
+        logger.error("WhatsApp error: %s", e)
         return {"status": "error", "message": f"Failed to send message: {str(e)}"}
 
 if __name__ == "__main__":
@@ -4,13 +4,24 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
+import sys
+import logging
 import uvicorn
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Shared helpers live at the project root (run_all.py starts this file as a script)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from orchestrator.logging_setup import setup_logging
+from orchestrator.metrics import instrument_app
+
+setup_logging()
+logger = logging.getLogger("services.email")
+
 app = FastAPI(title="Email Service")
+instrument_app(app, "email")
 
 class EmailRequest(BaseModel):
     recipient: str
@@ -43,23 +54,23 @@ def send_email(email_req: EmailRequest):
         msg.attach(MIMEText(email_req.body, 'plain'))
 
         # Connect to server
-        print(f"Connecting to SMTP server {smtp_server}:{smtp_port}...")
+        logger.debug("Connecting to SMTP server %s:%s...", smtp_server, smtp_port)
         server = smtplib.SMTP(smtp_server, smtp_port)
         server.starttls()
         
         # Login
-        print(f"Logging in as {sender_email}...")
+        logger.debug("Logging in as %s...", sender_email)
         server.login(sender_email, sender_password)
         
         # Send
-        print(f"Sending email to {email_req.recipient}...")
+        logger.info("Sending email to %s...", email_req.recipient)
         server.send_message(msg)
         server.quit()
         
         return {"status": "success", "message": f"Email sent to {email_req.recipient}"}
 
     except Exception as e:
-        print(f"Email Error: {e}")
+        logger.error("Email error: %s", e)
         return {"status": "error", "message": str(e)}
 
 if __name__ == "__main__":
@@ -0,0 +1,20 @@
+# Apps the System service knows how to launch: name -> shell command.
+# Kept in its own module (no FastAPI/pyautogui imports) so the orchestrator's
+# local intent router can recognise the same names without loading the service.
+KNOWN_APPS = {
+    "whatsapp": "start whatsapp:",
+    "spotify": "start spotify:",
+    "telegram": "start tg:",
+    "settings": "start ms-settings:",
+    "store": "start ms-windows-store:",
+    "calculator": "calc",
+    "notepad": "start notepad",
+    "cmd": "start cmd",
+    "chrome": "start chrome",
+    "google chrome": "start chrome",
+    "youtube": "start https://www.youtube.com",
+    "facebook": "start https://www.facebook.com",
+    "instagram": "start https://www.instagram.com",
+    "google": "start https://www.google.com",
+    "google maps": "start https://www.google.com/maps"
+}
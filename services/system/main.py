@@ -1,8 +1,20 @@
 from fastapi import FastAPI
 import uvicorn
 import os
+import sys
+import logging
+
+# Shared helpers live at the project root (run_all.py starts this file as a script)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from orchestrator.logging_setup import setup_logging
+from orchestrator.metrics import instrument_app
+from services.system.apps import KNOWN_APPS
+
+setup_logging()
+logger = logging.getLogger("services.system")
 
 app = FastAPI(title="System Control Service")
+instrument_app(app, "system")
 
 @app.get("/")
 def home():
@@ -15,45 +27,27 @@ def open_app(app_name: str):
     """
     Opens a system application.
     """
-    print(f"Opening App: {app_name}")
+    logger.info("Opening app: %s", app_name)
     try:
-        # Simple implementation for Windows
-        # Known apps mapping for better launching
-        known_apps = {
-            "whatsapp": "start whatsapp:",
-            "spotify": "start spotify:",
-            "telegram": "start tg:",
-            "settings": "start ms-settings:",
-            "store": "start ms-windows-store:",
-            "calculator": "calc",
-            "notepad": "start notepad",
-            "cmd": "start cmd",
-            "chrome": "start chrome",
-            "youtube": "start https://www.youtube.com",
-            "facebook": "start https://www.facebook.com",
-            "instagram": "start https://www.instagram.com",
-            "google": "start https://www.google.com"
-        }
-
         # Clean app name
         clean_name = app_name.lower().strip()
         
-        # 1. Try known mapping
-        if clean_name in known_apps:
-            print(f"DEBUG: Opening known app '{clean_name}' via command")
-            os.system(known_apps[clean_name])
+        # 1. Try known mapping (services/system/apps.py)
+        if clean_name in KNOWN_APPS:
+            logger.debug("Opening known app '%s' via command", clean_name)
+            os.system(KNOWN_APPS[clean_name])
             return {"status": "success", "message": f"Opened {clean_name}"}
 
         # 2. Try generic startfile (for files or exact exe names)
-        print(f"DEBUG: Attempting to open '{app_name}' via startfile")
+        logger.debug("Attempting to open '%s' via startfile", app_name)
         try:
             os.startfile(app_name)
             return {"status": "success", "message": f"Opened '{app_name}'"}
         except FileNotFoundError:
-            print(f"DEBUG: '{app_name}' not found locally.")
+            logger.debug("'%s' not found locally.", app_name)
             
             # 3. SPELL CHECKER / SUGGESTION
-            matches = difflib.get_close_matches(clean_name, known_apps.keys(), n=1, cutoff=0.6)
+            matches = difflib.get_close_matches(clean_name, KNOWN_APPS.keys(), n=1, cutoff=0.6)
             if matches:
                  suggestion = matches[0]
                  return {
@@ -62,7 +56,7 @@ def open_app(app_name: str):
                  }
 
             # 4. Fallback: Open in Chrome
-            print(f"DEBUG: Trying Chrome fallback for '{app_name}'")
+            logger.debug("Trying Chrome fallback for '%s'", app_name)
             url = f"https://www.google.com/search?q={app_name}"
             os.system(f'start chrome "{url}"')
             return {"status": "success", "message": f"App not found. I searched for '{app_name}' in Chrome."}
@@ -81,7 +75,7 @@ def send_whatsapp(contact_name: str, message: str):
     """
     Sends a WhatsApp message using the Desktop Application via GUI Automation.
     """
-    print(f"Sending WhatsApp to {contact_name}: {message}")
+    logger.info("Sending WhatsApp to %s: %s", contact_name, message)
     try:
         # 1. Open WhatsApp
         os.system("start whatsapp:")
@@ -109,7 +103,7 @@ def send_whatsapp(contact_name: str, message: str):
         return {"status": "success", "message": f"Sent message to {contact_name}"}
 
     except Exception as e:
-        print(f"Automation Error: {e}")
+        logger.error("Automation error: %s", e)
         return {"status": "error", "message": str(e)}
 
 if __name__ == "__main__":